@@ -3,23 +3,34 @@ import json
 import datetime
 import time
 import re
+import asyncio
+import llm_schemas
 from google import genai
 from google.genai import types
 from dotenv import load_dotenv
+from context_cache import ContextCacheRegistry
+from json_stream import JsonObjectStream
+from context_window import InkContextBuilder
+from llm_cache import LLMResponseCache, LLMCacheMiss
 
 load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))  
 
 class AutonomousArchitect:
+    CACHE_TTL_SECONDS = 3600
+    CACHE_REFRESH_MARGIN = 600  # extend the live cache before a request once less than 10 minutes remain
+
     def __init__(self, book_path):
+        self.llm_cache = LLMResponseCache()
         self.api_key = os.getenv("GEMINI_API_KEY")
-        if not self.api_key:
+        if not self.api_key and not self.llm_cache.offline:
             raise ValueError("❌ GEMINI_API_KEY is missing.")
         
         # 🛠️ FIX: Removed 'transport' and used HttpOptions for a safe timeout
+        # (Replay runs may go without a key: recorded responses need no client.)
         self.client = genai.Client(
             api_key=self.api_key,
             http_options=types.HttpOptions(timeout=120000) # 2 minute timeout for slow handshakes
-        )
+        ) if self.api_key else None
         self.book_path = book_path   
         
         from utils import DashboardUtils
@@ -31,89 +42,166 @@ class AutonomousArchitect:
         self.target_scene_count = int(gen_cfg.get("target_scene_count", 15))
         self.current_scene_num = 1
         self.cache = None
+        self.cache_expires_at = 0.0
+        self.cache_identity = None
         self.chat = None
+        self.cache_registry = ContextCacheRegistry()
+        self.context_builder = InkContextBuilder(
+            self._count_tokens,
+            budget_tokens=int(gen_cfg.get("context_budget_tokens", 6000)),
+            recent_knots=int(gen_cfg.get("context_recent_knots", 3))
+        )
+        # Beats sent with the context window keep only this many earlier exchanges in the chat
+        self.chat_history_turns = max(0, int(gen_cfg.get("chat_history_turns", 2)))
+        self.response_schemas = llm_schemas.build_schemas(self._trait_names())
 
-    def _filter_context(self, full_text, max_scenes=5):
-        """Filters the .ink content to keep only variables and the last N scenes."""
-        lines = full_text.splitlines()
-        # Keep global variables (name, bio, traits) so the LLM knows who the player is
-        vars_lines = [l for l in lines if l.strip().startswith("VAR ")]
-        
-        # Identify main scene knots (ignoring the 'result' knots)
-        knot_indices = [i for i, l in enumerate(lines) if l.strip().startswith("==") and "_result_" not in l]
-        
-        if not knot_indices:
-            return full_text
-            
-        # Select the starting point for the last N scenes
-        target_index = knot_indices[-max_scenes] if len(knot_indices) > max_scenes else knot_indices[0]
-        
-        # Reconstruct: Variables at the top, then the recent story chunk
-        return "\n".join(vars_lines) + "\n\n" + "\n".join(lines[target_index:])
+    def _count_tokens(self, text):
+        if self.client is None or self.llm_cache.mode != "passthrough":
+            # Offline, or recording/replaying: a local estimate keeps prompts identical across runs
+            return len(text) // 4 + 1
+        resp = self.client.models.count_tokens(model=f"models/{self.model_name}", contents=text)
+        return resp.total_tokens
+
+    def _filter_context(self, full_text):
+        """Variables, the latest scenes verbatim and one-line summaries of older ones, within the token budget."""
+        return self.context_builder.build(full_text)
     
     def set_scene_number(self, number):
         self.current_scene_num = number
         print(f"🎬 Architect: Progress synced to scene #{self.current_scene_num}")
     
-    def _setup_context_cache(self):
-        """Creates the cache. This will now run only when the game actually starts."""
-        # Use a timestamp to ensure uniqueness and skip the 'listing' hang
-        unique_name = f"ctx-{self.book_id}-{int(time.time())}" 
-        
+    def _setup_context_cache(self, instruction=None):
+        """
+        Returns a Gemini context cache with the book (and the system instruction).
+        A live cache for the same book text, model and instruction is reused via the local
+        registry, with its TTL extended to the full window; only a miss uploads the book.
+        """
         with open(self.book_path, 'r', encoding='utf-8') as f:
             book_content = f.read()
 
-        return self.client.caches.create(
+        key = self.cache_registry.make_key(book_content, self.model_name, instruction)
+        self.cache_identity = key
+        entry = self.cache_registry.get(key)
+        if entry:
+            try:
+                cache = self._extend_context_cache(entry["name"], key, entry.get("display_name", ""))
+                print(f"♻️ Reusing context cache: {cache.name}")
+                return cache
+            except Exception as e:
+                print(f"⚠️ Registered context cache is gone ({e}), uploading again.")
+                self.cache_registry.forget(key)
+
+        # Use a timestamp to ensure uniqueness and skip the 'listing' hang
+        unique_name = f"ctx-{self.book_id}-{int(time.time())}"
+        print(f"📤 Uploading context to Gemini: {unique_name}...")
+        cache = self.client.caches.create(
             model=f"models/{self.model_name}",
             config=types.CreateCachedContentConfig(
                 display_name=unique_name,
+                system_instruction=instruction, # Instruction goes HERE
                 contents=[types.Content(role="user", parts=[types.Part(text=book_content)])],
-                ttl="3600s", 
+                ttl=f"{self.CACHE_TTL_SECONDS}s",
             )
         )
-    def _ensure_chat_ready(self):
-        """🛠️ FIX: Moves system_instruction into the cache to resolve 400 error."""
+        self.cache_expires_at = self._cache_expiry(cache, time.time() + self.CACHE_TTL_SECONDS)
+        self.cache_registry.put(key, cache.name, self.cache_expires_at, unique_name)
+        return cache
+
+    def _extend_context_cache(self, name, key, display_name=""):
+        """Resets the cache's TTL to the full window and records the new expiry."""
+        cache = self.client.caches.update(
+            name=name,
+            config=types.UpdateCachedContentConfig(ttl=f"{self.CACHE_TTL_SECONDS}s")
+        )
+        self.cache_expires_at = self._cache_expiry(cache, time.time() + self.CACHE_TTL_SECONDS)
+        self.cache_registry.put(key, cache.name, self.cache_expires_at, display_name)
+        return cache
+
+    def _refresh_context_cache(self):
+        """Keeps the live cache from expiring mid-session; a cache that is gone is rebuilt with a new chat."""
+        if self.cache is None or self.cache_expires_at - time.time() >= self.CACHE_REFRESH_MARGIN:
+            return
+        try:
+            self.cache = self._extend_context_cache(self.cache.name, self.cache_identity,
+                                                    getattr(self.cache, "display_name", "") or "")
+            print(f"⏳ Extended context cache: {self.cache.name}")
+        except Exception as e:
+            print(f"⚠️ Context cache expired ({e}), uploading again.")
+            self.cache_registry.forget(self.cache_identity)
+            self.cache = None
+            self.chat = None
+
+    @staticmethod
+    def _cache_expiry(cache, fallback):
+        expire_time = getattr(cache, "expire_time", None)
+        return expire_time.timestamp() if expire_time else fallback
+
+    def _system_instruction(self):
+        # 1. Define the master instruction here (with protagonist)
+        from utils import DashboardUtils
+        char = DashboardUtils.get_protagonist_from_ink(self.book_id)
+        char_ctx = f"Protagonist: {char['name']} - {char['description']}" if char else "No protagonist defined yet."
+        language_rule = """
+        LANGUAGE RULES:
+        1. You MUST write all narrative 'scene_text', 'ending', 'text' (choices), and 'outcome_text' 
+           in the SAME LANGUAGE as the provided book text.
+        2. You MUST write 'visual_prompt', 'reward_visual_prompt', and 'audio_prompt' 
+           exclusively in ENGLISH (to ensure compatibility with image/audio generators).
+        """
+        return f"You are a Master Director and Dungeon Master. Guide the story based on the provided book. Focus on the most memorable scenes. {char_ctx} {language_rule}"
+
+    def _ensure_chat_ready(self, live=False):
+        """
+        🛠️ FIX: Moves system_instruction into the cache to resolve 400 error.
+        In LLM cache replay mode nothing is uploaded until a request actually misses the
+        recording (or a caller needs the live chat, `live=True`); strict replay raises
+        LLMCacheMiss instead of going live, even with GEMINI_API_KEY set.
+        """
+        if live and self.llm_cache.strict:
+            raise LLMCacheMiss("❌ No recorded response for this request (LLM_CACHE_MODE=replay never calls Gemini; "
+                               "use replay_or_record to record the missing ones).")
+        self._refresh_context_cache()
         if self.chat is None:
-            # 1. Define the master instruction here (with protagonist)
-            from utils import DashboardUtils
-            char = DashboardUtils.get_protagonist_from_ink(self.book_id)
-            char_ctx = f"Protagonist: {char['name']} - {char['description']}" if char else "No protagonist defined yet."
-            language_rule = """
-            LANGUAGE RULES:
-            1. You MUST write all narrative 'scene_text', 'ending', 'text' (choices), and 'outcome_text' 
-               in the SAME LANGUAGE as the provided book text.
-            2. You MUST write 'visual_prompt', 'reward_visual_prompt', and 'audio_prompt' 
-               exclusively in ENGLISH (to ensure compatibility with image/audio generators).
-            """
-            instruction = f"You are a Master Director and Dungeon Master. Guide the story based on the provided book. Focus on the most memorable scenes. {char_ctx} {language_rule}"
+            instruction = self._system_instruction()
+            if self.llm_cache.offline and not live:
+                if self.cache_identity is None:
+                    with open(self.book_path, 'r', encoding='utf-8') as f:
+                        self.cache_identity = self.cache_registry.make_key(f.read(), self.model_name, instruction)
+                return
+            if self.client is None:
+                raise LLMCacheMiss("❌ No recorded response for this request and GEMINI_API_KEY is missing.")
             
             if self.cache is None:
-                unique_name = f"ctx-{self.book_id}-{int(time.time())}"
-                with open(self.book_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                print(f"📤 Uploading context to Gemini: {unique_name}...")
-                
                 # 🛠️ FIX: Baked the instruction directly into the cache
-                self.cache = self.client.caches.create(
-                    model=f"models/{self.model_name}",
-                    config=types.CreateCachedContentConfig(
-                        display_name=unique_name,
-                        system_instruction=instruction, # Instruction goes HERE
-                        contents=[types.Content(role="user", parts=[types.Part(text=content)])],
-                        ttl="3600s", 
-                    )
-                )
+                self.cache = self._setup_context_cache(instruction)
             
-            # 🛠️ FIX: Chat config must NOT contain system_instruction when using a cache
-            self.chat = self.client.chats.create(
-                model=f"models/{self.model_name}",
-                config=types.GenerateContentConfig(
-                    cached_content=self.cache.name,
-                    temperature=0.7 
-                    # system_instruction must NOT be here
-                )
-            )
+            self.chat = self._new_chat()
+
+    def _new_chat(self, history=None):
+        # 🛠️ FIX: Chat config must NOT contain system_instruction when using a cache
+        return self.client.chats.create(
+            model=f"models/{self.model_name}",
+            config=types.GenerateContentConfig(
+                cached_content=self.cache.name,
+                temperature=0.7
+                # system_instruction must NOT be here
+            ),
+            history=history
+        )
+
+    def _trim_chat_history(self):
+        """
+        Keeps the last `chat_history_turns` exchanges of the chat and drops older ones, which
+        the token-budgeted story context already covers (as edited, not as first drafted).
+        Creating a chat with a given history is local; nothing is sent to the API.
+        """
+        if self.chat is None:
+            return
+        history = self.chat.get_history(curated=True)
+        keep = 2 * self.chat_history_turns  # one user and one model turn per exchange
+        if len(history) > keep:
+            self.chat = self._new_chat(history[-keep:] if keep else None)
+
     def generate_book_pitch(self):
         """Analyzes the book and suggests a summary and protagonists."""
         self._ensure_chat_ready()
@@ -130,8 +218,7 @@ class AutonomousArchitect:
             ]
         }
         """
-        resp = self.chat.send_message(prompt)
-        return self._parse_json(resp.text)
+        return self._send_structured(prompt, "pitch")
     
     def initialize_engine(self, protagonist_name=None, skip_intro=False):
         if skip_intro: return None
@@ -170,8 +257,7 @@ class AutonomousArchitect:
         print(prompt)
         print(self.target_scene_count)
         try:
-            resp = self.chat.send_message(prompt)
-            data = self._parse_json(resp.text)
+            data = self._send_structured(prompt, "scene")
             if data is None:
                 return None
             if 'audio_prompt' not in data or not data.get('audio_prompt'):
@@ -185,10 +271,18 @@ class AutonomousArchitect:
             print(f"❌ Handshake or API Error: {e}")
             return {}
 
-    def generate_main_beat(self, node_id, force_ending=False):
+    def generate_main_beat(self, node_id, force_ending=False, story_so_far=None):
+        """
+        Writes the next scene. With `story_so_far` (the current .ink script) the beat carries the
+        token-budgeted context and the chat keeps only its latest exchanges (generation.chat_history_turns),
+        so the prompt no longer grows with the whole conversation history and reflects the
+        director's edits rather than the drafts.
+        """
         self.current_scene_num += 1
         self._ensure_chat_ready() # 🛠️ FIX: Connects to Google only now
-        active_traits = [re.sub(r'\W+', '_', v['label'].lower()) for k, v in self.config.get("traits", {}).items() if v['label']]
+        if story_so_far:
+            self._trim_chat_history()
+        active_traits = self._trait_names()
         traits_hint = "TRAIT RULES: You MUST use these exact variable names for changes: " + ", ".join(active_traits) if active_traits else "No traits active."
         if force_ending:
             pacing_instruction = f"""
@@ -199,8 +293,14 @@ class AutonomousArchitect:
         else:
             pacing_instruction = f"PROGRESS: Scene {self.current_scene_num} / {self.target_scene_count}."
         
+        story_context = f"""
+        Story so far (Key Context, latest scenes in full, earlier scenes summarized):
+        ---
+        {self._filter_context(story_so_far)}
+        ---""" if story_so_far else ""
+
         prompt = f"""
-        {pacing_instruction}
+        {pacing_instruction}{story_context}
         Advance the story from {node_id}. 
         {traits_hint}
         Suggest changes for active traits in 'trait_changes' field (e.g., "health": 10).
@@ -239,8 +339,7 @@ class AutonomousArchitect:
         }}
         NOTE: The 'audio_prompt' should be concise (a few words) and focused on ambience, suitable to feed into a TTS/sound synthesis API.
         """
-        resp = self.chat.send_message(prompt)
-        data = self._parse_json(resp.text)
+        data = self._send_structured(prompt, "scene")
         # Fallback: if LLM didn't provide an explicit audio_prompt, derive a short one from the visual prompt
         if data is None:
             return None
@@ -255,26 +354,91 @@ class AutonomousArchitect:
     def generate_transition(self, parent_id, choice_obj):
         self._ensure_chat_ready()
         prompt = f"Player chose: {choice_obj['text']}. Write a creative outcome and a visual prompt. Return JSON."
-        resp = self.chat.send_message(prompt)
-        return self._parse_json(resp.text)
+        return self._parse_json(self._send_text(prompt, "transition"))
 
-    def generate_story_pack(self, protagonist_name=None, scene_count=12):
-        """Generates the full adventure in one call and returns all scenes as JSON."""
-        self._ensure_chat_ready()
-        scene_count = max(1, int(scene_count))
-        active_traits = [
+    def _trait_names(self):
+        """Ink variable names of the active traits (e.g. 'Health' -> 'health')."""
+        return [
             re.sub(r'\W+', '_', v['label'].lower())
             for _, v in self.config.get("traits", {}).items()
             if v.get('label')
         ]
+
+    def _story_pack_hints(self, protagonist_name):
+        active_traits = self._trait_names()
         traits_hint = ", ".join(active_traits) if active_traits else "sanity, health, luck"
         character_instruction = (
             f"The player has chosen to play as: {protagonist_name}."
             if protagonist_name
             else "The player will play as the most fitting protagonist from the book context."
         )
+        return traits_hint, character_instruction
 
-        prompt = f"""
+    def generate_story_pack(self, protagonist_name=None, scene_count=12):
+        """
+        Generates the full adventure and returns all scenes as JSON.
+        With generation.story_pack_strategy = "outline" the pack is built from a short
+        outline plus concurrent per-scene calls (see generate_story_pack_parallel);
+        otherwise everything comes from one call.
+        """
+        if self.config.get("generation", {}).get("story_pack_strategy", "single") == "outline":
+            return self.generate_story_pack_parallel(protagonist_name, scene_count)
+
+        self._ensure_chat_ready()
+        scene_count = max(1, int(scene_count))
+        prompt = self._story_pack_prompt(protagonist_name, scene_count)
+        return self._normalize_story_pack(self._send_structured(prompt, "story_pack"), scene_count, protagonist_name)
+
+    def generate_story_pack_streaming(self, protagonist_name=None, scene_count=12, on_scene=None):
+        """
+        Same request as generate_story_pack, but streamed: every scene object is parsed,
+        sanitized and handed to on_scene(index, scene, meta) as soon as it closes, so the
+        caller can persist it right away. If the stream breaks off, the complete scenes
+        received so far are kept. Returns the normalized pack (or None if no scene arrived).
+        """
+        self._ensure_chat_ready()
+        scene_count = max(1, int(scene_count))
+        prompt = self._story_pack_prompt(protagonist_name, scene_count)
+
+        stream = JsonObjectStream(array_keys=("scenes",), object_keys=("meta",))
+        meta, scenes = {}, []
+
+        def feed(text):
+            for key, obj in stream.feed(text):
+                if key == "meta" and isinstance(obj, dict):
+                    meta.update(obj)
+                elif key == "scenes" and isinstance(obj, dict) and len(scenes) < scene_count:
+                    scene = self._normalize_scene(self._checked(obj, "scene"), len(scenes))
+                    scenes.append(scene)
+                    print(f"📨 Architect: streamed scene {len(scenes)}/{scene_count} ({scene['scene_id']})")
+                    if on_scene:
+                        on_scene(len(scenes) - 1, scene, meta)
+
+        # A recorded stream is replayed as one chunk; scenes still reach on_scene one by one
+        recorded = self.llm_cache.lookup(self.model_name, self.cache_identity, "story_pack_stream", prompt)
+        if recorded is not None:
+            feed(recorded)
+        else:
+            self._ensure_chat_ready(live=True)
+            received = []
+            try:
+                for chunk in self.chat.send_message_stream(prompt, config=self._json_config("story_pack")):
+                    received.append(chunk.text or "")
+                    feed(chunk.text or "")
+                    if len(scenes) >= scene_count:
+                        break
+            except Exception as e:
+                print(f"⚠️ Architect: story pack stream interrupted after {len(scenes)} scenes: {e}")
+            else:
+                self.llm_cache.store(self.model_name, self.cache_identity, "story_pack_stream", prompt, "".join(received))
+
+        if not scenes:
+            return None
+        return self._normalize_story_pack({"meta": meta, "scenes": scenes}, scene_count, protagonist_name)
+
+    def _story_pack_prompt(self, protagonist_name, scene_count):
+        traits_hint, character_instruction = self._story_pack_hints(protagonist_name)
+        return f"""
         TASK: Generate a COMPLETE interactive adventure in ONE output.
         {character_instruction}
 
@@ -314,8 +478,21 @@ class AutonomousArchitect:
         }}
         """
 
-        resp = self.chat.send_message(prompt)
-        pack = self._parse_json(resp.text)
+    def _normalize_scene(self, scene, index):
+        """Fills in the keys the downstream editor logic relies on."""
+        if "scene_id" not in scene or not scene.get("scene_id"):
+            scene["scene_id"] = f"scene_{index+1}"
+        if "scene_text" not in scene:
+            scene["scene_text"] = ""
+        if "visual_prompt" not in scene:
+            scene["visual_prompt"] = ""
+        if "audio_prompt" not in scene:
+            scene["audio_prompt"] = ""
+        if "choices" not in scene or not isinstance(scene.get("choices"), list):
+            scene["choices"] = []
+        return scene
+
+    def _normalize_story_pack(self, pack, scene_count, protagonist_name=None):
         if not isinstance(pack, dict):
             return None
 
@@ -328,18 +505,7 @@ class AutonomousArchitect:
         for i, scene in enumerate(scenes[:scene_count]):
             if not isinstance(scene, dict):
                 continue
-            scene = self._sanitize_response(scene)
-            if "scene_id" not in scene or not scene.get("scene_id"):
-                scene["scene_id"] = f"scene_{i+1}"
-            if "scene_text" not in scene:
-                scene["scene_text"] = ""
-            if "visual_prompt" not in scene:
-                scene["visual_prompt"] = ""
-            if "audio_prompt" not in scene:
-                scene["audio_prompt"] = ""
-            if "choices" not in scene or not isinstance(scene.get("choices"), list):
-                scene["choices"] = []
-            normalized.append(scene)
+            normalized.append(self._normalize_scene(self._checked(scene, "scene"), i))
 
         if not normalized:
             return None
@@ -356,26 +522,211 @@ class AutonomousArchitect:
             pack["meta"]["protagonist"] = protagonist_name
         return pack
 
+    def generate_story_pack_parallel(self, protagonist_name=None, scene_count=12):
+        """
+        Story pack in two phases: one small outline call on the chat, then every scene is
+        written by its own request against the cached book context. Scene requests run
+        concurrently (generation.llm_concurrency) and are retried independently
+        (generation.scene_retries), so large packs neither truncate nor take N times as long.
+        Scenes that still fail are written once more one at a time; whatever fails even then is
+        folded into its neighbour (see _bridge_failed_scenes) and listed in meta.failed_scenes,
+        so one bad scene neither costs the whole pack nor leaves a hole in the story.
+        """
+        self._ensure_chat_ready()
+        scene_count = max(1, int(scene_count))
+        traits_hint, character_instruction = self._story_pack_hints(protagonist_name)
+
+        prompt = f"""
+        TASK: Plan a COMPLETE interactive adventure of EXACTLY {scene_count} scenes.
+        {character_instruction}
+        Follow the book's most memorable scenes in order. The last scene is the finale.
+        Keep every summary to ONE sentence. 'scene_id' values must be snake_case and unique.
+        Write the summaries in the SAME LANGUAGE as the book text.
+
+        RETURN JSON ONLY:
+        {{
+          "meta": {{"protagonist": "...", "target_scene_count": {scene_count}}},
+          "outline": [
+            {{"scene_id": "...", "summary": "..."}}
+          ]
+        }}
+        """
+        plan = self._send_structured(prompt, "outline")
+        outline = plan.get("outline") if isinstance(plan, dict) else None
+        if not isinstance(outline, list) or not outline:
+            print("❌ Architect: outline generation failed.")
+            return None
+
+        outline = [o for o in outline if isinstance(o, dict)][:scene_count]
+        seen = set()
+        for i, entry in enumerate(outline):
+            scene_id = re.sub(r'\W+', '_', str(entry.get("scene_id") or "").lower()).strip('_') or f"scene_{i+1}"
+            if scene_id in seen:
+                scene_id = f"{scene_id}_{i+1}"
+            seen.add(scene_id)
+            entry["scene_id"] = scene_id
+
+        print(f"🗺️ Architect: outline with {len(outline)} scenes, writing scenes in parallel...")
+        scenes = asyncio.run(self._write_scenes_async(outline, traits_hint, character_instruction))
+        failed = [i for i, scene in enumerate(scenes) if scene is None]
+        if failed:
+            print(f"⚠️ Architect: {len(failed)} scene(s) failed in parallel, writing them one at a time...")
+            retried = asyncio.run(self._write_scenes_async(outline, traits_hint, character_instruction,
+                                                           indices=failed, concurrency=1))
+            for i, scene in zip(failed, retried):
+                scenes[i] = scene
+
+        meta = plan.get("meta", {})
+        failed = [i for i, scene in enumerate(scenes) if scene is None]
+        if failed:
+            print(f"❌ Architect: scenes failed after retries: {', '.join(outline[i]['scene_id'] for i in failed)}")
+            outline, scenes, bridged = self._bridge_failed_scenes(outline, scenes, traits_hint, character_instruction)
+            meta["failed_scenes"] = [scene_id for dropped in bridged.values() for scene_id in dropped]
+            meta["bridged_scenes"] = bridged
+        pack = {"meta": meta, "scenes": scenes}
+        return self._normalize_story_pack(pack, scene_count, protagonist_name)
+
+    def _bridge_failed_scenes(self, outline, scenes, traits_hint, character_instruction):
+        """
+        Drops the outline beats that could not be written and rewrites the scene that follows
+        each gap so it also covers the missing beats (the scene before the gap when the gap
+        reaches the end, which then becomes the finale). The rewrite sees the shortened
+        outline, so choices and continuity lead from the scene before the gap straight into it.
+        Returns (outline, scenes, {bridging scene_id: [dropped scene_ids]}). A bridge that fails
+        as well keeps the scene as it was; if that scene is the new finale, the outline's
+        conclusion becomes its ending so the pack still ends where the outline does.
+        """
+        kept = [i for i, scene in enumerate(scenes) if scene is not None]
+        if not kept:
+            return [], [], {}
+        merged = {i: [] for i in kept}  # kept index -> dropped indices folded into it
+        for i, scene in enumerate(scenes):
+            if scene is None:
+                merged[next((k for k in kept if k > i), kept[-1])].append(i)
+
+        bridged_outline = []
+        for i in kept:
+            beats = sorted(merged[i] + [i])
+            summary = " ".join(outline[b].get("summary", "") for b in beats).strip()
+            bridged_outline.append({**outline[i], "summary": summary})
+        targets = [n for n, i in enumerate(kept) if merged[i]]
+
+        print(f"🌉 Architect: bridging {len(targets)} scene(s) over the missing beats...")
+        rewritten = asyncio.run(self._write_scenes_async(bridged_outline, traits_hint, character_instruction,
+                                                         indices=targets, concurrency=1))
+        new_scenes = [scenes[i] for i in kept]
+        bridged = {}
+        for n, scene in zip(targets, rewritten):
+            dropped = [outline[b]["scene_id"] for b in merged[kept[n]]]
+            if scene is not None:
+                new_scenes[n] = scene
+            else:
+                print(f"⚠️ Architect: could not bridge {bridged_outline[n]['scene_id']}, keeping it as written.")
+                if n == len(kept) - 1 and scenes[-1] is None:
+                    new_scenes[n] = {**new_scenes[n], "choices": [], "ending": outline[-1].get("summary", "")}
+            bridged[bridged_outline[n]["scene_id"]] = dropped
+        return bridged_outline, new_scenes, bridged
+
+    async def _write_scenes_async(self, outline, traits_hint, character_instruction, indices=None, concurrency=None):
+        """Writes the outline's scenes (or only those at `indices`); failed ones come back as None."""
+        gen_cfg = self.config.get("generation", {})
+        semaphore = asyncio.Semaphore(max(1, int(concurrency or gen_cfg.get("llm_concurrency", 4))))
+        retries = max(0, int(gen_cfg.get("scene_retries", 2)))
+        story_outline = "\n".join(f"{i+1}. {o['scene_id']}: {o.get('summary', '')}" for i, o in enumerate(outline))
+
+        async def write(index):
+            entry = outline[index]
+            is_finale = index == len(outline) - 1
+            prompt = self._scene_prompt(entry, index, len(outline), story_outline, traits_hint, character_instruction, is_finale)
+            recorded = self.llm_cache.lookup(self.model_name, self.cache_identity, "scene", prompt)
+            for attempt in range(retries + 1):
+                async with semaphore:
+                    try:
+                        fresh = recorded is None
+                        if not fresh:
+                            text, recorded = recorded, None  # a bad recording is retried live
+                        else:
+                            self._ensure_chat_ready(live=True)
+                            resp = await self.client.aio.models.generate_content(
+                                model=f"models/{self.model_name}",
+                                contents=prompt,
+                                config=self._json_config("scene")
+                            )
+                            text = resp.text
+                        scene = self._load_structured(text, "scene")
+                    except LLMCacheMiss:
+                        raise
+                    except Exception as e:
+                        print(f"⚠️ Architect: scene {entry['scene_id']} attempt {attempt + 1} failed: {e}")
+                        scene = None
+                if isinstance(scene, dict) and scene.get("scene_text") and (is_finale or scene.get("choices")):
+                    if fresh:
+                        self.llm_cache.store(self.model_name, self.cache_identity, "scene", prompt, text)
+                    scene["scene_id"] = entry["scene_id"]
+                    print(f"✅ Architect: scene {index + 1}/{len(outline)} ready ({entry['scene_id']})")
+                    return scene
+                if attempt < retries:
+                    await asyncio.sleep(2 ** attempt)
+            return None
+
+        indices = range(len(outline)) if indices is None else indices
+        return await asyncio.gather(*(write(i) for i in indices))
+
+    def _scene_prompt(self, entry, index, total, story_outline, traits_hint, character_instruction, is_finale):
+        if is_finale:
+            scene_rule = "This is the FINALE: resolve the main conflict, include an 'ending' text and set 'choices' to []."
+        else:
+            scene_rule = "Provide exactly 3 choices (golden, exquisite, bad). The 'exquisite' choice MUST include a 'reward_visual_prompt'."
+        return f"""
+        TASK: Write scene {index + 1} of {total} of an interactive adventure.
+        {character_instruction}
+
+        FULL OUTLINE (for continuity, do NOT write other scenes):
+        {story_outline}
+
+        THIS SCENE: {entry['scene_id']} - {entry.get('summary', '')}
+        {scene_rule}
+        Use ONLY these trait variable names in trait_changes: {traits_hint}
+        trait_changes values must be integers between -20 and 20.
+
+        CRITICAL MULTI-LANGUAGE REQUIREMENT:
+        - Write 'scene_text', 'ending', 'choices.text', and 'choices.outcome_text' in the SAME LANGUAGE as the book text.
+        - Write 'visual_prompt', 'audio_prompt', and 'reward_visual_prompt' in ENGLISH.
+
+        RETURN JSON ONLY:
+        {{
+          "scene_id": "{entry['scene_id']}",
+          "scene_text": "...",
+          "ending": "Optional final paragraph only on the finale",
+          "visual_prompt": "...",
+          "audio_prompt": "...",
+          "choices": [
+            {{"text": "...", "type": "golden", "outcome_text": "...", "trait_changes": {{}}}},
+            {{"text": "...", "type": "exquisite", "outcome_text": "...", "reward_visual_prompt": "...", "trait_changes": {{}}}},
+            {{"text": "...", "type": "bad", "outcome_text": "...", "trait_changes": {{}}}}
+          ]
+        }}
+        """
+
     def resume_session(self, content_to_send):
         """Verbesserter Resume-Handshake."""
         self._ensure_chat_ready()
-        optimized_content = self._filter_context(content_to_send, max_scenes=5)
+        optimized_content = self._filter_context(content_to_send)
 
         prompt = f"""
         RESUME ADVENTURE. 
-        Story so far (Key Context & Last 5 scenes):
+        Story so far (Key Context, latest scenes in full, earlier scenes summarized):
         ---
         {optimized_content}
         ---
         Analyze the state. Return JSON ONLY: 
         {{"status": "synchronized", "last_node": "ID_HERE", "summary": "..."}}
         """
-        resp = self.chat.send_message(prompt)
-        return self._parse_json(resp.text)
+        return self._send_structured(prompt, "resume")
 
     def reset_to_main_path(self, parent_node_id):
         self._ensure_chat_ready()
-        self.chat.send_message(f"Side-path finished. Returning to node {parent_node_id}.")
+        self._send_text(f"Side-path finished. Returning to node {parent_node_id}.", "reset")
 
     def generate_conclusion(self, story_so_far):
             """Generates a final concluding paragraph based on the adventure's history."""
@@ -398,22 +749,58 @@ class AutonomousArchitect:
                 "choices": []
             }}
             """
-            resp = self.chat.send_message(prompt)
-            data = self._parse_json(resp.text)
+            data = self._send_structured(prompt, "conclusion")
             
             # Ensure choices key exists for compatibility with InkSmith
             if data and "choices" not in data:
                 data["choices"] = []
             return data
 
-    def _validate_and_retry(self, raw_text, required_keys, retries=3):
-            for _ in range(retries):
-                data = self._parse_json(raw_text)
-                if data and all(k in data for k in required_keys):
-                    return data
-                resp = self.chat.send_message(f"Error: Missing keys {required_keys}. Reformatted JSON only.")
-                raw_text = resp.text
-            return {k: "Error" for k in required_keys}
+    def _json_config(self, kind):
+        """Chat/request config for schema-constrained JSON output (see llm_schemas)."""
+        return types.GenerateContentConfig(
+            cached_content=self.cache.name,
+            temperature=0.7,
+            response_mime_type="application/json",
+            response_schema=self.response_schemas[kind]
+        )
+
+    def _send_structured(self, prompt, kind):
+        text = self.llm_cache.lookup(self.model_name, self.cache_identity, kind, prompt)
+        if text is None:
+            self._ensure_chat_ready(live=True)
+            resp = self.chat.send_message(prompt, config=self._json_config(kind))
+            text = resp.text
+            self.llm_cache.store(self.model_name, self.cache_identity, kind, prompt, text)
+        return self._load_structured(text, kind)
+
+    def _send_text(self, prompt, kind):
+        """Plain chat message, recorded/replayed through the LLM cache like structured requests."""
+        text = self.llm_cache.lookup(self.model_name, self.cache_identity, kind, prompt)
+        if text is None:
+            self._ensure_chat_ready(live=True)
+            text = self.chat.send_message(prompt).text
+            self.llm_cache.store(self.model_name, self.cache_identity, kind, prompt, text)
+        return text
+
+    def _load_structured(self, text, kind):
+        """
+        Schema-constrained replies are plain JSON that already has the right shape, so they
+        skip the brace scraping and the sanitizer; anything else takes the old lenient path.
+        """
+        try:
+            data = json.loads(text)
+        except (TypeError, ValueError):
+            return self._parse_json(text or "")
+        return self._checked(data, kind)
+
+    def _checked(self, data, kind):
+        """Returns `data` untouched if it matches the schema, otherwise the sanitized version."""
+        errors = llm_schemas.validate(data, self.response_schemas[kind])
+        if not errors:
+            return data
+        print(f"⚠️ Architect: {kind} response does not match its schema ({errors[0]}), sanitizing.")
+        return self._sanitize_response(data)
 
     def _parse_json(self, text):
         """Extrahiert JSON, selbst wenn das LLM drumherum plaudert."""
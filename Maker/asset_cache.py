@@ -0,0 +1,157 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'cache', 'assets')
+DEFAULT_MAX_SIZE_MB = 2048
+
+
+class AssetCache:
+    """
+    Content-addressed on-disk cache for generated assets (SD images, ElevenLabs audio).
+
+    Entries are keyed by a hash of everything that determines the output (see `make_key`)
+    and stored as <root>/<key[:2]>/<key><ext>. A small SQLite index tracks size and last
+    access time for LRU eviction once the cache grows beyond `max_bytes`, plus persistent
+    hit/miss counters.
+    """
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_SIZE_MB * 1024 * 1024):
+        self.root = os.path.abspath(root)
+        self.max_bytes = int(max_bytes)
+        self.db_path = os.path.join(self.root, "index.db")
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS entries (
+                                key TEXT PRIMARY KEY, path TEXT, size INTEGER,
+                                kind TEXT, last_access REAL)""")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_access ON entries(last_access)")
+            conn.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER)")
+            conn.executemany("INSERT OR IGNORE INTO stats VALUES (?, 0)", [("hits",), ("misses",), ("evictions",)])
+
+    @classmethod
+    def from_config(cls, config):
+        """Builds the cache from book_config.json's `asset_cache` block; returns None when disabled."""
+        cache_cfg = (config or {}).get("asset_cache", {})
+        if not cache_cfg.get("enabled", True):
+            return None
+        root = cache_cfg.get("path") or DEFAULT_CACHE_DIR
+        max_mb = float(cache_cfg.get("max_size_mb", DEFAULT_MAX_SIZE_MB))
+        try:
+            return cls(root, max_bytes=max_mb * 1024 * 1024)
+        except Exception as e:
+            print(f"⚠️ Asset cache unavailable: {e}")
+            return None
+
+    @staticmethod
+    def make_key(**parts):
+        """Stable hash over all generation parameters (order-independent)."""
+        blob = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _bump(self, conn, name, amount=1):
+        conn.execute("UPDATE stats SET value = value + ? WHERE name = ?", (amount, name))
+
+    def fetch(self, key, dest_path):
+        """Copies a cached asset to dest_path. Returns True on a hit."""
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT path FROM entries WHERE key = ?", (key,)).fetchone()
+            if row and os.path.exists(row[0]):
+                os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+                # Copy + rename, so a reader never sees a half-written file
+                tmp = f"{dest_path}.{threading.get_ident()}.tmp"
+                shutil.copyfile(row[0], tmp)
+                os.replace(tmp, dest_path)
+                conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+                self._bump(conn, "hits")
+                return True
+            if row:
+                # Index points at a file that was removed behind our back
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._bump(conn, "misses")
+            return False
+
+    def fetch_all(self, keys, dest_paths):
+        """
+        Copies the cached assets for all `keys` to `dest_paths`, but only if every key hits;
+        otherwise nothing is copied (the caller renders the whole batch anyway). Returns True on a hit.
+        """
+        with self._lock, self._connect() as conn:
+            sources = []
+            for key in keys:
+                row = conn.execute("SELECT path FROM entries WHERE key = ?", (key,)).fetchone()
+                if row and not os.path.exists(row[0]):
+                    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    row = None
+                sources.append(row[0] if row else None)
+            missing = sum(1 for src in sources if src is None)
+            if missing or not sources:
+                self._bump(conn, "misses", missing)
+                return False
+            for src, dest_path in zip(sources, dest_paths):
+                os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+                tmp = f"{dest_path}.{threading.get_ident()}.tmp"
+                shutil.copyfile(src, tmp)
+                os.replace(tmp, dest_path)
+            conn.executemany("UPDATE entries SET last_access = ? WHERE key = ?", [(time.time(), k) for k in keys])
+            self._bump(conn, "hits", len(sources))
+            return True
+
+    def store(self, key, src_path, kind="asset"):
+        """Adds a freshly generated file to the cache, then evicts down to the size budget."""
+        if not os.path.exists(src_path):
+            return
+        ext = os.path.splitext(src_path)[1]
+        target = os.path.join(self.root, key[:2], f"{key}{ext}")
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = f"{target}.{threading.get_ident()}.tmp"
+        shutil.copyfile(src_path, tmp)
+        os.replace(tmp, target)
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                         (key, target, os.path.getsize(target), kind, time.time()))
+            self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, path, size in conn.execute("SELECT key, path, size FROM entries ORDER BY last_access ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except Exception as e:
+                print(f"⚠️ Asset cache could not evict {path}: {e}")
+                continue
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        if evicted:
+            self._bump(conn, "evictions", evicted)
+            print(f"🧹 Asset cache evicted {evicted} entries (LRU)")
+
+    def stats(self):
+        """Returns {'hits', 'misses', 'evictions', 'entries', 'size_bytes'}."""
+        with self._connect() as conn:
+            stats = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        stats.update({"entries": entries, "size_bytes": size})
+        return stats
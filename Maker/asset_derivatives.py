@@ -0,0 +1,158 @@
+import os
+import json
+import tempfile
+import threading
+
+try:
+    from PIL import Image
+except ImportError:  # derivatives are optional; without Pillow everything falls back to the PNGs
+    Image = None
+
+INDEX_NAME = "asset_index.json"
+DEFAULT_THUMB_SIZE = 320
+DEFAULT_WEBP_QUALITY = 80
+
+
+class AssetDerivatives:
+    """
+    Small, web-friendly copies of a project's PNG assets.
+
+    For every image in assets/ a thumbnail (assets/thumbs/<name>.webp, longest side
+    `thumb_size`) and a compressed full-size WebP (assets/webp/<name>.webp) are written, and
+    recorded in assets/asset_index.json, keyed by the PNG's file name:
+        {"scene_main.png": {"thumb": "thumbs/scene_main.webp", "webp": "webp/scene_main.webp",
+                            "width": 512, "height": 724, "mtime_ns": ...}}
+    The dashboard shows the thumbnails and the Player prefers the WebP, falling back to the
+    PNG whenever an entry is missing. An entry whose PNG did not change is never re-encoded.
+    """
+
+    _locks = {}
+
+    def __init__(self, assets_dir, thumb_size=DEFAULT_THUMB_SIZE, webp_quality=DEFAULT_WEBP_QUALITY):
+        self.assets_dir = os.path.abspath(assets_dir)
+        self.index_path = os.path.join(self.assets_dir, INDEX_NAME)
+        self.thumb_size = int(thumb_size)
+        self.webp_quality = int(webp_quality)
+        self._lock = AssetDerivatives._locks.setdefault(self.index_path, threading.Lock())
+
+    @classmethod
+    def from_config(cls, config, assets_dir):
+        """Builds the stage from book_config.json's `asset_derivatives` block; None when disabled or without Pillow."""
+        cfg = (config or {}).get("asset_derivatives", {})
+        if not cfg.get("enabled", True) or Image is None:
+            return None
+        return cls(assets_dir,
+                   thumb_size=cfg.get("thumb_size", DEFAULT_THUMB_SIZE),
+                   webp_quality=cfg.get("webp_quality", DEFAULT_WEBP_QUALITY))
+
+    # --- Public API --------------------------------------------------------------
+    def derive(self, png_path):
+        """Creates (or refreshes) the derivatives of one image. Returns its index entry or None."""
+        with self._lock:
+            index = self._load()
+            entry = self._derive(png_path, index)
+            self._save(index)
+            return entry
+
+    def derive_all(self):
+        """Publish step: brings every PNG in assets/ up to date and drops entries of removed files."""
+        with self._lock:
+            index = self._load()
+            names = set()
+            if os.path.isdir(self.assets_dir):
+                for e in os.scandir(self.assets_dir):
+                    if e.is_file() and e.name.lower().endswith(".png"):
+                        names.add(e.name)
+                        self._derive(e.path, index)
+            for name in [n for n in index if n not in names]:
+                self._drop(name, index)
+            self._save(index)
+            return len(index)
+
+    def discard(self, png_path):
+        """Removes the derivatives (and index entry) of a deleted or moved image."""
+        with self._lock:
+            index = self._load()
+            if self._drop(os.path.basename(png_path), index):
+                self._save(index)
+
+    def thumbnail(self, png_path):
+        """Path of the thumbnail for png_path (created on demand), or png_path itself when none can be made."""
+        entry = self._load().get(os.path.basename(png_path))
+        if not entry or not os.path.exists(os.path.join(self.assets_dir, entry["thumb"])):
+            entry = self.derive(png_path)
+        return os.path.join(self.assets_dir, entry["thumb"]) if entry else png_path
+
+    # --- Internals ---------------------------------------------------------------
+    def _derive(self, png_path, index):
+        name = os.path.basename(png_path)
+        try:
+            mtime = os.stat(png_path).st_mtime_ns
+        except OSError:
+            self._drop(name, index)
+            return None
+        entry = index.get(name)
+        if entry and entry.get("mtime_ns") == mtime and all(
+                os.path.exists(os.path.join(self.assets_dir, entry[k])) for k in ("thumb", "webp")):
+            return entry
+
+        stem = os.path.splitext(name)[0]
+        entry = {"thumb": f"thumbs/{stem}.webp", "webp": f"webp/{stem}.webp"}
+        try:
+            with Image.open(png_path) as img:
+                img.load()
+                entry["width"], entry["height"] = img.size
+                if img.mode not in ("RGB", "RGBA"):
+                    img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+                self._write_webp(img, entry["webp"], quality=self.webp_quality)
+                thumb = img.copy()
+                thumb.thumbnail((self.thumb_size, self.thumb_size))
+                self._write_webp(thumb, entry["thumb"], quality=max(self.webp_quality - 10, 50))
+        except Exception as e:
+            print(f"⚠️ Could not create derivatives for {name}: {e}")
+            return None
+        entry["mtime_ns"] = mtime
+        index[name] = entry
+        return entry
+
+    def _write_webp(self, img, rel_path, quality):
+        path = os.path.join(self.assets_dir, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".derivative.", suffix=".tmp", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                img.save(f, format="WEBP", quality=quality, method=4)
+            os.replace(tmp, path)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def _drop(self, name, index):
+        entry = index.pop(name, None)
+        if not entry:
+            return False
+        for key in ("thumb", "webp"):
+            path = os.path.join(self.assets_dir, entry.get(key, ""))
+            if entry.get(key) and os.path.exists(path):
+                os.remove(path)
+        return True
+
+    def _load(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, index):
+        os.makedirs(self.assets_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".asset_index.", suffix=".tmp", dir=self.assets_dir)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(index, f, indent=4)
+            os.replace(tmp, self.index_path)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
@@ -0,0 +1,72 @@
+"""
+Seamless loop synthesis for ambience tracks (NumPy, mono PCM).
+
+A clip x of N samples becomes a loop y = x[X:e] whose last X samples are an equal-power
+crossfade from x[e-X:e] into the head x[0:X]. Playback therefore runs ... x[X-1] -> y[0] = x[X]
+... across the seam without a jump. The loop end e is picked by normalised cross-correlation
+so the crossfade blends material that already resembles the head (no dip, no phasing).
+Everything runs as whole-array operations; there are no per-segment copies.
+"""
+
+try:
+    import numpy as np
+except ImportError:  # streamlit ships numpy; without it sound_weaver keeps the plain fade processing
+    np = None
+
+NUMPY_AVAILABLE = np is not None
+PEAK_HEADROOM_DB = 0.1
+
+
+def find_loop_end(samples, crossfade, target_end, search):
+    """
+    Returns the loop end e in [target_end - search, target_end] whose preceding `crossfade`
+    samples correlate best with the first `crossfade` samples (FFT cross-correlation).
+    """
+    head = samples[:crossfade]
+    first = max(2 * crossfade, target_end - search)
+    if first >= target_end:
+        return target_end
+    region = samples[first - crossfade:target_end]
+    n = len(region) + crossfade
+    corr = np.fft.irfft(np.fft.rfft(region, n) * np.conj(np.fft.rfft(head, n)), n)[:len(region) - crossfade + 1]
+    # Energy of every window of `region`, via a cumulative sum
+    energy = np.concatenate(([0.0], np.cumsum(region.astype(np.float64) ** 2)))
+    window_energy = energy[crossfade:] - energy[:-crossfade]
+    norm = np.sqrt(np.maximum(window_energy, 0.0) * float(np.dot(head, head))) + 1e-12
+    return first + int(np.argmax(corr / norm))
+
+
+def make_seamless_loop(samples, sample_rate, length_seconds=None, crossfade_ms=250, search_ms=500):
+    """
+    Builds a gapless loop (float32, -1..1) from mono samples. The loop is at most
+    `length_seconds` long (default: the clip minus the crossfade).
+    """
+    x = np.asarray(samples, dtype=np.float32)
+    crossfade = min(int(sample_rate * crossfade_ms / 1000), len(x) // 4)
+    if crossfade < 2:
+        return x.copy()
+    target_end = len(x)
+    if length_seconds:
+        target_end = min(target_end, int(length_seconds * sample_rate) + crossfade)
+    end = find_loop_end(x, crossfade, target_end, int(sample_rate * search_ms / 1000))
+
+    t = np.linspace(0.0, np.pi / 2, crossfade, endpoint=False, dtype=np.float32)
+    y = x[crossfade:end].copy()
+    y[-crossfade:] = x[end - crossfade:end] * np.cos(t) + x[:crossfade] * np.sin(t)
+    return y
+
+
+def normalize_peak(samples, headroom_db=PEAK_HEADROOM_DB):
+    """Peak normalisation (same target as pydub.effects.normalize)."""
+    peak = float(np.max(np.abs(samples))) if len(samples) else 0.0
+    if peak <= 0.0:
+        return samples
+    return samples * np.float32(10 ** (-headroom_db / 20) / peak)
+
+
+def from_int16(pcm_bytes):
+    return np.frombuffer(pcm_bytes, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def to_int16(samples):
+    return (np.clip(samples, -1.0, 1.0) * 32767.0).astype(np.int16).tobytes()
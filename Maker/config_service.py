@@ -0,0 +1,124 @@
+import os
+import json
+import tempfile
+import threading
+import weakref
+from session_manager import CONFIG_PATH
+
+DEFAULT_CONFIG = {"book_id": "unknown_book", "llm_model": "gemini-2.0-flash-exp"}
+# Blocks that callers read with .get(...).get(...); anything else there would crash them
+SECTION_KEYS = ("generation", "sd_settings", "visual_settings", "traits", "character_map",
+                "asset_cache", "asset_derivatives", "sound_settings")
+
+
+class ConfigService:
+    """
+    Process-wide cached book_config.json.
+
+    The file is parsed and validated once; `get` only stats it and re-reads when its mtime or
+    size changed (edits from another process or by hand are picked up on the next call).
+    `save` writes atomically and refreshes the cache. Subscribers are called with the new
+    config whenever it changes; bound methods are held weakly, so an object that subscribed
+    does not outlive its last reference (Streamlit recreates VisualWeaver on every rerun).
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path=CONFIG_PATH):
+        self.path = os.path.abspath(path)
+        self._lock = threading.RLock()
+        self._config = None
+        self._stamp = None
+        self._subscribers = []
+
+    @classmethod
+    def shared(cls, path=CONFIG_PATH):
+        key = os.path.abspath(path)
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(key)
+            return cls._instances[key]
+
+    def get(self):
+        """The current config. Shared between callers: copy before changing it (see load_config)."""
+        with self._lock:
+            stamp = self._file_stamp()
+            if self._config is None or stamp != self._stamp:
+                previous = self._config
+                self._config, self._stamp = self._read(), stamp
+                if previous is not None and previous != self._config:
+                    self._notify()
+            return self._config
+
+    def save(self, config):
+        """Atomic write (temp file + os.replace); returns the config as stored."""
+        with self._lock:
+            config = self.validate(config)
+            folder = os.path.dirname(self.path)
+            fd, tmp = tempfile.mkstemp(prefix=".book_config.", suffix=".tmp", dir=folder)
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(config, f, indent=4)
+                os.replace(tmp, self.path)
+            except Exception:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+            changed = config != self._config
+            self._config, self._stamp = config, self._file_stamp()
+            if changed:
+                self._notify()
+            return config
+
+    def subscribe(self, callback):
+        """Calls callback(config) after every change. Returns an unsubscribe function."""
+        ref = weakref.WeakMethod(callback) if hasattr(callback, "__self__") else (lambda: callback)
+        with self._lock:
+            self._subscribers.append(ref)
+        return lambda: self._subscribers.remove(ref) if ref in self._subscribers else None
+
+    def _notify(self):
+        alive = []
+        for ref in self._subscribers:
+            callback = ref()
+            if callback is None:
+                continue
+            alive.append(ref)
+            try:
+                callback(self._config)
+            except Exception as e:
+                print(f"⚠️ Config subscriber failed: {e}")
+        self._subscribers = alive
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return dict(DEFAULT_CONFIG)
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                content = f.read().strip()
+            if not content:
+                return dict(DEFAULT_CONFIG)
+            return self.validate(json.loads(content))
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"⚠️ Config Load Error: {e}")
+            return dict(DEFAULT_CONFIG)
+
+    @staticmethod
+    def validate(config):
+        """Checks the shape callers rely on; broken sections are dropped with a warning."""
+        if not isinstance(config, dict):
+            print("⚠️ book_config.json does not contain an object; using defaults.")
+            return dict(DEFAULT_CONFIG)
+        for key in SECTION_KEYS:
+            if key in config and not isinstance(config[key], dict):
+                print(f"⚠️ book_config.json: '{key}' must be an object, ignoring {config[key]!r}")
+                config = {k: v for k, v in config.items() if k != key}
+        return config
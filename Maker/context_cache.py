@@ -0,0 +1,72 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+
+DEFAULT_REGISTRY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'cache', 'gemini_contexts.json')
+
+
+class ContextCacheRegistry:
+    """
+    Local registry of Gemini context caches, so a book is uploaded once per TTL instead of
+    on every new AutonomousArchitect.
+
+    Entries map (book content hash, model, system instruction hash) to the server-side
+    cache name and its expiry (unix time). The registry is a small JSON file written
+    atomically; the server stays the source of truth, so callers verify an entry with
+    `client.caches.get` before using it and `forget` it if the cache is gone.
+    """
+
+    def __init__(self, path=DEFAULT_REGISTRY_PATH):
+        self.path = os.path.abspath(path)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(book_text, model, instruction):
+        book_hash = hashlib.sha256(book_text.encode("utf-8")).hexdigest()
+        instruction_hash = hashlib.sha256((instruction or "").encode("utf-8")).hexdigest()
+        return f"{model}|{book_hash}|{instruction_hash}"
+
+    def _read(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, entries):
+        folder = os.path.dirname(self.path)
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".gemini_contexts.", suffix=".tmp", dir=folder)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entries, f, indent=4)
+            os.replace(tmp, self.path)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def get(self, key, min_remaining=60):
+        """Returns {'name', 'expires_at'} for a cache that is still valid for `min_remaining` seconds."""
+        entry = self._read().get(key)
+        if entry and entry.get("expires_at", 0) - time.time() > min_remaining:
+            return entry
+        return None
+
+    def put(self, key, name, expires_at, display_name=""):
+        with self._lock:
+            entries = self._read()
+            now = time.time()
+            # Drop expired entries while we are at it
+            entries = {k: v for k, v in entries.items() if v.get("expires_at", 0) > now}
+            entries[key] = {"name": name, "expires_at": float(expires_at), "display_name": display_name}
+            self._write(entries)
+
+    def forget(self, key):
+        with self._lock:
+            entries = self._read()
+            if entries.pop(key, None) is not None:
+                self._write(entries)
@@ -0,0 +1,113 @@
+import re
+import hashlib
+import threading
+
+KNOT_RE = re.compile(r'^\s*={2,}\s*([\w.]+)')
+SENTENCE_END_RE = re.compile(r'(?<=[.!?…])\s')
+
+
+class InkContextBuilder:
+    """
+    Builds the "story so far" the Architect sends to the LLM from an .ink script, within a
+    token budget instead of a fixed number of knots.
+
+    The script is split into the header (VAR lines) and one block per main scene (its
+    `_result_` knots stay with it). The newest scenes are kept verbatim, older ones are
+    reduced to a one-line summary, and the oldest are dropped once the budget is used up.
+    Scenes that may stay verbatim are measured with `count_tokens(text)` (the model's counter);
+    summary lines are estimated from the chars-per-token ratio seen so far. Counts and
+    summaries are memoized by content hash, so each scene is measured and summarized once.
+    """
+
+    def __init__(self, count_tokens, budget_tokens=6000, recent_knots=3):
+        self.count_tokens = count_tokens
+        self.budget_tokens = int(budget_tokens)
+        self.recent_knots = max(1, int(recent_knots))
+        self._tokens = {}
+        self._summaries = {}
+        self._chars = 0
+        self._counted = 0
+        self._lock = threading.Lock()
+
+    # --- Public API --------------------------------------------------------------
+    def build(self, script):
+        header, blocks = self.split(script)
+        if not blocks:
+            return script
+
+        budget = self.budget_tokens - self.tokens(header)
+        parts = []  # newest first
+        for age, (name, text) in enumerate(reversed(blocks)):
+            if age < self.recent_knots:
+                cost = self.tokens(text)
+                # The newest scene is always kept in full, even if it alone exceeds the budget
+                if age == 0 or cost <= budget:
+                    parts.append(text)
+                    budget -= cost
+                    continue
+            line = f"// {name}: {self.summary(name, text)}"
+            cost = self.estimate(line)
+            if cost > budget:
+                omitted = len(blocks) - age
+                parts.append(f"// ({omitted} earlier scene{'s' if omitted != 1 else ''} omitted)")
+                break
+            parts.append(line)
+            budget -= cost
+
+        return header + "\n\n" + "\n".join(reversed(parts))
+
+    @staticmethod
+    def split(script):
+        """Returns (header, [(scene name, block text), ...]) with result knots grouped under their scene."""
+        header, blocks = [], []
+        for line in script.splitlines():
+            m = KNOT_RE.match(line)
+            if m and ("_result_" not in m.group(1) or not blocks):
+                blocks.append([m.group(1), [line]])
+            elif blocks:
+                blocks[-1][1].append(line)
+            elif line.strip().startswith("VAR "):
+                header.append(line)
+        return "\n".join(header), [(name, "\n".join(lines).strip()) for name, lines in blocks]
+
+    def estimate(self, text):
+        """Cheap count for short summary lines, calibrated on the scenes measured so far."""
+        with self._lock:
+            ratio = self._chars / self._counted if self._counted else 4.0
+        return int(len(text) / ratio) + 1
+
+    def tokens(self, text):
+        if not text:
+            return 0
+        key = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            if key in self._tokens:
+                return self._tokens[key]
+        try:
+            count = int(self.count_tokens(text))
+        except Exception as e:
+            print(f"⚠️ Token count failed, estimating: {e}")
+            count = len(text) // 4 + 1
+        with self._lock:
+            self._tokens[key] = count
+            if count:
+                self._chars += len(text)
+                self._counted += count
+        return count
+
+    def summary(self, name, text):
+        """One line per scene: the first sentence of its prose."""
+        key = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            if key in self._summaries:
+                return self._summaries[key]
+        prose = " ".join(
+            l.strip() for l in text.splitlines()
+            if l.strip() and not KNOT_RE.match(l) and not l.strip().startswith(("#", "*", "+", "~", "->", "//", "VAR "))
+        )
+        line = SENTENCE_END_RE.split(prose, 1)[0] if prose else name.replace("_", " ")
+        if len(line) > 160:
+            line = line[:157].rstrip() + "..."
+        with self._lock:
+            self._summaries[key] = line
+        return line
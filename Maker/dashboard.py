@@ -12,9 +12,12 @@ from architect import AutonomousArchitect
 from visual_weaver import VisualWeaver
 from ink_smith import InkSmith
 from sound_weaver import SoundWeaver
+from scene_prefetcher import ScenePrefetcher
+from project_index import ProjectIndex
 from utils import DashboardUtils
 from session_manager import initialize_session_state, current_dir, BOOKS_DIR, CONFIG_PATH, DEFAULT_LLMS
-from ui_components import render_character_selection, render_scene_editor, render_sidebar_tabs, render_art_selection
+from ui_components import (render_character_selection, render_scene_editor, render_sidebar_tabs, render_art_selection,
+                           render_story_pack_wait, render_story_pack_job, start_compile_job, render_compile_status)
 
 initialize_session_state()
 
@@ -67,28 +70,10 @@ book_path = os.path.join(BOOKS_DIR, active_book_filename)
 title = current_config.get("title", "New Adventure")
 active_project_dir = DashboardUtils.get_project_output_dir(book_id=active_book_id, title=title)
 
-# Check for existing projects for this book
-output_dir = os.path.join(current_dir, "..", "data", "output")
-existing_projects = []
-if os.path.exists(output_dir):
-    for folder in os.listdir(output_dir):
-        folder_path = os.path.join(output_dir, folder)
-        if os.path.isdir(folder_path):
-            # Check if this project is for the current book
-            config_path = os.path.join(folder_path, "book_config.json")
-            if os.path.exists(config_path):
-                try:
-                    with open(config_path, 'r', encoding='utf-8') as f:
-                        project_config = json.load(f)
-                        if project_config.get('book_id') == active_book_id:
-                            project_title = project_config.get('title', folder.replace('_', ' ').title())
-                            existing_projects.append({
-                                'id': folder,
-                                'title': project_title,
-                                'path': folder_path
-                            })
-                except:
-                    pass
+# Check for existing projects for this book (SQLite index kept current by a watchdog observer)
+project_index = ProjectIndex.shared()
+project_index.watch()
+existing_projects = project_index.projects_for_book(active_book_id)
 
 # Smith object is only created when a session actually starts (new or resume).
 # Avoid instantiating here, because doing so would create the project directory as
@@ -129,6 +114,29 @@ def get_resume_state(file_path):
     except:
         return None
 
+def stop_prefetcher():
+    """Shuts down the background scene prefetcher (if any) and drops it from the session."""
+    prefetcher = st.session_state.pop("prefetcher", None)
+    if prefetcher:
+        prefetcher.shutdown()
+
+def ensure_prefetcher(config):
+    """Returns the session's ScenePrefetcher, creating it on first use in story-pack mode."""
+    if not st.session_state.get("story_pack_mode") or "weaver" not in st.session_state:
+        return None
+    lookahead = int(config.get("generation", {}).get("prefetch_lookahead", 2))
+    if lookahead <= 0:
+        return None
+    if "prefetcher" not in st.session_state:
+        project_dir = st.session_state.get("active_project_path", DashboardUtils.get_project_output_dir(book_id=config.get("book_id")))
+        st.session_state.prefetcher = ScenePrefetcher(
+            st.session_state.weaver,
+            os.path.basename(project_dir),
+            config.get("generation", {}),
+            lookahead=lookahead
+        )
+    return st.session_state.prefetcher
+
 # 3. Render Title (ONLY ONCE)
     col_title, col_stop = st.columns([3, 1])
     with col_title:
@@ -138,6 +146,10 @@ def get_resume_state(file_path):
             if st.button("🚫 Stop & Reset", type="secondary", use_container_width=True):
                 st.session_state.engine_ready = False
                 st.rerun()
+
+# Outcome of a background compile (sidebar button, finale or finish)
+render_compile_status()
+
 # ==========================================
 # 🛑 STATE 1: SELECTION MENU (Engine OFF)
 # ==========================================
@@ -151,21 +163,14 @@ if not st.session_state.engine_ready:
         st.caption("Erase history and start from the Intro.")
         one_shot_mode = True
         scene_count_input = int(current_config.get("generation", {}).get("target_scene_count", 12))
-        if scene_count_input >= 40:
-            st.warning("Large one-shot outputs can fail or get truncated. Continue only if you accept retry risk.")
+        if scene_count_input >= 40 and current_config.get("generation", {}).get("story_pack_strategy", "single") != "outline":
+            st.warning("Large one-shot outputs can fail or get truncated. Switch 'Story Pack Generation' to 'Outline + parallel scenes' or accept retry risk.")
         st.caption(f"Using Scenes per Book from config: {scene_count_input}")
         
         # Check if old files exist for this book
         output_dir = active_project_dir
-        assets_dir = os.path.join(output_dir, "assets")
-        audio_dir = os.path.join(output_dir, "audio")
         old_files_exist = False
-        old_file_count = 0
-        
-        if os.path.exists(assets_dir):
-            old_file_count += len([f for f in os.listdir(assets_dir) if f.endswith(('.png', '.jpg', '.jpeg'))])
-        if os.path.exists(audio_dir):
-            old_file_count += len([f for f in os.listdir(audio_dir) if f.endswith(('.mp3', '.wav', '.ogg'))])
+        old_file_count = sum(project_index.asset_counts(output_dir))
         
         old_files_exist = old_file_count > 0
         
@@ -176,6 +181,7 @@ if not st.session_state.engine_ready:
             # Allow starting a new project immediately; cleanup happens automatically
             if st.button("🚀 Start New Adventure", type="primary", use_container_width=True, key="btn_new_project"):
                 # Delete old files (user was warned above)
+                stop_prefetcher()
                 deleted_count, success = DashboardUtils.cleanup_old_adventure_files(active_book_id, confirm_first=True)
 
                 if success:
@@ -215,6 +221,7 @@ if not st.session_state.engine_ready:
             # No old files, proceed normally
             # Unique Key: btn_new_project
             if st.button("🚀 Start New Adventure    ", type="primary", use_container_width=True, key="btn_new_project"):
+                stop_prefetcher()
                 DashboardUtils.cleanup_old_adventure_files(active_book_id, confirm_first=False)
                 weaver = VisualWeaver()
                 print(f"ℹ️ VisualWeaver SD model on Start New Adventure: {getattr(weaver, 'sd_model', None)}")
@@ -274,6 +281,11 @@ if not st.session_state.engine_ready:
                         st.session_state.smith = InkSmith(current_config["book_id"])
                         st.session_state.architect = AutonomousArchitect(source_book_path)
                         pack_data = DashboardUtils.load_story_pack(current_config["book_id"])
+                        if pack_data and pack_data["meta"].get("streaming") and not DashboardUtils.story_pack_stream_alive(
+                                DashboardUtils.get_story_pack_path(current_config["book_id"])):
+                            # A streamed pack whose generator is gone (app restart, cut-off stream): keep what arrived
+                            DashboardUtils.finish_story_pack_stream(DashboardUtils.get_story_pack_path(current_config["book_id"]))
+                            pack_data = DashboardUtils.load_story_pack(current_config["book_id"])
                         if pack_data and isinstance(pack_data.get("scenes"), list) and pack_data.get("scenes"):
                             next_idx = int(pack_data.get("progress", {}).get("next_index", 0))
                             st.session_state.story_pack_mode = next_idx < len(pack_data.get("scenes", []))
@@ -339,6 +351,7 @@ else:
                 col_yes, col_no = st.columns(2)
                 with col_yes:
                     if st.button("Confirm Stop", type="primary", key="btn_stop_final", use_container_width=True):
+                        stop_prefetcher()
                         st.session_state.engine_ready = False
                         st.session_state.scene_data = None
                         st.session_state.confirm_stop = False
@@ -464,32 +477,64 @@ else:
                     if st.session_state.get("story_pack_mode"):
                         # Generate once, persist to disk, then consume scenes one by one.
                         story_pack = DashboardUtils.load_story_pack(current_config["book_id"])
-                        if not story_pack:
+                        pack_strategy = current_config.get("generation", {}).get("story_pack_strategy", "single")
+                        if not story_pack and pack_strategy == "stream":
+                            # Scenes are appended to the pack as they arrive; start editing with the first one.
                             saved_char = DashboardUtils.get_protagonist_from_ink(current_config["book_id"])
                             p_name = saved_char.get('name') if saved_char else None
                             scene_target = int(st.session_state.get("story_pack_target_scenes", 12))
-                            generated_pack = st.session_state.architect.generate_story_pack(
-                                protagonist_name=p_name,
-                                scene_count=scene_target
+                            path = DashboardUtils.start_story_pack_stream(
+                                st.session_state.architect.book_path, current_config["book_id"],
+                                protagonist_name=p_name, scene_count=scene_target
                             )
-                            if not generated_pack:
-                                st.error("Story pack generation failed. Try a smaller scene count.")
-                                st.stop()
-                            path = DashboardUtils.create_story_pack(current_config["book_id"], generated_pack)
-                            if not path:
-                                st.error("Could not persist generated story pack to disk.")
-                                st.stop()
-                            st.info(f"Saved story pack: {path}")
+                            story_pack = DashboardUtils.load_story_pack_file(path)
+                        elif not story_pack:
+                            # Runs as a background job; the fragment reruns the app once the pack is on disk
+                            saved_char = DashboardUtils.get_protagonist_from_ink(current_config["book_id"])
+                            render_story_pack_job({
+                                "book_path": st.session_state.architect.book_path,
+                                "pack_path": DashboardUtils.get_story_pack_path(current_config["book_id"]),
+                                "protagonist_name": saved_char.get('name') if saved_char else None,
+                                "scene_count": int(st.session_state.get("story_pack_target_scenes", 12))
+                            })
+                        pack_job = st.session_state.pop("story_pack_result", None)
+                        if pack_job:
+                            st.info(f"Saved story pack: {pack_job['pack_path']}")
+                            failed_scenes = pack_job.get("failed_scenes")
+                            if failed_scenes:
+                                st.warning(f"⚠️ {len(failed_scenes)} outlined scene(s) could not be written and were folded into their neighbours: {', '.join(failed_scenes)}")
 
                         idx, total, next_scene = DashboardUtils.get_next_story_pack_scene(current_config["book_id"])
                         st.session_state.story_pack_index = idx if idx is not None else total
                         st.session_state.story_pack_total = total
+                        if next_scene is None and story_pack.get("meta", {}).get("streaming"):
+                            pack_path = DashboardUtils.get_story_pack_path(current_config["book_id"])
+                            if DashboardUtils.story_pack_stream_alive(pack_path):
+                                # The director is ahead of the stream: poll for the next scene without blocking
+                                render_story_pack_wait(pack_path, total)
+                            DashboardUtils.finish_story_pack_stream(pack_path)
+                            idx, total, next_scene = DashboardUtils.get_next_story_pack_scene(current_config["book_id"])
+                            st.session_state.story_pack_index = idx if idx is not None else total
+                            st.session_state.story_pack_total = total
+                        if total == 0:
+                            st.error("Story pack generation failed. Try a smaller scene count.")
+                            if pack_strategy == "stream" and st.button("🔄 Retry", key="retry_story_pack"):
+                                saved_char = DashboardUtils.get_protagonist_from_ink(current_config["book_id"])
+                                DashboardUtils.start_story_pack_stream(
+                                    st.session_state.architect.book_path, current_config["book_id"],
+                                    protagonist_name=saved_char.get('name') if saved_char else None,
+                                    scene_count=int(st.session_state.get("story_pack_target_scenes", 12))
+                                )
+                                st.rerun()
+                            st.stop()
                         if next_scene is None:
                             st.session_state.current_step = "finished"
                             st.session_state.adventure_finished = True
                             st.rerun()
                         data = next_scene
                         st.session_state.node_id = data.get('scene_id', f"scene_{(idx or 0) + 1}")
+                        DashboardUtils.link_story_pack_placeholder(
+                            st.session_state.smith, current_config["book_id"], st.session_state.node_id)
 
                     elif st.session_state.node_id == "intro":
                         saved_char = DashboardUtils.get_protagonist_from_ink(current_config["book_id"])
@@ -497,7 +542,10 @@ else:
                         data = st.session_state.architect.initialize_engine(protagonist_name=p_name)
                     else:
                         is_forced_end = st.session_state.get('force_next_ending', False)
-                        data = st.session_state.architect.generate_main_beat(st.session_state.node_id, force_ending=is_forced_end)
+                        data = st.session_state.architect.generate_main_beat(
+                            st.session_state.node_id, force_ending=is_forced_end,
+                            story_so_far=st.session_state.smith.get_full_script()
+                        )
                         if is_forced_end:
                             st.session_state.force_next_ending = False
                 except Exception as e:
@@ -517,6 +565,14 @@ else:
         scene = st.session_state.scene_data
         st.subheader(f"📝 Review Scene: {scene.get('scene_id', 'Draft')}")
         
+        # Story-pack mode: render this scene and the next ones in the background
+        # while the director reads and edits.
+        prefetcher = ensure_prefetcher(current_config)
+        if prefetcher:
+            prefetcher.schedule(DashboardUtils.get_upcoming_story_pack_scenes(
+                current_config["book_id"], prefetcher.lookahead + 1
+            ))
+
         # FIX: Ensure the submit button is INSIDE the form block
         with st.form("scene_editor_form"):
             txt, vp, ap, updated_choices = render_scene_editor(scene, current_config)
@@ -527,6 +583,9 @@ else:
             st.session_state.scene_data['visual_prompt'] = vp
             st.session_state.scene_data['audio_prompt'] = ap
             st.session_state.scene_data['choices'] = updated_choices
+            # Edited prompts make speculative renders for this scene useless
+            if st.session_state.get("prefetcher"):
+                st.session_state.prefetcher.invalidate(st.session_state.scene_data)
             st.session_state.current_step = "art"
             st.rerun()
 
@@ -551,9 +610,8 @@ else:
             with c_ex1:
                 if st.button("📦 Export .ink to .json", use_container_width=True):
                     # use actual book id; previous code wrongly passed base_id
-                    success, msg = DashboardUtils.compile_ink_to_json(current_config.get("book_id"))
-                    if success: st.success(msg)
-                    else: st.error(msg)
+                    start_compile_job(current_config.get("book_id"), smith.base_dir)
+                    st.rerun()
             with c_ex2:
                 if st.button("🏠 New Start (Library)", use_container_width=True):
                     for k in ['architect', 'current_scene', 'adventure_finished', 'scene_data']:
@@ -588,7 +646,7 @@ else:
                                 try: os.remove(final_img)
                                 except: pass
 
-                        # Save the finale node and immediately compile JSON, then reset state
+                        # Save the finale node, start compiling JSON, then reset state
                         DashboardUtils.finalize_ink_node(base_id, conclusion_data)
                         if st.session_state.get("story_pack_mode"):
                             DashboardUtils.advance_story_pack(current_config["book_id"], conclusion_data)
@@ -598,18 +656,11 @@ else:
                             project_folder = st.session_state.smith.base_dir
                         else:
                             project_folder = DashboardUtils.get_project_output_dir(book_id=book_id)
-                        json_path = os.path.join(project_folder, "adventure.json")
-                        try:
-                            with st.spinner("📦 Compiling .ink to .json..."):
-                                success, msg = DashboardUtils.compile_ink_to_json(book_id)
-                            if success:
-                                st.success(f"{msg} (→ {json_path})")
-                            else:
-                                st.error(msg)
-                        except Exception as e:
-                            st.error(f"Compilation threw an exception: {e}")
+                        # Compiles in the background; the result is shown after the reset below
+                        start_compile_job(book_id, project_folder)
 
                         # shut down production loop and clear session state
+                        stop_prefetcher()
                         st.session_state.engine_ready = False
                         for k in ['architect','smith','weaver','scene_data','current_step','adventure_finished']:
                             st.session_state.pop(k, None)
@@ -630,21 +681,11 @@ else:
                             project_folder = st.session_state.smith.base_dir
                         else:
                             project_folder = DashboardUtils.get_project_output_dir(book_id=book_id)
-                        ink_path = os.path.join(project_folder, "adventure.ink")
-                        json_path = os.path.join(project_folder, "adventure.json")
-
-                        # try compile and report errors, but regardless drop the engine
-                        try:
-                            with st.spinner("📦 Compiling .ink to .json..."):
-                                success, msg = DashboardUtils.compile_ink_to_json(book_id)
-                            if success:
-                                st.success(f"{msg} (→ {json_path})")
-                            else:
-                                st.error(msg)
-                        except Exception as e:
-                            st.error(f"Compilation threw an exception: {e}")
+                        # compile in the background (the result is shown after the reset), and drop the engine
+                        start_compile_job(book_id, project_folder)
 
                         # shut down production loop and clear session state
+                        stop_prefetcher()
                         st.session_state.engine_ready = False
                         for k in ['architect','smith','weaver','scene_data','current_step','adventure_finished']:
                             st.session_state.pop(k, None)
@@ -0,0 +1,79 @@
+"""
+Job targets for JobQueue (see job_queue.py): fn(params, report) -> JSON-serialisable result.
+
+They build their own weavers from book_config.json and never touch st.session_state, so
+they run the same on a worker thread as in the Streamlit script.
+"""
+import os
+
+
+def render_images(params, report):
+    """params: prompt, base_filename, count, output_dir[, api_url, reroll]. Returns the candidate paths."""
+    from visual_weaver import VisualWeaver
+    weaver = VisualWeaver(params.get("api_url", "http://127.0.0.1:7860"), auto_make_dir=False)
+    weaver.output_dir = params["output_dir"]
+    os.makedirs(weaver.output_dir, exist_ok=True)
+    return weaver.generate_batch(
+        prompt=params["prompt"],
+        base_filename=params["base_filename"],
+        count=int(params.get("count", 4)),
+        callback=lambda p, c, t: report(p, f"🎨 Image {c}/{t}"),
+        reroll=int(params.get("reroll", 0))
+    )
+
+
+def render_sounds(params, report):
+    """params: project_folder, scene_id, prompt, count, length_seconds, loop[, reroll]. Returns the candidate entries."""
+    from sound_weaver import SoundWeaver
+    count = int(params.get("count", 1))
+    report(0, f"🎧 Composing {count} audio candidate(s)")
+    return SoundWeaver().generate_candidates(
+        params["project_folder"], params["scene_id"], params["prompt"],
+        count=count,
+        length_seconds=params.get("length_seconds", 5),
+        loop=params.get("loop", False),
+        reroll=int(params.get("reroll", 0))
+    )
+
+
+def stream_story_pack(params, report):
+    """params: book_path, pack_path, scene_count[, protagonist_name]. Appends scenes to the pack as they arrive."""
+    from architect import AutonomousArchitect
+    from utils import DashboardUtils
+    path = params["pack_path"]
+    scene_count = max(1, int(params.get("scene_count", 12)))
+
+    def on_scene(index, scene, meta):
+        DashboardUtils.append_story_pack_scene(path, scene, meta)
+        report(100.0 * (index + 1) / scene_count, f"📨 Scene {index + 1}/{scene_count} received")
+
+    report(0, "🕵️ Architect is drafting the story pack")
+    try:
+        pack = AutonomousArchitect(params["book_path"]).generate_story_pack_streaming(
+            protagonist_name=params.get("protagonist_name"), scene_count=scene_count, on_scene=on_scene)
+    finally:
+        # Also after a broken stream: the scenes received so far become the pack
+        DashboardUtils.finish_story_pack_stream(path)
+    return {"pack_path": path, "scenes": len(pack["scenes"]) if pack else 0}
+
+
+def generate_story_pack(params, report):
+    """params: book_path, pack_path, scene_count[, protagonist_name]. Writes story_pack.json; returns its path."""
+    from architect import AutonomousArchitect
+    from utils import DashboardUtils
+    report(0, "🕵️ Architect is drafting the story pack")
+    pack = AutonomousArchitect(params["book_path"]).generate_story_pack(
+        protagonist_name=params.get("protagonist_name"), scene_count=int(params.get("scene_count", 12)))
+    path = DashboardUtils.create_story_pack_file(params["pack_path"], pack) if pack else None
+    if not path:
+        raise RuntimeError("Story pack generation failed. Try a smaller scene count.")
+    return {"pack_path": path, "failed_scenes": pack.get("meta", {}).get("failed_scenes", [])}
+
+
+def compile_ink(params, report):
+    """params: project_path[, book_id]. Compiles adventure.ink to adventure.json; a failed compile is a result, not an error."""
+    from utils import DashboardUtils
+    report(0, "📦 Compiling .ink to .json")
+    success, message = DashboardUtils.compile_ink_to_json(params.get("book_id"), project_path=params["project_path"])
+    return {"success": success, "message": message,
+            "json_path": os.path.join(params["project_path"], "adventure.json")}
@@ -0,0 +1,154 @@
+import os
+import re
+import base64
+import tempfile
+
+_STRING_SPECIAL = re.compile(rb'["\\]')
+
+
+class _Base64FileWriter:
+    """Decodes one base64 string piecewise into a temp file next to `path`; `close` renames it into place."""
+
+    def __init__(self, path):
+        self.path = path
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        fd, self.tmp = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=folder)
+        self.file = os.fdopen(fd, "wb")
+        self._pending = b""
+        self._header_skipped = False
+
+    def write(self, data):
+        data = self._pending + data.replace(b"\\/", b"/")
+        if not self._header_skipped:
+            # Some WebUI builds prefix a data URI ("data:image/png;base64,")
+            if len(data) < 32 and b"," not in data:
+                self._pending = data
+                return
+            if data.startswith(b"data:"):
+                data = data[data.index(b",") + 1:]
+            self._header_skipped = True
+        cut = len(data) - len(data) % 4
+        self._pending = data[cut:]
+        if cut > 0:
+            self.file.write(base64.b64decode(data[:cut]))
+
+    def close(self):
+        self._header_skipped = True
+        try:
+            if self._pending:
+                self.file.write(base64.b64decode(self._pending + b"=" * (-len(self._pending) % 4)))
+            self.file.close()
+            os.replace(self.tmp, self.path)
+        except Exception:
+            self.abort()
+            raise
+        return self.path
+
+    def abort(self):
+        if not self.file.closed:
+            self.file.close()
+        if os.path.exists(self.tmp):
+            os.remove(self.tmp)
+
+
+class ImageStreamDecoder:
+    """
+    Streams a txt2img JSON response (`{"images": ["<base64>", ...], ...}`) straight to disk.
+
+    Feed the raw response bytes chunk by chunk; every string of the top-level "images" array
+    is base64-decoded as it arrives into a temp file and atomically renamed to
+    `paths[i]` when its closing quote is seen, so memory stays at roughly one chunk and a
+    partially received image is never visible. Other members ("parameters", "info") are
+    skipped. Images beyond len(paths) are ignored.
+    """
+
+    def __init__(self, paths):
+        self.paths = list(paths)
+        self.written = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string = b""       # current key / short string (not image data)
+        self._last_string = None
+        self._key = None
+        self._in_images = False  # inside the top-level "images" array
+        self._writer = None
+        self._index = 0
+
+    def feed(self, chunk):
+        i, n = 0, len(chunk)
+        while i < n:
+            if self._in_string:
+                i = self._consume_string(chunk, i)
+                continue
+            ch = chunk[i:i + 1]
+            if ch == b'"':
+                self._in_string = True
+                self._string = b""
+                if self._in_images and self._depth == 2 and self._index < len(self.paths):
+                    self._writer = _Base64FileWriter(self.paths[self._index])
+            elif ch == b":":
+                if self._depth == 1:
+                    self._key = self._last_string
+            elif ch == b",":
+                if self._depth == 1:
+                    self._key = None
+            elif ch in (b"{", b"["):
+                self._depth += 1
+                if self._depth == 2 and ch == b"[" and self._key == b"images":
+                    self._in_images = True
+            elif ch in (b"}", b"]"):
+                if self._depth == 2 and self._in_images:
+                    self._in_images = False
+                self._depth -= 1
+            i += 1
+        return self.written
+
+    def _consume_string(self, chunk, i):
+        """Jumps to the closing quote (bulk search, not per byte) and routes the bytes. Returns the new offset."""
+        if self._escape:
+            # Second half of an escape sequence that was split across chunks
+            self._escape = False
+            self._route(b"\\" + chunk[i:i + 1])
+            i += 1
+        start = i
+        while True:
+            m = _STRING_SPECIAL.search(chunk, i)
+            if m is None:
+                self._route(chunk[start:])
+                return len(chunk)
+            pos = m.start()
+            if chunk[pos:pos + 1] == b'"':
+                self._route(chunk[start:pos])
+                self._finish_string()
+                return pos + 1
+            if pos + 1 >= len(chunk):
+                self._route(chunk[start:pos])
+                self._escape = True
+                return len(chunk)
+            i = pos + 2  # skip the escaped character
+
+    def _route(self, data):
+        if self._writer:
+            self._writer.write(data)
+        elif len(self._string) < 64:
+            self._string += data[:64]
+
+    def _finish_string(self):
+        self._in_string = False
+        if self._writer:
+            self.written.append(self._writer.close())
+            self._writer = None
+            self._index += 1
+        elif self._in_images and self._depth == 2:
+            self._index += 1  # image beyond the requested paths
+        else:
+            self._last_string = self._string
+
+    def close(self):
+        """Discards an image that was cut off mid-stream. Returns the paths written."""
+        if self._writer:
+            self._writer.abort()
+            self._writer = None
+        return self.written
@@ -0,0 +1,407 @@
+import os
+import re
+import json
+import tempfile
+from collections import namedtuple
+
+INK_VERSION = 21
+
+VAR_RE = re.compile(r'^\s*VAR\s+(\w+)\s*=\s*(.*)$')
+LOGIC_RE = re.compile(r'^~\s*(\w+)\s*=(?!=)\s*(.*)$')
+EXPR_TOKEN_RE = re.compile(r'\s*(?:(\d+\.\d+|\d+)|("[^"{}]*")|([A-Za-z_]\w*)|([-+*/%()]))')
+
+# Per-knot compilation result: the knot's source lines and JSON text, plus what it
+# diverts to / reads / writes for the whole-script checks (re-run on every compile).
+_CompiledKnot = namedtuple("_CompiledKnot", "source json diverts reads writes warnings")
+
+
+class InkCompileError(Exception):
+    """The script is not valid Ink (unknown divert targets, undeclared variables, ...)."""
+
+    def __init__(self, errors):
+        self.errors = list(errors) if isinstance(errors, (list, tuple)) else [str(errors)]
+        super().__init__("\n".join(self.errors))
+
+
+class UnsupportedInkSyntax(InkCompileError):
+    """Valid Ink that the built-in compiler does not handle; use inklecate instead."""
+
+
+class InkCompiler:
+    """
+    In-process compiler for the subset of Ink that InkSmith writes: knots, text, `#` tags,
+    `* [choice] -> target` choices, diverts (incl. END/DONE), `VAR` declarations and
+    `~ var = expression` assignments. Produces the same JSON layout as inklecate
+    (inkVersion 21), which is what player/ink.js loads.
+
+    Knots are compiled independently and cached by their source lines, so recompiling
+    after a save only redoes the knots that changed. Anything outside the subset
+    (gathers, stitches, conditionals, functions, ...) raises UnsupportedInkSyntax.
+    """
+
+    def __init__(self):
+        self._knots = {}
+
+    # --- Public API --------------------------------------------------------------
+    def compile(self, doc, strict=True):
+        """
+        Compiles an InkDocument. Returns (json_text, warnings).
+        With strict=False, diverts to knots that do not exist yet are reported as
+        warnings instead of errors (useful to validate a story that is still being written).
+        """
+        errors, warnings = [], []
+        variables = self._compile_globals(doc.header, errors)
+        root = self._compile_flow("", self._content_lines(doc.header))
+
+        knots = {}
+        for name, lines in doc.knots.items():
+            compiled = self._knots.get(name)
+            source = tuple(lines)
+            if compiled is None or compiled.source != source:
+                compiled = self._compile_knot(name, source)
+                self._knots[name] = compiled
+            knots[name] = compiled
+        for stale in set(self._knots) - set(doc.knots):
+            del self._knots[stale]
+
+        # Whole-script checks (cheap set lookups, also for cached knots)
+        targets = set(doc.knots) | {"END", "DONE"}
+        flows = [("", root)] + list(knots.items())
+        for name, compiled in flows:
+            where = f"knot '{name}'" if name else "top level"
+            warnings.extend(compiled.warnings)
+            for target in sorted(compiled.diverts - targets):
+                msg = f"Divert target not found: -> {target} (in {where})"
+                (errors if strict else warnings).append(msg)
+            for var in sorted((compiled.reads | compiled.writes) - set(variables)):
+                errors.append(f"Unresolved variable: {var} (in {where})")
+
+        if errors:
+            raise InkCompileError(errors)
+
+        named = [f"{json.dumps(name, ensure_ascii=False)}:{compiled.json}" for name, compiled in knots.items()]
+        named.append(f'"global decl":{self._globals_json(variables)}')
+        text = (f'{{"inkVersion":{INK_VERSION},"root":[{root.json},"done",{{{",".join(named)}}}],'
+                f'"listDefs":{{}}}}')
+        return text, warnings
+
+    def compile_file(self, doc, json_path, strict=True):
+        """Compiles and writes json_path atomically. Returns the list of warnings."""
+        text, warnings = self.compile(doc, strict=strict)
+        folder = os.path.dirname(os.path.abspath(json_path))
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".adventure.", suffix=".json.tmp", dir=folder)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, json_path)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return warnings
+
+    # --- Globals -----------------------------------------------------------------
+    @staticmethod
+    def _content_lines(header):
+        return [line for line in header if not VAR_RE.match(line)]
+
+    def _compile_globals(self, header, errors):
+        variables = {}
+        for line in header:
+            m = VAR_RE.match(line)
+            if not m:
+                continue
+            name, rest = m.groups()
+            value, tail = self._parse_literal(rest.strip())
+            if value is None or (tail.strip() and not tail.strip().startswith("//")):
+                raise UnsupportedInkSyntax(f"Unsupported VAR declaration: {line.strip()}")
+            if name in variables:
+                errors.append(f"Variable '{name}' has already been declared")
+            variables[name] = value
+        return variables
+
+    @staticmethod
+    def _parse_literal(text):
+        """Parses a VAR initial value. Returns (value, remaining_text); value None if unsupported."""
+        m = re.match(r'"([^"{}]*)"', text)
+        if m:
+            return ("str", m.group(1)), text[m.end():]
+        m = re.match(r'-?\d+(\.\d+)?(?![\w.])', text)
+        if m:
+            value = float(m.group(0)) if m.group(1) else int(m.group(0))
+            return ("num", value), text[m.end():]
+        m = re.match(r'(true|false)\b', text)
+        if m:
+            return ("bool", m.group(1) == "true"), text[m.end():]
+        return None, text
+
+    @staticmethod
+    def _push_value(value):
+        kind, v = value
+        if kind == "str":
+            return ["str", "^" + v, "/str"]
+        return [v]
+
+    def _globals_json(self, variables):
+        content = ["ev"]
+        for name, value in variables.items():
+            content.extend(self._push_value(value))
+            content.append({"VAR=": name})
+        content.extend(["/ev", "end", None])
+        return self._dumps(content)
+
+    # --- Flow content ------------------------------------------------------------
+    def _compile_knot(self, name, source):
+        return self._compile_flow(name, list(source[1:]))._replace(source=source)
+
+    def _compile_flow(self, name, lines):
+        """
+        Compiles the weave of a knot (or the top-level flow when name is "").
+        Choice points go into the weave; everything after a choice line belongs to
+        that choice's "c-N" container, as in Ink.
+        """
+        weave, choices, warnings = [], [], []
+        diverts, reads, writes = set(), set(), set()
+        current = weave
+        terminated = False
+        base_path = f"{name}.0" if name else "0"
+
+        for raw in lines:
+            line = raw.strip()
+            if not line or line.startswith("//"):
+                continue
+            if line.startswith("VAR "):
+                raise UnsupportedInkSyntax(f"VAR declarations inside knots are not supported: {line}")
+
+            if line[0] in "*+":
+                sticky = line[0] == "+"
+                text, parts = self._parse_choice(line)
+                index = len(choices)
+                weave.extend(["ev", "str", "^" + text, "/str", "/ev",
+                              {"*": f"{base_path}.c-{index}", "flg": 4 if sticky else 20}])
+                current = []
+                choices.append(current)
+                terminated = self._emit_parts(current, parts, diverts, newline=False)
+                continue
+
+            if line.startswith("~"):
+                current.extend(self._compile_logic(line, reads, writes))
+                continue
+
+            if line[0] in "=-" and not line.startswith("->"):
+                raise UnsupportedInkSyntax(f"Gathers and stitches are not supported: {line}")
+
+            terminated = self._emit_parts(current, self._parse_inline(line), diverts, newline=True) or terminated
+
+        if not choices and not terminated and name:
+            warnings.append(f"Apparent loose end in knot '{name}': the flow runs out. "
+                            "Do you need a '-> DONE' statement, choice or divert?")
+
+        named = {f"c-{i}": content + [{"#f": 5}] for i, content in enumerate(choices)}
+        if not name:
+            # Top level: loose ends are gathered into a final DONE, like inklecate does
+            weave.append(["done", {"#f": 5, "#n": "g-0"}])
+        weave.append(named or None)
+        # Knots carry visit-count flags in their trailing dict, as in inklecate's output
+        container = [weave, {"#f": 1}] if name else weave
+        return _CompiledKnot(None, self._dumps(container), diverts, reads, writes, warnings)
+
+    def _emit_parts(self, out, parts, diverts, newline):
+        """Appends parsed line parts. Returns True if the line ends in a divert."""
+        divert = None
+        has_text = False
+        for kind, value in parts:
+            if kind == "text":
+                out.append("^" + value)
+                has_text = True
+            elif kind == "tag":
+                out.extend(["#", "^" + value, "/#"])
+            elif kind == "divert":
+                divert = value
+        if divert is None:
+            if newline and has_text:
+                out.append("\n")
+            return False
+        if divert == "END":
+            out.append("end")
+        elif divert == "DONE":
+            out.append("done")
+        else:
+            diverts.add(divert)
+            out.append({"->": divert})
+        return True
+
+    # --- Line parsers ------------------------------------------------------------
+    def _parse_inline(self, line):
+        """
+        Splits a content line into ("text", s), ("tag", s) and ("divert", target) parts.
+        Handles escapes and // comments; rejects glue, logic braces, threads and tunnels.
+        """
+        parts = []
+        buf = []
+        tag = None
+        i, n = 0, len(line)
+
+        def flush():
+            text = "".join(buf)
+            buf.clear()
+            return text
+
+        while i < n:
+            ch = line[i]
+            pair = line[i:i + 2]
+            if ch == "\\" and i + 1 < n:
+                buf.append(line[i + 1])
+                i += 2
+                continue
+            if pair == "//":
+                break
+            if pair in ("/*", "<>", "<-") or ch in "{}":
+                raise UnsupportedInkSyntax(f"Unsupported Ink syntax '{pair if ch not in '{}' else ch}' in: {line}")
+            if ch == "#":
+                text = flush()
+                if tag is not None:
+                    parts.append(("tag", text.strip()))
+                elif text.strip():
+                    parts.append(("text", text.strip() + " "))
+                tag = True
+                i += 1
+                continue
+            if pair == "->" and tag is None:
+                if line.startswith("->->", i) or line.startswith("->", i + 2):
+                    raise UnsupportedInkSyntax(f"Tunnels are not supported: {line}")
+                text = flush()
+                if text.strip():
+                    parts.append(("text", text.strip() + " "))
+                m = re.match(r'\s*([A-Za-z_]\w*)\s*', line[i + 2:])
+                if not m:
+                    raise UnsupportedInkSyntax(f"Unsupported divert target in: {line}")
+                rest = line[i + 2 + m.end():]
+                if rest and not rest.startswith(("#", "//")):
+                    raise UnsupportedInkSyntax(f"Unsupported divert target in: {line}")
+                parts.append(("divert", m.group(1)))
+                i += 2 + m.end()
+                continue
+            buf.append(ch)
+            i += 1
+
+        text = flush()
+        if tag is not None:
+            parts.append(("tag", text.strip()))
+        elif text.strip():
+            parts.append(("text", text.strip()))
+        # Tags are written before the divert, in line order
+        return [p for p in parts if p[0] != "divert"] + [p for p in parts if p[0] == "divert"]
+
+    def _parse_choice(self, line):
+        """Parses '* [text] -> target'. Returns (choice_text, parts_after_brackets)."""
+        body = line[1:].lstrip()
+        if body.startswith(("*", "+")):
+            raise UnsupportedInkSyntax(f"Nested choices are not supported: {line}")
+        if not body.startswith("["):
+            raise UnsupportedInkSyntax(f"Only '* [text]' choices are supported: {line}")
+        text = []
+        i = 1
+        while i < len(body):
+            ch = body[i]
+            if ch == "\\" and i + 1 < len(body):
+                text.append(body[i + 1])
+                i += 2
+                continue
+            if ch == "]":
+                break
+            if ch in "{}" or body.startswith(("->", "<>", "//"), i):
+                raise UnsupportedInkSyntax(f"Unsupported syntax in choice text: {line}")
+            text.append(ch)
+            i += 1
+        else:
+            raise UnsupportedInkSyntax(f"Unterminated choice text: {line}")
+        parts = self._parse_inline(body[i + 1:])
+        if any(kind == "text" for kind, _ in parts):
+            raise UnsupportedInkSyntax(f"Choice content outside [...] is not supported: {line}")
+        return "".join(text).strip(), parts
+
+    def _compile_logic(self, line, reads, writes):
+        """'~ var = expression' -> evaluation of the expression in RPN plus a reassignment."""
+        m = LOGIC_RE.match(self._strip_comment(line))
+        if not m or m.group(1) == "temp":
+            raise UnsupportedInkSyntax(f"Only '~ var = expression' logic is supported: {line}")
+        target, expr = m.groups()
+        rpn = self._compile_expression(expr, reads, line)
+        writes.add(target)
+        return ["ev"] + rpn + [{"VAR=": target, "re": True}, "/ev"]
+
+    @staticmethod
+    def _strip_comment(line):
+        """Cuts a trailing // comment that is not inside a string literal."""
+        in_string = False
+        for i, ch in enumerate(line):
+            if ch == '"':
+                in_string = not in_string
+            elif not in_string and line.startswith("//", i):
+                return line[:i].rstrip()
+        return line.rstrip()
+
+    def _compile_expression(self, expr, reads, line):
+        tokens = []
+        pos = 0
+        expr = expr.rstrip()
+        while pos < len(expr):
+            m = EXPR_TOKEN_RE.match(expr, pos)
+            if not m or m.end() == pos:
+                raise UnsupportedInkSyntax(f"Unsupported expression in: {line}")
+            tokens.append(m.groups())
+            pos = m.end()
+        out = []
+
+        def peek():
+            return tokens[0][3] if tokens else None
+
+        def primary():
+            if not tokens:
+                raise UnsupportedInkSyntax(f"Incomplete expression in: {line}")
+            number, string, ident, op = tokens.pop(0)
+            if number:
+                out.append(float(number) if "." in number else int(number))
+            elif string:
+                out.extend(["str", "^" + string[1:-1], "/str"])
+            elif ident in ("true", "false"):
+                out.append(ident == "true")
+            elif ident:
+                if peek() == "(":
+                    raise UnsupportedInkSyntax(f"Function calls are not supported: {line}")
+                reads.add(ident)
+                out.append({"VAR?": ident})
+            elif op == "(":
+                additive()
+                if not tokens or tokens.pop(0)[3] != ")":
+                    raise UnsupportedInkSyntax(f"Unbalanced parentheses in: {line}")
+            elif op == "-":
+                primary()
+                out.append("_")
+            else:
+                raise UnsupportedInkSyntax(f"Unsupported expression in: {line}")
+
+        def multiplicative():
+            primary()
+            while peek() in ("*", "/", "%"):
+                op = tokens.pop(0)[3]
+                primary()
+                out.append(op)
+
+        def additive():
+            multiplicative()
+            while peek() in ("+", "-"):
+                op = tokens.pop(0)[3]
+                multiplicative()
+                out.append(op)
+
+        additive()
+        if tokens:
+            raise UnsupportedInkSyntax(f"Unsupported expression in: {line}")
+        return out
+
+    @staticmethod
+    def _dumps(obj):
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
@@ -0,0 +1,129 @@
+import os
+import re
+import tempfile
+from collections import OrderedDict
+
+# "== knot ==" / "=== knot ===" (trailing equals signs are optional in Ink)
+KNOT_RE = re.compile(r'^\s*={2,}\s*(\w+)\s*=*\s*$')
+
+
+class InkDocument:
+    """
+    Structured, in-memory view of an adventure.ink file.
+
+    The script is kept as a header (VAR declarations, comments, the initial divert)
+    followed by an ordered index of knots: knot name -> list of lines, where the first
+    line is the knot's own "== name ==" line. Lookup, replacement and removal of a knot
+    are O(1); the file is only serialised when `save` is called, via a temp file and an
+    atomic rename so readers never see a half-written script.
+    """
+
+    def __init__(self):
+        self.header = []
+        self.knots = OrderedDict()
+
+    # --- Parsing -----------------------------------------------------------------
+    @classmethod
+    def parse(cls, text):
+        doc = cls()
+        doc.append_text(text)
+        return doc
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return cls()
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.parse(f.read())
+
+    @staticmethod
+    def lines_to_text(lines):
+        """Mirrors how InkSmith used to write line lists (one '\\n' after each entry)."""
+        return "".join(line + "\n" for line in lines)
+
+    def append_text(self, text):
+        """
+        Parses a chunk of Ink and appends it, exactly like appending it to the file would:
+        lines before the chunk's first knot continue the current last knot (or the
+        header), and a knot that already exists is replaced and moved to the end.
+        """
+        current = None
+        for line in text.splitlines():
+            m = KNOT_RE.match(line)
+            if m:
+                name = m.group(1)
+                self.knots.pop(name, None)
+                current = [line]
+                self.knots[name] = current
+            elif current is not None:
+                current.append(line)
+            elif self.knots:
+                next(reversed(self.knots.values())).append(line)
+            else:
+                self.header.append(line)
+
+    # --- Knot access -------------------------------------------------------------
+    def __contains__(self, name):
+        return name in self.knots
+
+    def get(self, name):
+        return self.knots.get(name)
+
+    def knot_names(self):
+        return list(self.knots.keys())
+
+    def header_line(self, name):
+        lines = self.knots.get(name)
+        return lines[0] if lines else None
+
+    def set_knot(self, name, body_lines):
+        """Replaces (or creates) a knot in place, keeping its position."""
+        self.knots[name] = [f"== {name} =="] + list(body_lines)
+
+    def remove(self, name):
+        return self.knots.pop(name, None) is not None
+
+    def rename_target(self, old, new):
+        """
+        Points every divert at `old` to `new` and renames the knot itself if present.
+        Like the plain text replacement this replaces, knots derived from `old` follow
+        along ('intro_next', 'intro_result_1' -> '<new>_next', '<new>_result_1'), but only
+        identifiers in diverts and knot lines are touched: scene prose and unrelated names
+        that merely contain `old` ('scene_intro', 'introduction') stay as they are.
+        """
+        ident_re = re.escape(old) + r'(?=_\w|\b)'
+        divert_re = re.compile(r'(->\s*)' + ident_re)
+        self.header = [divert_re.sub(r'\g<1>' + new, l) for l in self.header]
+        renamed = OrderedDict()
+        for name, lines in self.knots.items():
+            lines = [divert_re.sub(r'\g<1>' + new, l) for l in lines]
+            if re.fullmatch(ident_re + r'\w*', name):
+                new_name = new + name[len(old):]
+                lines[0] = lines[0].replace(name, new_name, 1)
+                name = new_name
+            renamed[name] = lines
+        self.knots = renamed
+
+    # --- Serialisation -----------------------------------------------------------
+    def header_text(self):
+        return "\n".join(self.header)
+
+    def to_text(self):
+        parts = list(self.header)
+        for lines in self.knots.values():
+            parts.extend(lines)
+        return "\n".join(parts) + "\n" if parts else ""
+
+    def save(self, path):
+        """Writes the script atomically (temp file in the same folder + os.replace)."""
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".adventure.", suffix=".ink.tmp", dir=folder)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(self.to_text())
+            os.replace(tmp, path)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
@@ -4,6 +4,10 @@ import time
 import json
 import streamlit as st
 import re
+from contextlib import contextmanager
+from ink_document import InkDocument
+from ink_compiler import InkCompiler, InkCompileError, UnsupportedInkSyntax
+import llm_schemas
 
 class InkSmith:
     def __init__(self, book_id, project_path=None, auto_create=True):
@@ -25,9 +29,14 @@ class InkSmith:
         if auto_create:
             os.makedirs(self.base_dir, exist_ok=True)
         self.ink_path = os.path.join(self.base_dir, "adventure.ink")
+        # In-memory script model; reloaded only when the file changes behind our back
+        self._doc = None
+        self._doc_stamp = None
+        self._batch_depth = 0
+        self._dirty = False
+        # Keeps compiled knots between saves so recompiles only redo what changed
+        self._compiler = InkCompiler()
         
-        from utils import DashboardUtils
-        self.config = DashboardUtils.load_config()
         self.images_per_scene = self.config.get('generation', {}).get('images_per_scene', 4)
         
         # Initialize file (Keep last_node for Resume logic, remove health/morale)
@@ -55,60 +64,100 @@ class InkSmith:
         """Directory for storing generated images and assets."""
         return os.path.join(self.base_dir, "assets")
 
+    def _file_stamp(self):
+        try:
+            st_ = os.stat(self.ink_path)
+            return (st_.st_mtime_ns, st_.st_size)
+        except OSError:
+            return None
+
+    @property
+    def document(self):
+        """The parsed script. Re-read only if another writer (e.g. initialize_ink_file) touched the file."""
+        stamp = self._file_stamp()
+        if self._doc is None or (stamp != self._doc_stamp and not self._dirty):
+            self._doc = InkDocument.load(self.ink_path)
+            self._doc_stamp = stamp
+        return self._doc
+
+    def _commit(self):
+        """Persists the document, or defers it until the surrounding batch() ends."""
+        if self._batch_depth > 0:
+            self._dirty = True
+            return
+        self._doc.save(self.ink_path)
+        self._doc_stamp = self._file_stamp()
+        self._dirty = False
+
+    @contextmanager
+    def batch(self):
+        """Groups several edits into a single atomic write of adventure.ink."""
+        self.document  # make sure we start from the current file
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0 and self._dirty:
+                self._commit()
+
+    def compile_json(self, json_path=None, strict=True):
+        """Compiles the in-memory script to adventure.json (built-in compiler). Returns warnings."""
+        json_path = json_path or os.path.join(self.base_dir, "adventure.json")
+        return self._compiler.compile_file(self.document, json_path, strict=strict)
+
+    def validate(self):
+        """
+        Checks the script without writing anything. Diverts to scenes that are not
+        written yet only count as warnings. Returns a list of error messages.
+        """
+        try:
+            self._compiler.compile(self.document, strict=False)
+        except UnsupportedInkSyntax:
+            return []  # Beyond the built-in subset; inklecate will judge it on export
+        except InkCompileError as e:
+            return e.errors
+        return []
+
+    @staticmethod
+    def _is_story_knot(header_line):
+        # Only "== name ==" knots count (not "=== start_node ===", results or placeholders)
+        if not header_line.startswith("== ") or "==" not in header_line[3:]:
+            return False
+        knot_name = header_line.split("==")[1].strip().lower()
+        return "_next" not in knot_name and "_result" not in knot_name
+
     def get_last_node(self):
         """Findet den letzten echten Szenen-Knoten in der Datei."""
-        if not os.path.exists(self.ink_path):
-            return "intro"
-        
         last_knot = "intro"
-        with open(self.ink_path, "r", encoding="utf-8") as f:
-            for line in f:
-                if line.startswith("== ") and "==" in line[3:]:
-                    knot_name = line.split("==")[1].strip()
-                    # Filter: Ignoriere Ergebnisse und Platzhalter
-                    if "_next" not in knot_name.lower() and "_result" not in knot_name.lower():
-                        last_knot = knot_name
+        # Filter: Ignoriere Ergebnisse und Platzhalter
+        for name, lines in self.document.knots.items():
+            if self._is_story_knot(lines[0]):
+                last_knot = name
         return last_knot
 
     def count_existing_scenes(self):
         """Zählt nur die echten Story-Szenen (ohne Results/Placeholders)."""
-        if not os.path.exists(self.ink_path):
-            return 0
-        
-        count = 0
-        with open(self.ink_path, "r", encoding="utf-8") as f:
-            for line in f:
-                if line.startswith("== ") and "==" in line[3:]:
-                    knot_name = line.split("==")[1].strip()
-                    if "_next" not in knot_name.lower() and "_result" not in knot_name.lower():
-                        count += 1
-        return count
+        return sum(1 for lines in self.document.knots.values() if self._is_story_knot(lines[0]))
 
     def get_full_script(self):
         """Returns the entire script content for LLM context."""
         if not os.path.exists(self.ink_path): return ""
-        with open(self.ink_path, "r", encoding="utf-8") as f:
-            return f.read()
+        return self.document.to_text()
         
     def patch_placeholder_links(self, placeholder_id, real_new_id):
         """
-        Reads the Ink file, finds all references to the placeholder (e.g. 'garden_next'),
-        and replaces them with the confirmed new scene ID (e.g. 'dungeon').
+        Finds all references to the placeholder (e.g. 'garden_next') and replaces them
+        with the confirmed new scene ID (e.g. 'dungeon').
         """
         if not os.path.exists(self.ink_path):
             return
 
-        with open(self.ink_path, "r", encoding="utf-8") as f:
-            content = f.read()
-        
         # We replace the divert target AND the knot name if it was pre-written
         # 1. Replace the divert: -> garden_next  ==>  -> dungeon
         # 2. Replace the knot (if it exists): == garden_next ==  ==>  == dungeon ==
-        # We target the specific placeholder string.
-        updated_content = content.replace(placeholder_id, real_new_id)
-        
-        with open(self.ink_path, "w", encoding="utf-8") as f:
-            f.write(updated_content)
+        self.document.rename_target(placeholder_id, real_new_id)
+        self._commit()
             
     def write_intro(self, scene_data, next_slug, audio_file: str = None, audio_prompt: str = None):
         # 🛠️ FIX: Use the actual scene_id (e.g., "intro") so result nodes match
@@ -116,8 +165,8 @@ class InkSmith:
         
         # Check if file already exists and contains protagonist/traits (from utils.py initialize_ink_file)
         if os.path.exists(self.ink_path):
-            with open(self.ink_path, "r", encoding="utf-8") as f:
-                content = f.read()
+            # VAR declarations live in the header, so there is no need to scan the knots
+            content = self.document.header_text()
             
             # Check if file contains protagonist or trait variables (indicating it was initialized by utils.py)
             has_protagonist = "protagonist_name" in content
@@ -257,12 +306,16 @@ class InkSmith:
 
     # --- THE HELPER METHODS (Ensure these are inside the class!) ---
     def _write_to_file(self, lines):
-        with open(self.ink_path, "w", encoding="utf-8") as f:
-            f.writelines(line + "\n" for line in lines)
+        self._doc = InkDocument.parse(InkDocument.lines_to_text(lines))
+        self._commit()
 
     def _append_to_file(self, lines):
-        with open(self.ink_path, "a", encoding="utf-8") as f:
-            f.writelines(line + "\n" for line in lines)
+        self.document.append_text(InkDocument.lines_to_text(lines))
+        self._commit()
+
+    def set_last_node(self, node_id):
+        """Appends the runtime resume marker (~ last_node = "...") after the latest knot."""
+        self._append_to_file([f'\n~ last_node = "{node_id}"'])
     
     def write_placeholder_knot(self, knot_id):
         """Writes a temporary knot to allow compilation of incomplete stories."""
@@ -279,27 +332,8 @@ class InkSmith:
         """Removes a specific knot definition from the file (used when replacing a placeholder)."""
         if not os.path.exists(self.ink_path): return
         
-        with open(self.ink_path, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-            
-        new_lines = []
-        skip = False
-        start_marker = f"== {knot_id} =="
-        
-        for line in lines:
-            if line.strip() == start_marker:
-                skip = True
-            
-            if skip:
-                # Stop skipping if we hit the next knot (or EOF)
-                if line.strip().startswith("==") and line.strip() != start_marker:
-                    skip = False
-                    new_lines.append(line)
-            else:
-                new_lines.append(line)
-                
-        with open(self.ink_path, "w", encoding="utf-8") as f:
-            f.writelines(new_lines)
+        if self.document.remove(knot_id):
+            self._commit()
 
     def write_scene(self, scene_data, next_slug, scene_type="main", audio_file: str = None, audio_prompt: str = None):
         """
@@ -315,6 +349,8 @@ class InkSmith:
         Returns:
             None
         """
+        for problem in self.check_scene(scene_data):
+            print(f"⚠️ InkSmith: {problem}")
         if scene_type == "intro":
             return self.write_intro(scene_data, next_slug, audio_file=audio_file, audio_prompt=audio_prompt)
         elif scene_type == "main":
@@ -334,6 +370,12 @@ class InkSmith:
         else:
             raise ValueError(f"Unknown scene type: {scene_type}")
     
+    def check_scene(self, scene_data):
+        """Validates a scene payload against the shared LLM scene schema. Returns a list of problems."""
+        trait_names = [re.sub(r'\W+', '_', t.get('label', '').lower())
+                       for t in self.config.get('traits', {}).values() if t.get('label')]
+        return llm_schemas.validate(scene_data, llm_schemas.scene_schema(trait_names, require_id=False))
+
     def connect_scenes(self, source_placeholder_id, target_scene_id):
         """
         Updates a placeholder knot (e.g. 'intro_next') to divert to the new scene 
@@ -341,28 +383,10 @@ class InkSmith:
         """
         if not os.path.exists(self.ink_path): return
 
-        with open(self.ink_path, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-
-        new_lines = []
-        inside_target = False
-        start_marker = f"== {source_placeholder_id} =="
-
-        for line in lines:
-            if line.strip() == start_marker:
-                inside_target = True
-                new_lines.append(line) # Keep the header (e.g. "== intro_next ==")
-                # Write the connection link immediately
-                new_lines.append(f"-> {target_scene_id}\n")
-                continue
-
-            if inside_target:
-                # Skip the old placeholder text ("...Story continues...") until next knot
-                if line.strip().startswith("=="):
-                    inside_target = False
-                    new_lines.append(line)
-            else:
-                new_lines.append(line)
-
-        with open(self.ink_path, "w", encoding="utf-8") as f:
-            f.writelines(new_lines)
\ No newline at end of file
+        doc = self.document
+        if source_placeholder_id not in doc:
+            return
+        # Keep the header (e.g. "== intro_next ==") and replace the old placeholder
+        # text ("...Story continues...") with the connection link
+        doc.knots[source_placeholder_id] = [doc.header_line(source_placeholder_id), f"-> {target_scene_id}"]
+        self._commit()
\ No newline at end of file
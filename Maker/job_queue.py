@@ -0,0 +1,264 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import importlib
+import threading
+import traceback
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'cache', 'jobs.db')
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+ACTIVE = (QUEUED, RUNNING)
+# Progress rows are written at most this often (plus the first and the final update)
+PROGRESS_INTERVAL = 0.25
+# Finished jobs are pruned from the table after a week
+KEEP_FINISHED_SECONDS = 7 * 24 * 3600
+# Windows process liveness probe (OpenProcess / GetExitCodeProcess)
+PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+STILL_ACTIVE = 259
+# Identifies this process's queue: a later process that gets the same PID is not the owner
+SESSION_TOKEN = uuid.uuid4().hex
+
+
+@contextmanager
+def _connect(db_path):
+    """Connection that commits on success and is always closed (sqlite3's own `with` only commits)."""
+    conn = sqlite3.connect(db_path, timeout=10)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _resolve(target):
+    """'module:function' -> the function (importable in worker processes as well)."""
+    module_name, _, func_name = target.partition(":")
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+class _Reporter:
+    """The `report(percent, message=None)` callable handed to every job function."""
+
+    def __init__(self, db_path, job_id):
+        self.db_path = db_path
+        self.job_id = job_id
+        self._last = 0.0
+
+    def __call__(self, percent, message=None):
+        now = time.time()
+        if now - self._last < PROGRESS_INTERVAL and percent < 100:
+            return
+        self._last = now
+        with _connect(self.db_path) as conn:
+            conn.execute("UPDATE jobs SET progress = ?, message = COALESCE(?, message) WHERE id = ? AND status = ?",
+                         (float(percent), message, self.job_id, RUNNING))
+
+
+def _execute(db_path, job_id, target, params):
+    """Runs one job and records its outcome. Module-level so the process pool can pickle it."""
+    with _connect(db_path) as conn:
+        claimed = conn.execute("UPDATE jobs SET status = ?, started_at = ?, worker_pid = ? WHERE id = ? AND status = ?",
+                               (RUNNING, time.time(), os.getpid(), job_id, QUEUED)).rowcount
+    if not claimed:
+        return  # cancelled while it was waiting
+    try:
+        result = _resolve(target)(params, _Reporter(db_path, job_id))
+        update = (DONE, 100.0, json.dumps(result, ensure_ascii=False), None)
+    except Exception as e:
+        traceback.print_exc()
+        update = (FAILED, None, None, f"{type(e).__name__}: {e}")
+    with _connect(db_path) as conn:
+        conn.execute("""UPDATE jobs SET status = ?, progress = COALESCE(?, progress), result = ?, error = ?,
+                        finished_at = ? WHERE id = ?""", (*update, time.time(), job_id))
+
+
+class JobQueue:
+    """
+    Local runner for long generation work, outside the Streamlit script thread.
+
+    Jobs are rows in a SQLite table (data/cache/jobs.db): target ('module:function'), JSON
+    params, status (queued/running/done/failed/cancelled), progress 0-100, a status message,
+    and the JSON result or error. The target is called as fn(params, report) on a thread
+    pool (I/O bound: SD, ElevenLabs) or a process pool (CPU bound) and reports progress
+    through the table, so the dashboard polls `get` instead of blocking, and a rerun or a
+    closed browser tab does not lose in-flight work. A `key` deduplicates submissions: while
+    a job with the same key is queued or running, submitting it again returns that job.
+    Jobs left queued/running by a process that no longer exists are marked failed on start
+    (owner PID plus a per-process token, so a recycled PID is not mistaken for the owner).
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, max_threads=4, max_processes=2):
+        self.db_path = os.path.abspath(db_path)
+        self.max_threads = max(1, int(max_threads))
+        self.max_processes = max(1, int(max_processes))
+        self._lock = threading.RLock()
+        self._threads = None
+        self._processes = None
+        self._futures = {}
+        self._init_db()
+
+    @classmethod
+    def shared(cls, db_path=DEFAULT_DB_PATH):
+        key = os.path.abspath(db_path)
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(key)
+            return cls._instances[key]
+
+    def _init_db(self):
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with self._lock, _connect(self.db_path) as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                                id TEXT PRIMARY KEY, key TEXT, target TEXT, params TEXT, executor TEXT,
+                                status TEXT, progress REAL, message TEXT, result TEXT, error TEXT,
+                                owner_pid INTEGER, worker_pid INTEGER,
+                                created_at REAL, started_at REAL, finished_at REAL, owner_token TEXT)""")
+            if "owner_token" not in [row[1] for row in conn.execute("PRAGMA table_info(jobs)")]:
+                conn.execute("ALTER TABLE jobs ADD COLUMN owner_token TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_key ON jobs(key, status)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)")
+            rows = conn.execute("SELECT id, owner_pid, owner_token FROM jobs WHERE status IN (?, ?)", ACTIVE).fetchall()
+            for job_id, owner, token in rows:
+                if token == SESSION_TOKEN:
+                    continue
+                if owner == os.getpid() or not self._pid_alive(owner):
+                    conn.execute("UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                                 (FAILED, "Interrupted (the dashboard was restarted)", time.time(), job_id))
+            conn.execute("DELETE FROM jobs WHERE status NOT IN (?, ?) AND finished_at < ?",
+                         (*ACTIVE, time.time() - KEEP_FINISHED_SECONDS))
+
+    # --- Submitting --------------------------------------------------------------
+    def submit(self, target, params=None, key=None, executor="thread"):
+        """Queues fn(params, report) and returns the job id (the running job's id if `key` is busy)."""
+        if executor not in ("thread", "process"):
+            raise ValueError(f"unknown executor {executor!r}")
+        params = params or {}
+        with self._lock:
+            if key:
+                busy = self.find(key, statuses=ACTIVE)
+                if busy:
+                    return busy["id"]
+            job_id = uuid.uuid4().hex
+            with _connect(self.db_path) as conn:
+                conn.execute("""INSERT INTO jobs (id, key, target, params, executor, status, progress, owner_pid,
+                                                  owner_token, created_at)
+                                VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?, ?)""",
+                             (job_id, key, target, json.dumps(params, ensure_ascii=False), executor,
+                              QUEUED, os.getpid(), SESSION_TOKEN, time.time()))
+            future = self._pool(executor).submit(_execute, self.db_path, job_id, target, params)
+            self._futures[job_id] = future
+            future.add_done_callback(lambda f, j=job_id: self._on_done(j, f))
+        print(f"🧵 Job queued: {key or target} ({job_id[:8]})")
+        return job_id
+
+    def _pool(self, executor):
+        if executor == "process":
+            if self._processes is None:
+                self._processes = ProcessPoolExecutor(max_workers=self.max_processes,
+                                                      mp_context=multiprocessing.get_context("spawn"))
+            return self._processes
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(max_workers=self.max_threads, thread_name_prefix="job")
+        return self._threads
+
+    def _on_done(self, job_id, future):
+        with self._lock:
+            self._futures.pop(job_id, None)
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:  # the worker itself died (e.g. a broken process pool)
+            with _connect(self.db_path) as conn:
+                conn.execute("UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ? AND status IN (?, ?)",
+                             (FAILED, f"{type(error).__name__}: {error}", time.time(), job_id, *ACTIVE))
+
+    def cancel(self, job_id):
+        """Cancels a job that has not started yet. Returns True if it was cancelled."""
+        with _connect(self.db_path) as conn:
+            cancelled = conn.execute("UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+                                     (CANCELLED, time.time(), job_id, QUEUED)).rowcount
+        future = self._futures.get(job_id)
+        if cancelled and future:
+            future.cancel()
+        return bool(cancelled)
+
+    # --- Queries -----------------------------------------------------------------
+    def get(self, job_id):
+        """The job as a dict (params/result decoded), or None."""
+        rows = self._select("WHERE id = ?", (job_id,))
+        return rows[0] if rows else None
+
+    def find(self, key, statuses=None):
+        """Most recent job submitted with `key` (optionally only in the given statuses)."""
+        where, args = "WHERE key = ?", [key]
+        if statuses:
+            where += f" AND status IN ({', '.join('?' * len(statuses))})"
+            args += list(statuses)
+        rows = self._select(where + " ORDER BY created_at DESC LIMIT 1", args)
+        return rows[0] if rows else None
+
+    def jobs(self, statuses=None, limit=50):
+        """Recent jobs, newest first."""
+        where, args = "", []
+        if statuses:
+            where = f"WHERE status IN ({', '.join('?' * len(statuses))})"
+            args = list(statuses)
+        return self._select(f"{where} ORDER BY created_at DESC LIMIT ?", args + [int(limit)])
+
+    def _select(self, clause, args):
+        with _connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(f"SELECT * FROM jobs {clause}", args).fetchall()
+        jobs = []
+        for row in rows:
+            job = dict(row)
+            job["params"] = json.loads(job["params"]) if job["params"] else {}
+            job["result"] = json.loads(job["result"]) if job["result"] else None
+            jobs.append(job)
+        return jobs
+
+    @staticmethod
+    def _pid_alive(pid):
+        """Liveness probe that never signals the process (os.kill on Windows would terminate it)."""
+        if not pid:
+            return False
+        if os.name == "nt":
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, int(pid))
+            if not handle:
+                return False
+            try:
+                code = ctypes.c_ulong()
+                if not kernel32.GetExitCodeProcess(handle, ctypes.byref(code)):
+                    return False
+                return code.value == STILL_ACTIVE
+            finally:
+                kernel32.CloseHandle(handle)
+        try:
+            os.kill(pid, 0)  # POSIX: signal 0 only checks that the process exists
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        except OSError:
+            return False
+        return True
+
+    def shutdown(self, wait=False):
+        with self._lock:
+            pools = (self._threads, self._processes)
+            self._threads = self._processes = None
+        # Outside the lock: finishing jobs take it in _on_done
+        for pool in pools:
+            if pool:
+                pool.shutdown(wait=wait, cancel_futures=not wait)
@@ -0,0 +1,76 @@
+import json
+
+
+class JsonObjectStream:
+    """
+    Incremental JSON scanner for LLM responses that arrive in chunks.
+
+    Feed text as it streams in; `feed` returns (key, obj) for every object that has just
+    closed and is either a top-level member listed in `object_keys` (e.g. "meta") or an
+    element of a top-level array listed in `array_keys` (e.g. "scenes"). Each character is
+    looked at once, so the cost is linear in the response size no matter how it is chunked.
+    Text before the first brace (markdown fences, chatter) is ignored.
+    """
+
+    def __init__(self, array_keys=("scenes",), object_keys=("meta",)):
+        self.array_keys = set(array_keys)
+        self.object_keys = set(object_keys)
+        self._buf = ""
+        self._pos = 0
+        self._stack = []  # (bracket, key in parent object, start offset)
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string = None
+        self._key = None
+        self.finished = False
+
+    def feed(self, text):
+        self._buf += text or ""
+        found = []
+        buf, stack = self._buf, self._stack
+        i = self._pos
+        while i < len(buf) and not self.finished:
+            ch = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._last_string = buf[self._string_start + 1:i]
+            elif not stack and ch != "{":
+                pass  # still outside the top-level object
+            elif ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == ":":
+                if stack[-1][0] == "{":
+                    self._key = self._last_string
+            elif ch == ",":
+                self._key = None
+            elif ch in "{[":
+                key = self._key if stack and stack[-1][0] == "{" else None
+                stack.append((ch, key, i))
+                self._key = None
+            elif ch in "}]":
+                bracket, key, start = stack.pop()
+                if bracket == "{":
+                    if len(stack) == 1 and key in self.object_keys:
+                        found.append(self._decode(key, buf[start:i + 1]))
+                    elif len(stack) == 2 and stack[1][0] == "[" and stack[1][1] in self.array_keys:
+                        found.append(self._decode(stack[1][1], buf[start:i + 1]))
+                if not stack:
+                    self.finished = True
+            i += 1
+        self._pos = i
+        return [item for item in found if item[1] is not None]
+
+    @staticmethod
+    def _decode(key, text):
+        try:
+            return key, json.loads(text)
+        except ValueError as e:
+            print(f"⚠️ Skipping malformed '{key}' object in stream: {e}")
+            return key, None
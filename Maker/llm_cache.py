@@ -0,0 +1,98 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'cache', 'llm_responses.db')
+
+MODES = ("passthrough", "record", "replay", "replay_or_record")
+
+
+class LLMCacheMiss(LookupError):
+    """Raised when a request was never recorded and the mode does not allow a live call."""
+
+
+class LLMResponseCache:
+    """
+    Record/replay store for Architect responses (SQLite, one row per request).
+
+    Rows are keyed by model, context-cache identity (book, model and system instruction;
+    see ContextCacheRegistry.make_key), request kind and prompt hash. Modes:
+    - passthrough: the cache is not used at all (default)
+    - record: every request goes to Gemini and the response is stored (overwriting)
+    - replay: stored responses are returned without any network access; a miss raises
+      LLMCacheMiss, so a replayed run can never silently go live
+    - replay_or_record: like replay, but a miss goes to Gemini once and is recorded,
+      so the next run is fully offline
+    The mode comes from the LLM_CACHE_MODE environment variable (.env works too).
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, mode=None):
+        self.path = os.path.abspath(os.getenv("LLM_CACHE_PATH") or path)
+        mode = (mode or os.getenv("LLM_CACHE_MODE") or "passthrough").strip().lower()
+        if mode not in MODES:
+            print(f"⚠️ Unknown LLM_CACHE_MODE '{mode}', using passthrough.")
+            mode = "passthrough"
+        self.mode = mode
+        self._lock = threading.Lock()
+        if self.mode != "passthrough":
+            self._init_db()
+
+    @property
+    def offline(self):
+        """Recorded responses are replayed; nothing is uploaded until a request has to go live."""
+        return self.mode in ("replay", "replay_or_record")
+
+    @property
+    def strict(self):
+        """Replay only: a miss must never reach Gemini."""
+        return self.mode == "replay"
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._lock, self._connect() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS responses (
+                                key TEXT PRIMARY KEY, model TEXT, cache_identity TEXT, kind TEXT,
+                                prompt_hash TEXT, response TEXT, created_at REAL)""")
+
+    @staticmethod
+    def make_key(model, cache_identity, kind, prompt):
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        key = hashlib.sha256(f"{model}|{cache_identity}|{kind}|{prompt_hash}".encode("utf-8")).hexdigest()
+        return key, prompt_hash
+
+    def lookup(self, model, cache_identity, kind, prompt):
+        """Returns the recorded response text (replay modes only), else None."""
+        if not self.offline:
+            return None
+        key, _ = self.make_key(model, cache_identity, kind, prompt)
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        if row:
+            print(f"📼 LLM cache: replayed {kind} response")
+        return row[0] if row else None
+
+    def store(self, model, cache_identity, kind, prompt, response):
+        if self.mode == "passthrough" or response is None:
+            return
+        key, prompt_hash = self.make_key(model, cache_identity, kind, prompt)
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (key, model, cache_identity, kind, prompt_hash, response, time.time()))
+
+    def clear(self):
+        if not os.path.exists(self.path):
+            return
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM responses")
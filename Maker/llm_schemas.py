@@ -0,0 +1,178 @@
+"""
+Shared definitions of the JSON payloads exchanged with the LLM.
+
+The schemas use Gemini's response_schema dialect (upper-case types, property_ordering), so
+the Architect can pass them as-is for schema-constrained output, and `validate` checks a
+payload against the same definition (InkSmith uses it before writing a scene).
+"""
+
+TRAIT_DELTA_LIMIT = 20
+
+
+def _string(description=None):
+    schema = {"type": "STRING"}
+    if description:
+        schema["description"] = description
+    return schema
+
+
+def trait_changes_schema(trait_names):
+    return {
+        "type": "OBJECT",
+        "properties": {name: {"type": "INTEGER", "minimum": -TRAIT_DELTA_LIMIT, "maximum": TRAIT_DELTA_LIMIT}
+                       for name in trait_names},
+    }
+
+
+def choice_schema(trait_names=()):
+    properties = {
+        "text": _string(),
+        "type": {"type": "STRING", "enum": ["golden", "exquisite", "bad"]},
+        "outcome_text": _string(),
+        "reward_visual_prompt": _string("English; required for the 'exquisite' choice"),
+    }
+    if trait_names:
+        # Gemini rejects OBJECT schemas without properties, so only constrain known traits
+        properties["trait_changes"] = trait_changes_schema(trait_names)
+    return {
+        "type": "OBJECT",
+        "properties": properties,
+        "required": ["text", "type", "outcome_text"],
+        "property_ordering": list(properties),
+    }
+
+
+def scene_schema(trait_names=(), require_id=True):
+    properties = {
+        "scene_id": _string("snake_case"),
+        "scene_text": _string(),
+        "ending": _string("Final paragraph, only if the story ends here"),
+        "visual_prompt": _string("English"),
+        "audio_prompt": _string("English"),
+        "choices": {"type": "ARRAY", "items": choice_schema(trait_names), "max_items": 3},
+    }
+    return {
+        "type": "OBJECT",
+        "properties": properties,
+        "required": (["scene_id"] if require_id else []) + ["scene_text", "visual_prompt", "choices"],
+        "property_ordering": list(properties),
+    }
+
+
+def story_pack_schema(trait_names=()):
+    return {
+        "type": "OBJECT",
+        "properties": {
+            "meta": {
+                "type": "OBJECT",
+                "properties": {"protagonist": _string(), "target_scene_count": {"type": "INTEGER"}},
+                "property_ordering": ["protagonist", "target_scene_count"],
+            },
+            "scenes": {"type": "ARRAY", "items": scene_schema(trait_names), "min_items": 1},
+        },
+        "required": ["meta", "scenes"],
+        # meta first: the streaming parser hands it over together with the first scene
+        "property_ordering": ["meta", "scenes"],
+    }
+
+
+OUTLINE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "meta": story_pack_schema()["properties"]["meta"],
+        "outline": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {"scene_id": _string("snake_case"), "summary": _string()},
+                "required": ["scene_id", "summary"],
+                "property_ordering": ["scene_id", "summary"],
+            },
+            "min_items": 1,
+        },
+    },
+    "required": ["outline"],
+    "property_ordering": ["meta", "outline"],
+}
+
+PITCH_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "summary": _string(),
+        "characters": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {"name": _string(), "description": _string()},
+                "required": ["name", "description"],
+                "property_ordering": ["name", "description"],
+            },
+        },
+    },
+    "required": ["summary", "characters"],
+    "property_ordering": ["summary", "characters"],
+}
+
+RESUME_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {"status": _string(), "last_node": _string(), "summary": _string()},
+    "required": ["status", "last_node"],
+    "property_ordering": ["status", "last_node", "summary"],
+}
+
+
+def build_schemas(trait_names=()):
+    """All payload schemas for one set of trait variable names."""
+    trait_names = list(trait_names)
+    return {
+        "scene": scene_schema(trait_names),
+        "conclusion": scene_schema(trait_names, require_id=False),
+        "story_pack": story_pack_schema(trait_names),
+        "outline": OUTLINE_SCHEMA,
+        "pitch": PITCH_SCHEMA,
+        "resume": RESUME_SCHEMA,
+    }
+
+
+_PY_TYPES = {
+    "STRING": str,
+    "INTEGER": int,
+    "NUMBER": (int, float),
+    "BOOLEAN": bool,
+    "ARRAY": list,
+    "OBJECT": dict,
+}
+
+
+def validate(data, schema, path="$"):
+    """Returns a list of error messages (empty if `data` matches). Unknown keys are allowed."""
+    expected = schema.get("type", "").upper()
+    py_type = _PY_TYPES.get(expected)
+    if data is None:
+        return [] if schema.get("nullable") else [f"{path}: missing value"]
+    if py_type and (not isinstance(data, py_type) or (expected in ("INTEGER", "NUMBER") and isinstance(data, bool))):
+        return [f"{path}: expected {expected.lower()}, got {type(data).__name__}"]
+
+    errors = []
+    if "enum" in schema and data not in schema["enum"]:
+        errors.append(f"{path}: {data!r} is not one of {schema['enum']}")
+    if expected in ("INTEGER", "NUMBER"):
+        if "minimum" in schema and data < schema["minimum"]:
+            errors.append(f"{path}: {data} < {schema['minimum']}")
+        if "maximum" in schema and data > schema["maximum"]:
+            errors.append(f"{path}: {data} > {schema['maximum']}")
+    elif expected == "ARRAY":
+        if "min_items" in schema and len(data) < schema["min_items"]:
+            errors.append(f"{path}: fewer than {schema['min_items']} items")
+        if "max_items" in schema and len(data) > schema["max_items"]:
+            errors.append(f"{path}: more than {schema['max_items']} items")
+        for i, item in enumerate(data):
+            errors.extend(validate(item, schema.get("items", {}), f"{path}[{i}]"))
+    elif expected == "OBJECT":
+        for key in schema.get("required", []):
+            if key not in data:
+                errors.append(f"{path}.{key}: required")
+        for key, sub in schema.get("properties", {}).items():
+            if key in data:
+                errors.extend(validate(data[key], sub, f"{path}.{key}"))
+    return errors
@@ -0,0 +1,165 @@
+import os
+import re
+import json
+import tempfile
+import threading
+
+DEFAULT_OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'output')
+
+# Only the script header (before the first knot) holds the VARs the manifest needs
+KNOT_LINE_RE = re.compile(r'^\s*={2,}')
+LANG_RE = re.compile(r'VAR\s+language\s*=\s*"([^"]+)"')
+PROTAGONIST_RE = re.compile(r'VAR\s+protagonist_name\s*=\s*"([^"]+)"')
+
+
+class ManifestService:
+    """
+    Maintains data/output/manifest.json (the Player's project list) incrementally.
+
+    Next to the manifest, a hidden state file remembers the mtimes of each project's
+    adventure.json and adventure.ink. `update_project` refreshes a single entry after a
+    compile or delete; `verify` only stats the project folders and re-reads the header
+    of scripts that actually changed. The manifest is written via a temp file and an
+    atomic rename, and only when its content changes.
+    """
+
+    def __init__(self, output_dir=DEFAULT_OUTPUT_DIR):
+        self.output_dir = os.path.abspath(output_dir)
+        self.manifest_path = os.path.join(self.output_dir, "manifest.json")
+        self.state_path = os.path.join(self.output_dir, ".manifest_state.json")
+        self._lock = threading.Lock()
+
+    # --- Public API --------------------------------------------------------------
+    def update_project(self, project_id):
+        """Adds, refreshes or removes one project's entry. Returns the number of projects."""
+        with self._lock:
+            entries, state = self._load()
+            if self._refresh(project_id, entries, state):
+                self._save(entries, state)
+            return len(entries)
+
+    def remove_project(self, project_id):
+        with self._lock:
+            entries, state = self._load()
+            if project_id in entries:
+                del entries[project_id]
+                state.pop(project_id, None)
+                self._save(entries, state)
+            return len(entries)
+
+    def verify(self):
+        """Cheap consistency pass: stats every project folder, re-reads only changed ones."""
+        with self._lock:
+            entries, state = self._load()
+            changed = False
+            folders = set(self._project_folders())
+            for project_id in list(entries):
+                if project_id not in folders:
+                    del entries[project_id]
+                    state.pop(project_id, None)
+                    changed = True
+            for project_id in sorted(folders):
+                changed = self._refresh(project_id, entries, state) or changed
+            if changed or not os.path.exists(self.manifest_path):
+                self._save(entries, state)
+            return len(entries)
+
+    def rebuild(self):
+        """Forgets all stored mtimes and rescans every project."""
+        with self._lock:
+            entries, state = {}, {}
+            for project_id in sorted(self._project_folders()):
+                self._refresh(project_id, entries, state)
+            self._save(entries, state)
+            return len(entries)
+
+    # --- Internals ---------------------------------------------------------------
+    def _project_folders(self):
+        if not os.path.isdir(self.output_dir):
+            return []
+        return [e.name for e in os.scandir(self.output_dir) if e.is_dir() and not e.name.startswith(".")]
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _refresh(self, project_id, entries, state):
+        """Brings one entry up to date. Returns True if the entry or its stored mtimes changed."""
+        folder = os.path.join(self.output_dir, project_id)
+        json_mtime = self._mtime(os.path.join(folder, "adventure.json"))
+        ink_path = os.path.join(folder, "adventure.ink")
+        ink_mtime = self._mtime(ink_path)
+
+        if json_mtime is None:
+            state.pop(project_id, None)
+            return entries.pop(project_id, None) is not None
+
+        stamp = [json_mtime, ink_mtime]
+        if project_id in entries and state.get(project_id) == stamp:
+            return False
+
+        entry = {"id": project_id, "title": project_id.replace("_", " ").title(),
+                 "protagonist": "Unknown", "language": "English"}
+        entry.update(self._read_header(ink_path) if ink_mtime is not None else {})
+        entries[project_id] = entry
+        state[project_id] = stamp
+        return True
+
+    @staticmethod
+    def _read_header(ink_path):
+        info = {}
+        try:
+            with open(ink_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if KNOT_LINE_RE.match(line):
+                        break
+                    m = LANG_RE.search(line)
+                    if m:
+                        info["language"] = m.group(1)
+                    m = PROTAGONIST_RE.search(line)
+                    if m:
+                        info["protagonist"] = m.group(1)
+        except OSError:
+            pass
+        return info
+
+    def _load(self):
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                entries = {p["id"]: p for p in json.load(f) if isinstance(p, dict) and "id" in p}
+        except (OSError, ValueError):
+            entries = {}
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        return entries, state
+
+    def _save(self, entries, state):
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._atomic_write(self.manifest_path, list(entries.values()))
+        self._atomic_write(self.state_path, state)
+
+    @staticmethod
+    def _atomic_write(path, data):
+        text = json.dumps(data, indent=4)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                if f.read() == text:
+                    return  # unchanged: keep the file (and its mtime) as is
+        except OSError:
+            pass
+        folder = os.path.dirname(path)
+        fd, tmp = tempfile.mkstemp(prefix=".manifest.", suffix=".tmp", dir=folder)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, path)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
@@ -0,0 +1,250 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # without watchdog every query re-checks the folders it touches
+    Observer = None
+    FileSystemEventHandler = object
+
+DEFAULT_OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'output')
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'cache', 'project_index.db')
+
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg')
+AUDIO_EXTS = ('.mp3', '.wav', '.ogg')
+KNOT_RE = re.compile(r'^\s*={2,}\s*(\w+)')
+# Watchdog events are batched for this long before the touched projects are refreshed
+DEBOUNCE_SECONDS = 0.5
+
+
+class ProjectIndex:
+    """
+    Persistent SQLite index of the projects in data/output.
+
+    One row per project folder: book_id and title (from the project's book_config.json),
+    scene count (knots in adventure.ink), image/audio counts and the last compile time
+    (adventure.json mtime). Each row stores the mtimes it was built from, so refreshing a
+    project is a handful of stats and only changed parts are re-read. Writers call
+    `refresh`; a watchdog observer (see `watch`) keeps the rows current in between, so the
+    dashboard answers "projects for this book" and "old files" with indexed queries.
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, output_dir=DEFAULT_OUTPUT_DIR, db_path=DEFAULT_DB_PATH):
+        self.output_dir = os.path.abspath(output_dir)
+        self.db_path = os.path.abspath(db_path)
+        self._lock = threading.RLock()
+        self._observer = None
+        self._pending = set()
+        self._timer = None
+        self._init_db()
+
+    @classmethod
+    def shared(cls, output_dir=DEFAULT_OUTPUT_DIR, db_path=DEFAULT_DB_PATH):
+        key = (os.path.abspath(output_dir), os.path.abspath(db_path))
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(*key)
+            return cls._instances[key]
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with self._lock, self._connect() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS projects (
+                                id TEXT PRIMARY KEY, book_id TEXT, title TEXT, scene_count INTEGER,
+                                image_count INTEGER, audio_count INTEGER, last_compiled REAL,
+                                stamps TEXT, updated_at REAL)""")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_projects_book ON projects(book_id)")
+
+    # --- Queries -----------------------------------------------------------------
+    @property
+    def watching(self):
+        return bool(self._observer and self._observer.is_alive())
+
+    def projects_for_book(self, book_id):
+        """[{id, title, path, scene_count, image_count, audio_count, last_compiled}] for one book."""
+        if not self.watching:
+            self.sync()
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute("""SELECT id, title, scene_count, image_count, audio_count, last_compiled
+                                   FROM projects WHERE book_id = ? ORDER BY id""", (book_id,)).fetchall()
+        return [{**dict(r), "path": os.path.join(self.output_dir, r["id"])} for r in rows]
+
+    def asset_counts(self, project_dir):
+        """(images, audio files) of one project folder."""
+        project_id = self._project_id(project_dir)
+        if not self.watching:
+            self.refresh(project_id)
+        with self._connect() as conn:
+            row = conn.execute("SELECT image_count, audio_count FROM projects WHERE id = ?", (project_id,)).fetchone()
+        return tuple(row) if row else (0, 0)
+
+    # --- Updates -----------------------------------------------------------------
+    def refresh(self, project):
+        """Brings one project's row up to date (removes it if the folder is gone). Accepts an id or a path."""
+        project_id = self._project_id(project)
+        folder = os.path.join(self.output_dir, project_id)
+        with self._lock, self._connect() as conn:
+            if not project_id or project_id.startswith(".") or not os.path.isdir(folder):
+                conn.execute("DELETE FROM projects WHERE id = ?", (project_id,))
+                return None
+            row = conn.execute("SELECT book_id, title, scene_count, image_count, audio_count, stamps FROM projects WHERE id = ?",
+                               (project_id,)).fetchone()
+            old = json.loads(row[5]) if row else {}
+            stamps = self._stamps(folder)
+            if row and old == stamps:
+                return False
+            book_id, title, scenes, images, audio = row[:5] if row else (None, None, 0, 0, 0)
+            if old.get("config") != stamps["config"] or not row:
+                book_id, title = self._read_config(folder, project_id)
+            if old.get("ink") != stamps["ink"] or not row:
+                scenes = self._count_scenes(os.path.join(folder, "adventure.ink"))
+            if old.get("assets") != stamps["assets"] or not row:
+                images = self._count(os.path.join(folder, "assets"), IMAGE_EXTS)
+            if old.get("audio") != stamps["audio"] or not row:
+                audio = self._count(os.path.join(folder, "audio"), AUDIO_EXTS)
+            conn.execute("INSERT OR REPLACE INTO projects VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                         (project_id, book_id, title, scenes, images, audio,
+                          stamps["json"] / 1e9 if stamps["json"] else None, json.dumps(stamps), time.time()))
+            return True
+
+    def sync(self):
+        """Stats every project folder and refreshes the ones that changed. Returns the number of projects."""
+        folders = set()
+        if os.path.isdir(self.output_dir):
+            folders = {e.name for e in os.scandir(self.output_dir) if e.is_dir() and not e.name.startswith(".")}
+        with self._lock:
+            with self._connect() as conn:
+                known = {r[0] for r in conn.execute("SELECT id FROM projects")}
+                for gone in known - folders:
+                    conn.execute("DELETE FROM projects WHERE id = ?", (gone,))
+            for project_id in sorted(folders):
+                self.refresh(project_id)
+        return len(folders)
+
+    def watch(self):
+        """Starts the watchdog observer once per process (after a full sync). Returns True if watching."""
+        with self._lock:
+            if self.watching:
+                return True
+            if Observer is None:
+                return False
+            os.makedirs(self.output_dir, exist_ok=True)
+            self.sync()
+            try:
+                observer = Observer()
+                observer.daemon = True
+                observer.schedule(_ProjectEventHandler(self), self.output_dir, recursive=True)
+                observer.start()
+            except Exception as e:
+                print(f"⚠️ Project index watcher unavailable: {e}")
+                return False
+            self._observer = observer
+            return True
+
+    def stop(self):
+        with self._lock:
+            if self._observer:
+                self._observer.stop()
+                self._observer = None
+
+    def _touched(self, path):
+        rel = os.path.relpath(os.path.abspath(path), self.output_dir)
+        project_id = rel.split(os.sep, 1)[0]
+        if project_id in (".", "..") or project_id.startswith(".") or rel.startswith(".."):
+            return
+        with self._lock:
+            self._pending.add(project_id)
+            if self._timer is None:
+                self._timer = threading.Timer(DEBOUNCE_SECONDS, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush(self):
+        with self._lock:
+            pending, self._pending, self._timer = self._pending, set(), None
+        for project_id in pending:
+            try:
+                self.refresh(project_id)
+            except Exception as e:
+                print(f"⚠️ Project index refresh failed for {project_id}: {e}")
+
+    # --- Internals ---------------------------------------------------------------
+    def _project_id(self, project):
+        project = os.path.normpath(str(project or ""))
+        if os.path.isabs(project) or os.sep in project:
+            return os.path.basename(project)
+        return project
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _stamps(self, folder):
+        return {
+            "config": self._mtime(os.path.join(folder, "book_config.json")),
+            "ink": self._mtime(os.path.join(folder, "adventure.ink")),
+            "json": self._mtime(os.path.join(folder, "adventure.json")),
+            # Adding, removing or renaming a file updates the directory mtime
+            "assets": self._mtime(os.path.join(folder, "assets")),
+            "audio": self._mtime(os.path.join(folder, "audio")),
+        }
+
+    @staticmethod
+    def _read_config(folder, project_id):
+        fallback_title = project_id.replace('_', ' ').title()
+        try:
+            with open(os.path.join(folder, "book_config.json"), "r", encoding="utf-8") as f:
+                cfg = json.load(f)
+            return cfg.get("book_id"), cfg.get("title", fallback_title)
+        except (OSError, ValueError, AttributeError):
+            return None, fallback_title
+
+    @staticmethod
+    def _count_scenes(ink_path):
+        try:
+            with open(ink_path, "r", encoding="utf-8") as f:
+                return sum(1 for line in f if KNOT_RE.match(line))
+        except OSError:
+            return 0
+
+    @staticmethod
+    def _count(folder, exts):
+        try:
+            return sum(1 for e in os.scandir(folder) if e.is_file() and e.name.lower().endswith(exts))
+        except OSError:
+            return 0
+
+
+class _ProjectEventHandler(FileSystemEventHandler):
+    def __init__(self, index):
+        super().__init__()
+        self.index = index
+
+    def on_any_event(self, event):
+        if getattr(event, "event_type", None) in ("opened", "closed_no_write"):
+            return
+        self.index._touched(event.src_path)
+        if getattr(event, "dest_path", None):
+            self.index._touched(event.dest_path)
@@ -0,0 +1,245 @@
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from asset_derivatives import AssetDerivatives
+
+# claim() waits this long for a matching job that is still running before giving up
+CLAIM_WAIT_SECONDS = 2
+# Sound candidate paths are relative to the repository root (see SoundWeaver)
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+class _PrefetchJob:
+    def __init__(self, scene_id, kind, prompt, future):
+        self.scene_id = scene_id
+        self.kind = kind
+        self.prompt = prompt
+        self.future = future
+        self.stale = False
+
+
+class ScenePrefetcher:
+    """
+    Speculatively renders image and sound candidates for upcoming story-pack scenes
+    while the director is still reviewing the current one.
+
+    Jobs are keyed by (scene_id, kind) where kind is "main", "reward" or "sound" and
+    remember the prompt they were started with. `claim` only hands out results whose
+    prompt still matches the scene; edited prompts cancel the speculative job.
+    Images go to <assets>/prefetch and sounds to <audio>/prefetch, so half-finished
+    work never mixes with the candidates render_art_selection produces itself; `claim`
+    moves them up a level, so the prefetch folders only ever hold unclaimed renders.
+    """
+
+    def __init__(self, weaver, project_folder, generation_cfg, lookahead=2, sound_weaver=None):
+        self.lookahead = max(0, int(lookahead))
+        self.project_folder = project_folder
+        self.generation_cfg = generation_cfg or {}
+        self.sound_weaver = sound_weaver
+
+        # Own weaver (built from the current config and subscribed to its changes) that
+        # renders into the prefetch folder; the session's weaver is never touched
+        from visual_weaver import VisualWeaver
+        self.weaver = VisualWeaver(weaver.base_url, auto_make_dir=False)
+        self.weaver.output_dir = os.path.join(weaver.output_dir, "prefetch")
+        self.sound_dir = os.path.join(os.path.dirname(weaver.output_dir), "audio", "prefetch")
+
+        # One worker per backend: the GPU renders one batch at a time anyway, and
+        # ElevenLabs calls should not queue behind SD batches.
+        self._visual_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch-visual")
+        self._sound_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch-sound")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def scene_prompts(scene):
+        """Returns {kind: prompt} for everything render_art_selection would generate."""
+        prompts = {"main": scene.get("visual_prompt", "")}
+        exquisite = next((c for c in scene.get("choices", []) if c.get("type") == "exquisite"), None)
+        if exquisite and exquisite.get("reward_visual_prompt"):
+            prompts["reward"] = exquisite.get("reward_visual_prompt")
+        prompts["sound"] = scene.get("audio_prompt", scene.get("visual_prompt", ""))
+        return prompts
+
+    def schedule(self, scenes):
+        """Queues candidate generation for the given scenes, in order.
+        Pass the scene under review followed by up to `lookahead` upcoming scenes.
+        Already scheduled (scene, kind, prompt) combinations are skipped, so this is
+        cheap to call on every Streamlit rerun.
+        """
+        if self.lookahead <= 0:
+            return
+        img_count = int(self.generation_cfg.get("images_per_scene", 0))
+        snd_count = int(self.generation_cfg.get("sounds_per_scene", 0))
+
+        for scene in scenes[:self.lookahead + 1]:
+            if not isinstance(scene, dict):
+                continue
+            scene_id = scene.get("scene_id")
+            if not scene_id:
+                continue
+            for kind, prompt in self.scene_prompts(scene).items():
+                if not prompt:
+                    continue
+                if kind == "sound":
+                    if snd_count <= 0 or not self._sound_target_missing(scene_id):
+                        continue
+                elif img_count <= 0 or not self._image_target_missing(scene_id, kind):
+                    continue
+                self._submit(scene_id, kind, prompt, img_count if kind != "sound" else snd_count)
+
+    def _image_target_missing(self, scene_id, kind):
+        suffix = "main" if kind == "main" else "reward"
+        target = os.path.join(os.path.dirname(self.weaver.output_dir), f"{scene_id}_{suffix}.png")
+        return not os.path.exists(target)
+
+    def _sound_target_missing(self, scene_id):
+        return not os.path.exists(os.path.join(os.path.dirname(self.sound_dir), f"{scene_id}.mp3"))
+
+    def _submit(self, scene_id, kind, prompt, count):
+        key = (scene_id, kind)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job and job.prompt == prompt and not job.stale:
+                return
+            if job:
+                self._cancel_job(job)
+
+            if kind == "sound":
+                future = self._sound_pool.submit(self._render_sound, scene_id, prompt, count)
+            else:
+                base = scene_id if kind == "main" else f"{scene_id}_REW"
+                future = self._visual_pool.submit(self.weaver.generate_batch, prompt, base, count)
+            job = _PrefetchJob(scene_id, kind, prompt, future)
+            future.add_done_callback(lambda f, j=job: self._on_done(j))
+            self._jobs[key] = job
+        print(f"🔮 Prefetch queued: {scene_id} [{kind}]")
+
+    def _render_sound(self, scene_id, prompt, count):
+        from sound_weaver import SoundWeaver
+        sw = self.sound_weaver or SoundWeaver()
+        return sw.generate_candidates(
+            self.project_folder, scene_id, prompt,
+            count=count,
+            length_seconds=self.generation_cfg.get("sound_length_seconds", 5),
+            loop=self.generation_cfg.get("sound_loop", False),
+            output_dir=self.sound_dir
+        )
+
+    def _on_done(self, job):
+        """Drops the output of jobs that went stale while they were still running."""
+        if not job.stale or job.future.cancelled():
+            return
+        try:
+            self._discard_result(job.kind, job.future.result())
+        except Exception:
+            pass
+
+    @staticmethod
+    def _discard_result(kind, result):
+        for item in result or []:
+            path = item.get("file") if isinstance(item, dict) else item
+            if not path:
+                continue
+            if kind == "sound":
+                path = os.path.join(ROOT_DIR, path)
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except Exception:
+                pass
+
+    def _cancel_job(self, job):
+        # Caller holds self._lock
+        job.stale = True
+        if not job.future.cancel() and job.future.done():
+            self._on_done(job)
+        self._jobs.pop((job.scene_id, job.kind), None)
+        print(f"🛑 Prefetch cancelled: {job.scene_id} [{job.kind}]")
+
+    def invalidate(self, scene):
+        """Cancels jobs for this scene whose prompt no longer matches (e.g. after an edit)."""
+        scene_id = scene.get("scene_id")
+        prompts = self.scene_prompts(scene)
+        with self._lock:
+            for kind in ("main", "reward", "sound"):
+                job = self._jobs.get((scene_id, kind))
+                if job and job.prompt != prompts.get(kind):
+                    self._cancel_job(job)
+
+    def claim(self, scene_id, kind, prompt, timeout=CLAIM_WAIT_SECONDS):
+        """
+        Returns the prefetched candidates for (scene_id, kind) if they were generated
+        for `prompt`, moved out of the prefetch folders into the assets/audio folders.
+        A matching job that is still running is waited for up to `timeout` seconds; if it
+        is not done by then it stays scheduled (see is_pending) and None is returned, as
+        it is when nothing usable exists, so the caller can poll or generate as usual.
+        """
+        with self._lock:
+            job = self._jobs.get((scene_id, kind))
+            if not job:
+                return None
+            if job.prompt != prompt:
+                self._cancel_job(job)
+                return None
+        try:
+            result = job.future.result(timeout=timeout)
+        except FutureTimeout:
+            return None
+        except Exception as e:
+            print(f"⚠️ Prefetch for {scene_id} [{kind}] failed: {e}")
+            result = None
+        with self._lock:
+            if self._jobs.get((scene_id, kind)) is not job:
+                return None  # cancelled or claimed meanwhile
+            del self._jobs[(scene_id, kind)]
+        if kind == "sound":
+            result = self._move_to_audio(result)
+        else:
+            result = self._move_to_assets(result)
+        return result or None
+
+    def _move_to_assets(self, paths):
+        """Moves claimed candidate images (dropping their prefetch derivatives) up into <assets>."""
+        assets_dir = os.path.dirname(self.weaver.output_dir)
+        derivatives = AssetDerivatives.from_config(self.weaver.config, self.weaver.output_dir)
+        moved = []
+        for path in paths or []:
+            if not path or not os.path.exists(path):
+                continue
+            if derivatives:
+                derivatives.discard(path)
+            target = os.path.join(assets_dir, os.path.basename(path))
+            os.replace(path, target)
+            moved.append(target)
+        return moved
+
+    def _move_to_audio(self, candidates):
+        """Moves claimed sound candidates up into <audio> and points their entries there."""
+        audio_dir = os.path.dirname(self.sound_dir)
+        moved = []
+        for candidate in candidates or []:
+            path = os.path.join(ROOT_DIR, candidate.get("file", ""))
+            if not candidate.get("file") or not os.path.exists(path):
+                continue
+            target = os.path.join(audio_dir, os.path.basename(path))
+            os.replace(path, target)
+            moved.append({**candidate, "file": os.path.relpath(target, ROOT_DIR).replace("\\", "/")})
+        return moved
+
+    def is_pending(self, scene_id, kind):
+        with self._lock:
+            job = self._jobs.get((scene_id, kind))
+            return bool(job and not job.future.done())
+
+    def shutdown(self):
+        """Cancels everything queued and removes unclaimed prefetched images and sounds
+        (claimed ones were already moved out of the prefetch folders)."""
+        with self._lock:
+            for job in list(self._jobs.values()):
+                self._cancel_job(job)
+        self._visual_pool.shutdown(wait=False, cancel_futures=True)
+        self._sound_pool.shutdown(wait=False, cancel_futures=True)
+        shutil.rmtree(self.weaver.output_dir, ignore_errors=True)
+        shutil.rmtree(self.sound_dir, ignore_errors=True)
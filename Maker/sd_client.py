@@ -0,0 +1,272 @@
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from image_stream import ImageStreamDecoder
+
+try:
+    import httpx  # installed with google-genai; only needed for the async client
+except ImportError:
+    httpx = None
+
+# Seconds per endpoint: quick probes fail fast, renders may take a while
+DEFAULT_TIMEOUTS = {
+    "options": 5,
+    "sd-models": 5,
+    "progress": 3,
+    "txt2img": 60,
+}
+# /options and /sd-models barely change; Streamlit reruns should not hit the server each time
+METADATA_TTL = 10
+STREAM_CHUNK_SIZE = 256 * 1024
+# A checkpoint seen loaded this recently is trusted without asking the WebUI again
+CHECKPOINT_TRUST_SECONDS = 60
+
+
+def same_checkpoint(a, b):
+    """'model.safetensors [6ce0161689]' and 'model.safetensors' name the same checkpoint."""
+    if not a or not b:
+        return False
+    strip = lambda name: name.split(" [")[0].replace("\\", "/").rsplit("/", 1)[-1].strip()
+    return strip(a) == strip(b)
+
+
+class SDClient:
+    """
+    Pooled HTTP client for the SD WebUI API (sync).
+
+    One keep-alive `requests.Session` per WebUI URL is shared by every VisualWeaver in the
+    process (see `shared`), so reruns, scenes and parallel candidates reuse TCP connections
+    instead of opening one per call. GETs of /options and /sd-models are cached for a
+    short TTL; changing the options invalidates that cache.
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, base_url, timeouts=None, pool_size=8):
+        self.base_url = base_url.rstrip('/')
+        self.timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+        self.pool_size = 0
+        self.session = requests.Session()
+        self._mount(pool_size)
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+        # Checkpoint the WebUI has loaded, as last seen in an /options response
+        self.loaded_checkpoint = None
+        self.checkpoint_seen_at = 0.0
+        self._switch_lock = threading.Lock()
+
+    def _mount(self, pool_size):
+        """(Re)mounts the connection pool with room for `pool_size` concurrent requests."""
+        old = self.session.adapters.get("http://")
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.pool_size = pool_size
+        if old is not None:
+            old.close()  # idle sockets close now, in-flight ones when their request returns
+
+    @classmethod
+    def shared(cls, base_url, timeouts=None, pool_size=8):
+        """
+        Returns the process-wide client for `base_url`. Timeouts are updated in place and a
+        larger `pool_size` grows the connection pool of the same session, so the tracked
+        checkpoint and the metadata cache survive.
+        """
+        key = base_url.rstrip('/')
+        with cls._instances_lock:
+            client = cls._instances.get(key)
+            if client is None:
+                client = cls._instances[key] = cls(key, timeouts, pool_size)
+                return client
+            if timeouts:
+                client.timeouts.update(timeouts)
+            if client.pool_size < pool_size:
+                client._mount(pool_size)
+            return client
+
+    def url(self, endpoint):
+        return f"{self.base_url}/sdapi/v1/{endpoint}"
+
+    def get(self, endpoint, params=None, ttl=0, timeout=None):
+        """GET /sdapi/v1/<endpoint>. With `ttl`, a successful response is reused for that many seconds."""
+        if ttl:
+            with self._cache_lock:
+                hit = self._cache.get(endpoint)
+            if hit and hit[0] > time.time():
+                return hit[1]
+        response = self.session.get(self.url(endpoint), params=params,
+                                    timeout=timeout or self.timeouts.get(endpoint, 10))
+        if endpoint == "options" and response.status_code == 200:
+            self._note_checkpoint(response.json().get("sd_model_checkpoint"))
+        if ttl and response.status_code == 200:
+            with self._cache_lock:
+                self._cache[endpoint] = (time.time() + ttl, response)
+        return response
+
+    def _note_checkpoint(self, checkpoint):
+        self.loaded_checkpoint = checkpoint
+        self.checkpoint_seen_at = time.time()
+
+    def has_checkpoint(self, target):
+        """True if `target` was seen loaded recently enough to skip asking the WebUI."""
+        return (same_checkpoint(self.loaded_checkpoint, target)
+                and time.time() - self.checkpoint_seen_at < CHECKPOINT_TRUST_SECONDS)
+
+    def ensure_checkpoint(self, target, timeout=180, interval=0.5):
+        """
+        Makes sure `target` is the loaded checkpoint. Returns True once it is.
+        Nothing is requested while the tracked checkpoint is fresh; otherwise /options is read
+        (TTL-cached) and, only if needed, the switch is posted and /progress plus /options are
+        polled until the WebUI reports the new checkpoint and no running job, or `timeout` passes.
+        """
+        if self.has_checkpoint(target):
+            return True
+        with self._switch_lock:
+            if self.has_checkpoint(target):
+                return True  # another thread finished the switch meanwhile
+            response = self.options()
+            if response.status_code == 200 and same_checkpoint(self.loaded_checkpoint, target):
+                self._note_checkpoint(self.loaded_checkpoint)
+                return True
+
+            print(f"🔄 Switching model to: {target} (loaded: {self.loaded_checkpoint})...")
+            started = time.time()
+            try:
+                # The WebUI usually answers once the weights are loaded, but may return early
+                self.post("options", {"sd_model_checkpoint": target}, timeout=timeout)
+            except requests.exceptions.Timeout:
+                pass
+            while time.time() - started < timeout:
+                if not self._busy() and self.get("options").status_code == 200 \
+                        and same_checkpoint(self.loaded_checkpoint, target):
+                    print(f"✅ Model switch completed in {time.time() - started:.1f}s")
+                    return True
+                time.sleep(interval)
+            print(f"⚠️ Model switch to {target} not confirmed after {timeout}s")
+            self.loaded_checkpoint = None
+            return False
+
+    def _busy(self):
+        try:
+            response = self.progress()
+            if response.status_code != 200:
+                return False
+            data = response.json()
+            return bool(data.get("state", {}).get("job_count", 0)) or float(data.get("progress", 0.0)) > 0
+        except (requests.exceptions.RequestException, ValueError):
+            return True
+
+    def post(self, endpoint, payload, timeout=None):
+        if endpoint == "options":
+            self.invalidate("options")
+        return self.session.post(self.url(endpoint), json=payload,
+                                 timeout=timeout or self.timeouts.get(endpoint, 10))
+
+    def invalidate(self, endpoint=None):
+        with self._cache_lock:
+            if endpoint:
+                self._cache.pop(endpoint, None)
+            else:
+                self._cache.clear()
+
+    def check_connection(self):
+        """Checks if the SD WebUI is reachable. Returns (Success, Message)."""
+        try:
+            response = self.options()
+            if response.status_code == 200:
+                return True, "Connected"
+            elif response.status_code == 404:
+                return False, "Server Running but API not found. Add '--api' to COMMANDLINE_ARGS."
+            else:
+                return False, f"Server Error (Status: {response.status_code})"
+        except requests.exceptions.ConnectionError:
+            return False, "Connection Refused. Is WebForge running?"
+        except Exception as e:
+            return False, f"Error: {e}"
+
+    def options(self, ttl=METADATA_TTL):
+        return self.get("options", ttl=ttl)
+
+    def sd_models(self, ttl=METADATA_TTL):
+        return self.get("sd-models", ttl=ttl)
+
+    def progress(self):
+        return self.get("progress", params={"skip_current_image": "true"})
+
+    def txt2img(self, payload, timeout=None):
+        response = self.post("txt2img", payload, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def txt2img_to_files(self, payload, paths, timeout=None):
+        """
+        Renders and streams the images[] of the response straight into `paths` (temp file +
+        atomic rename each), without holding the JSON or the decoded PNGs in memory.
+        Returns the paths written, in order.
+        """
+        with self.session.post(self.url("txt2img"), json=payload, stream=True,
+                               timeout=timeout or self.timeouts.get("txt2img", 60)) as response:
+            response.raise_for_status()
+            decoder = ImageStreamDecoder(paths)
+            try:
+                for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                    decoder.feed(chunk)
+            finally:
+                written = decoder.close()
+        return written
+
+
+class AsyncSDClient:
+    """
+    httpx-based async counterpart of SDClient for concurrent renders: one pooled
+    AsyncClient with keep-alive, used as `async with AsyncSDClient(url) as client`.
+    """
+
+    def __init__(self, base_url, timeouts=None, max_connections=8):
+        if httpx is None:
+            raise ImportError("httpx is required for AsyncSDClient (pip install httpx)")
+        self.base_url = base_url.rstrip('/')
+        self.timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    def url(self, endpoint):
+        return f"{self.base_url}/sdapi/v1/{endpoint}"
+
+    async def get(self, endpoint, params=None, timeout=None):
+        return await self.client.get(self.url(endpoint), params=params,
+                                     timeout=timeout or self.timeouts.get(endpoint, 10))
+
+    async def progress(self):
+        return await self.get("progress", params={"skip_current_image": "true"})
+
+    async def txt2img(self, payload, timeout=None):
+        response = await self.client.post(self.url("txt2img"), json=payload,
+                                          timeout=timeout or self.timeouts.get("txt2img", 60))
+        response.raise_for_status()
+        return response.json()
+
+    async def txt2img_to_files(self, payload, paths, timeout=None):
+        """Async counterpart of SDClient.txt2img_to_files."""
+        async with self.client.stream("POST", self.url("txt2img"), json=payload,
+                                      timeout=timeout or self.timeouts.get("txt2img", 60)) as response:
+            response.raise_for_status()
+            decoder = ImageStreamDecoder(paths)
+            try:
+                async for chunk in response.aiter_bytes(STREAM_CHUNK_SIZE):
+                    decoder.feed(chunk)
+            finally:
+                written = decoder.close()
+        return written
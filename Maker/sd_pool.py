@@ -0,0 +1,204 @@
+import time
+import asyncio
+import threading
+from sd_client import SDClient, same_checkpoint
+
+DISPATCH_MODES = ("least_loaded", "round_robin")
+# A node that failed a render is skipped by dispatch for this long
+FAILURE_COOLDOWN = 30
+# With several nodes, a failed health check is reused for this long (a dead node would block each rerun)
+HEALTH_TTL = 10
+# Pause before a node that already failed this render is tried again
+RETRY_DELAY = 2
+
+
+class SDBackend:
+    """One WebUI node of the pool: its shared client, capacity and live bookkeeping."""
+
+    def __init__(self, url, client, max_jobs=1):
+        self.url = url
+        self.client = client
+        self.max_jobs = max(1, int(max_jobs))
+        self.active = 0
+        self.dispatched = 0
+        # Render cooldown (set by failed renders, read by dispatch)
+        self.down_until = 0.0
+        self.last_error = None
+        # Health check result, kept apart from the cooldown
+        self.health_ok = False
+        self.health_message = None
+        self.checked_at = 0.0
+
+    @property
+    def available(self):
+        return time.time() >= self.down_until
+
+    def has(self, checkpoint):
+        return not checkpoint or same_checkpoint(self.client.loaded_checkpoint, checkpoint)
+
+
+class SDBackendPool:
+    """
+    Spreads txt2img work over several SD WebUI instances.
+
+    Nodes come from sd_settings.backends in book_config.json (a URL or {"url", "max_jobs"}
+    per node); without that list the pool holds the weaver's single api_url, which behaves
+    like before. `run` picks a node per render: nodes that are not saturated and already
+    have the wanted checkpoint loaded come first (a switch costs far more than a short
+    queue), then the least loaded one (active / max_jobs) or the next one in turn
+    (sd_settings.dispatch = "round_robin"). A node that fails is put on cooldown and the
+    render moves to another node; a node is only retried once every other one failed too.
+    Pools are shared per node list, so load counts cover every weaver and job in the process.
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, backends, dispatch="least_loaded"):
+        if not backends:
+            raise ValueError("SDBackendPool needs at least one backend")
+        self.backends = backends
+        self.dispatch = dispatch if dispatch in DISPATCH_MODES else "least_loaded"
+        self._lock = threading.Lock()
+        self._cursor = 0
+
+    @classmethod
+    def from_config(cls, config, default_url, timeouts=None, pool_size=8):
+        """The shared pool for sd_settings.backends (or just `default_url`)."""
+        sd_settings = (config or {}).get("sd_settings", {})
+        nodes = []
+        for entry in sd_settings.get("backends") or [default_url]:
+            url, max_jobs = (entry, 1) if isinstance(entry, str) else (entry.get("url"), entry.get("max_jobs", 1))
+            if url and url.startswith("http") and url.rstrip('/') not in [n[0] for n in nodes]:
+                nodes.append((url.rstrip('/'), int(max_jobs)))
+        if not nodes:
+            nodes = [(default_url.rstrip('/'), 1)]
+
+        key = tuple(url for url, _ in nodes)
+        with cls._instances_lock:
+            pool = cls._instances.get(key)
+            if pool is None:
+                pool = cls._instances[key] = cls([SDBackend(url, SDClient.shared(url, timeouts, pool_size), jobs)
+                                                  for url, jobs in nodes])
+            for backend, (url, jobs) in zip(pool.backends, nodes):
+                backend.max_jobs = max(1, jobs)
+                backend.client = SDClient.shared(url, timeouts, pool_size)
+            dispatch = sd_settings.get("dispatch", "least_loaded")
+            pool.dispatch = dispatch if dispatch in DISPATCH_MODES else "least_loaded"
+            return pool
+
+    def __len__(self):
+        return len(self.backends)
+
+    @property
+    def primary(self):
+        return self.backends[0]
+
+    # --- Health ------------------------------------------------------------------
+    def check_connection(self, force=False):
+        """Health-checks every node (SDClient.check_connection). Returns (any online, message)."""
+        results = [(b, self._check(b, force)) for b in self.backends]
+        online = [b for b, (ok, _) in results if ok]
+        if len(self.backends) == 1:
+            return results[0][1]
+        if online:
+            return True, f"Connected ({len(online)}/{len(self.backends)} backends online)"
+        return False, f"All {len(self.backends)} backends offline: {results[0][1][1]}"
+
+    def _check(self, backend, force=False):
+        """
+        A single node is always probed (its /options response is TTL-cached by the client).
+        With several nodes a failed probe is reused for HEALTH_TTL. Health never touches the
+        render cooldown: a failed render does not make a reachable node look offline.
+        """
+        fresh = time.time() - backend.checked_at < HEALTH_TTL
+        if not force and len(self.backends) > 1 and fresh and not backend.health_ok:
+            return backend.health_ok, backend.health_message
+        ok, message = backend.client.check_connection()
+        backend.health_ok, backend.health_message, backend.checked_at = ok, message, time.time()
+        return ok, message
+
+    def available(self):
+        """Nodes not on cooldown (all nodes if every one is)."""
+        nodes = [b for b in self.backends if b.available]
+        return nodes or list(self.backends)
+
+    def capacity(self):
+        return sum(b.max_jobs for b in self.available())
+
+    # --- Dispatch ----------------------------------------------------------------
+    def acquire(self, checkpoint=None, exclude=()):
+        """Reserves the best node for one render (see class docs), or None if every node is excluded."""
+        with self._lock:
+            candidates = [b for b in self.backends if b.url not in exclude]
+            if not candidates:
+                return None
+            healthy = [b for b in candidates if b.available]
+            candidates = healthy or sorted(candidates, key=lambda b: b.down_until)[:1]
+            self._cursor += 1
+            if self.dispatch == "round_robin":
+                n = len(self.backends)
+                order = lambda b: (not b.has(checkpoint), (self.backends.index(b) - self._cursor) % n)
+            else:
+                order = lambda b: (b.active >= b.max_jobs, not b.has(checkpoint), b.active / b.max_jobs, b.dispatched)
+            backend = min(candidates, key=order)
+            backend.active += 1
+            backend.dispatched += 1
+            return backend
+
+    def release(self, backend, error=None):
+        with self._lock:
+            backend.active = max(0, backend.active - 1)
+            if error is not None:
+                backend.down_until = time.time() + FAILURE_COOLDOWN
+                backend.last_error = str(error)
+
+    def run(self, fn, checkpoint=None, attempts=3, on_dispatch=None):
+        """
+        Calls fn(backend) on up to `attempts` nodes until one succeeds and returns its result.
+        Every attempt goes to a node that has not failed this call yet; once all were tried
+        the round starts over after RETRY_DELAY (with one node this is a plain retry loop).
+        """
+        tried = set()
+        last_error = None
+        for attempt in range(max(1, int(attempts))):
+            backend = self.acquire(checkpoint, exclude=tried)
+            if backend is None:
+                time.sleep(RETRY_DELAY)
+                tried.clear()
+                backend = self.acquire(checkpoint)
+            try:
+                if on_dispatch:
+                    on_dispatch(backend)
+                result = fn(backend)
+            except Exception as e:
+                self.release(backend, error=e)
+                tried.add(backend.url)
+                last_error = e
+                print(f"⚠️ Attempt {attempt+1} failed on {backend.url}: {e}")
+                continue
+            self.release(backend)
+            return result
+        raise last_error
+
+    async def run_async(self, fn, checkpoint=None, attempts=3):
+        """`run` for coroutines: awaits fn(backend) with the same dispatch, cooldown and failover."""
+        tried = set()
+        last_error = None
+        for attempt in range(max(1, int(attempts))):
+            backend = self.acquire(checkpoint, exclude=tried)
+            if backend is None:
+                await asyncio.sleep(RETRY_DELAY)
+                tried.clear()
+                backend = self.acquire(checkpoint)
+            try:
+                result = await fn(backend)
+            except Exception as e:
+                self.release(backend, error=e)
+                tried.add(backend.url)
+                last_error = e
+                print(f"⚠️ Attempt {attempt+1} failed on {backend.url}: {e}")
+                continue
+            self.release(backend)
+            return result
+        raise last_error
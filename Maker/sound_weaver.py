@@ -8,6 +8,11 @@ import wave
 import struct
 from typing import List, Dict, Optional
 import subprocess
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from asset_cache import AssetCache
+import audio_loop
 
 # Optional: pydub is preferred for audio post-processing; fall back to ffmpeg via subprocess
 try:
@@ -16,14 +21,23 @@ try:
 except Exception:
     PYDUB_AVAILABLE = False
 
+LOOP_SAMPLE_RATE = 22050
+
 PROJECTS_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'output')
 
 
-def _post_process(file_path: str, length_seconds: int = 5, crossfade_ms: int = 100, target_lufs: Optional[float] = -14.0) -> Dict:
+def _post_process(file_path: str, length_seconds: int = 5, crossfade_ms: int = 100, target_lufs: Optional[float] = -14.0,
+                  loop: bool = False, loop_crossfade_ms: int = 250) -> Dict:
     """Normalize, ensure exact length, and apply short fades for better loopability.
+    With `loop`, a seamless loop is synthesized instead (see audio_loop).
     Returns a dict with processing metadata and any errors.
     """
     info = {'processed': False, 'notes': []}
+    if loop and audio_loop.NUMPY_AVAILABLE:
+        try:
+            return _build_loop(file_path, length_seconds, loop_crossfade_ms, target_lufs)
+        except Exception as e:
+            info['notes'].append(f'Loop synthesis failed, using fades instead: {e}')
     try:
         desired_ms = int(length_seconds * 1000)
         if PYDUB_AVAILABLE:
@@ -74,6 +88,84 @@ def _post_process(file_path: str, length_seconds: int = 5, crossfade_ms: int = 1
     return info
 
 
+# Parameters generate_candidates passes to _post_process; part of the processed-audio cache key
+POSTPROCESS_PARAMS = {'crossfade_ms': 100, 'target_lufs': -14.0, 'loop_crossfade_ms': 250}
+# Bump when _post_process changes its output, so cached processed files are not reused
+POSTPROCESS_VERSION = 2
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def _processing_params(length_seconds: int) -> Dict:
+    return {
+        'length_seconds': length_seconds,
+        'backend': 'pydub' if PYDUB_AVAILABLE else 'ffmpeg',
+        'numpy_loop': audio_loop.NUMPY_AVAILABLE,
+        'version': POSTPROCESS_VERSION,
+        **POSTPROCESS_PARAMS,
+    }
+
+
+def _get_process_pool(workers: int) -> Optional[ProcessPoolExecutor]:
+    """Shared worker processes for _post_process (started once; None if processes are unavailable)."""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            try:
+                # spawn, not fork: the dashboard process runs Streamlit/prefetch threads
+                _process_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            except Exception as e:
+                print(f"⚠️ Could not start sound post-processing workers: {e}")
+                return None
+        return _process_pool
+
+
+def _reset_process_pool():
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+
+def _decode_pcm(file_path: str, sample_rate: int = LOOP_SAMPLE_RATE, target_lufs: Optional[float] = -14.0) -> bytes:
+    """Decodes any input to mono 16-bit PCM (ffmpeg path: loudness-normalized on the way)."""
+    if PYDUB_AVAILABLE:
+        audio = AudioSegment.from_file(file_path).set_channels(1).set_frame_rate(sample_rate).set_sample_width(2)
+        return audio.raw_data
+    afilter = ['-af', f'loudnorm=I={target_lufs}:LRA=7:TP=-2'] if target_lufs is not None else []
+    cmd = ['ffmpeg', '-v', 'error', '-i', file_path, *afilter, '-f', 's16le', '-ac', '1', '-ar', str(sample_rate), '-']
+    return subprocess.run(cmd, check=True, capture_output=True).stdout
+
+
+def _export_pcm_mp3(pcm: bytes, file_path: str, sample_rate: int = LOOP_SAMPLE_RATE):
+    """Encodes mono 16-bit PCM to MP3 (LAME header included, so decoders can trim the encoder padding)."""
+    tmp_out = file_path + '.proc.mp3'
+    if PYDUB_AVAILABLE:
+        AudioSegment(data=pcm, sample_width=2, frame_rate=sample_rate, channels=1).export(tmp_out, format='mp3', bitrate='128k')
+    else:
+        cmd = ['ffmpeg', '-y', '-v', 'error', '-f', 's16le', '-ar', str(sample_rate), '-ac', '1', '-i', '-', '-b:a', '128k', tmp_out]
+        subprocess.run(cmd, check=True, input=pcm, capture_output=True)
+    os.replace(tmp_out, file_path)
+
+
+def _build_loop(file_path: str, length_seconds: int, crossfade_ms: int, target_lufs: Optional[float]) -> Dict:
+    """Decode once, build the loop on the PCM array, encode once."""
+    samples = audio_loop.from_int16(_decode_pcm(file_path, LOOP_SAMPLE_RATE, target_lufs))
+    if len(samples) < LOOP_SAMPLE_RATE // 2:
+        raise ValueError('clip too short to loop')
+    looped = audio_loop.make_seamless_loop(samples, LOOP_SAMPLE_RATE, length_seconds, crossfade_ms=crossfade_ms)
+    if PYDUB_AVAILABLE:
+        looped = audio_loop.normalize_peak(looped)
+    _export_pcm_mp3(audio_loop.to_int16(looped), file_path, LOOP_SAMPLE_RATE)
+    return {
+        'processed': True,
+        'loop_seconds': round(len(looped) / LOOP_SAMPLE_RATE, 3),
+        'notes': [f'Seamless loop built ({len(looped) / LOOP_SAMPLE_RATE:.2f}s, {crossfade_ms} ms equal-power crossfade).'],
+    }
+
+
 def _sanitize_name(name: str) -> str:
     clean = "".join(c for c in name if c.isalnum() or c in ('_', '-'))
     return clean.strip() # Only strip whitespace
@@ -127,11 +219,22 @@ def _write_silence_mp3(file_path: str, duration_seconds: int = 5, sample_rate: i
 
 
 class SoundWeaver:
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, cache: Optional[AssetCache] = None, config: Optional[Dict] = None):
         # Prefer env var if not provided
         self.api_key = api_key or os.getenv('ELEVENLABS_API_KEY')
         # Use the specific Sound Generation endpoint
         self.api_endpoint = "https://api.elevenlabs.io/v1/sound-generation"
+        if config is None:
+            from utils import DashboardUtils
+            config = DashboardUtils.load_config()
+        # Raw ElevenLabs responses are cached by prompt hash + candidate index
+        if cache is None:
+            cache = AssetCache.from_config(config)
+        self.cache = cache
+        # Concurrent ElevenLabs requests / post-processing worker processes
+        sound_settings = config.get('sound_settings', {})
+        self.max_workers = max(1, int(sound_settings.get('max_workers', 3)))
+        self.process_workers = max(1, int(sound_settings.get('process_workers', 2)))
 
     def _call_elevenlabs(self, prompt, length_seconds=None, model='eleven_text_to_sound_v2', loop=False):
         """
@@ -179,24 +282,37 @@ class SoundWeaver:
             # Bubble up to caller to decide fallback behavior
             raise
 
-    def generate_candidates(self, book_id, base_name, prompt, count=1, length_seconds=None, model='eleven_text_to_sound_v2', dry_run=False, postprocess=True, loop=False):
+    def generate_candidates(self, book_id, base_name, prompt, count=1, length_seconds=None, model='eleven_text_to_sound_v2', dry_run=False, postprocess=True, loop=False, reroll=0,
+                            output_dir=None):
         """
         Generate `count` audio candidates for a scene and save them into the project's audio folder.
         Returns list of dicts: {"file": <relative_path>, "meta": {...}}
 
         If `dry_run` is True, no API call is made — silent placeholders are written instead.
         If `postprocess` is False, the generated audio will not be run through normalization/trim/fade steps.
+
+        Candidates are fetched concurrently (sound_settings.max_workers) and each one is handed to
+        the post-processing worker processes as soon as it arrives. Processed files are cached by
+        prompt hash + processing parameters, so a repeated prompt/length is neither fetched nor re-encoded.
+        An explicit "Regenerate" passes a new `reroll` count, which is part of the cache keys, so the
+        user gets fresh takes from ElevenLabs instead of the cached ones.
+        `output_dir` writes the candidates somewhere else than the project's audio folder
+        (the scene prefetcher stages them until they are claimed).
         """
-        out = []
+        if count <= 0:
+            return []
         project_id_s = _sanitize_name(book_id)
         scene_s = _sanitize_name(base_name)
-        audio_dir = _ensure_audio_dir(project_id_s)
+        if output_dir:
+            audio_dir = output_dir
+            os.makedirs(audio_dir, exist_ok=True)
+        else:
+            audio_dir = _ensure_audio_dir(project_id_s)
+        phash = _prompt_hash(prompt, model, length_seconds)
 
+        jobs = []
         for idx in range(count):
-            phash = _prompt_hash(prompt, model, length_seconds)
             filename = f"{project_id_s}_{scene_s}_sfx_{phash}_{idx}.mp3"
-            file_path = os.path.join(audio_dir, filename)
-
             meta = {
                 'project_id': project_id_s,
                 'scene_id': scene_s,
@@ -206,14 +322,75 @@ class SoundWeaver:
                 'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
                 'candidate_index': idx,
                 'placeholder': False,
+                'reroll': reroll,
             }
-
-            try:
-                if dry_run or not self.api_key:
-                    # Create silent placeholder
-                    _write_silence_mp3(file_path, int(length_seconds))
-                    meta['placeholder'] = True
-                    meta['note'] = 'Dry-run or missing API key; placeholder silence written.'
+            jobs.append((os.path.join(audio_dir, filename), meta))
+
+        results = [None] * count
+        processing = {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, count), thread_name_prefix="elevenlabs") as pool:
+            fetches = {
+                pool.submit(self._fetch_candidate, file_path, meta, prompt, phash, length_seconds, model, dry_run, loop, postprocess): idx
+                for idx, (file_path, meta) in enumerate(jobs)
+            }
+            for future in as_completed(fetches):
+                idx = fetches[future]
+                file_path, meta = jobs[idx]
+                needs_processing, processed_key = future.result()
+                if needs_processing:
+                    processing[idx] = (self._submit_post_process(file_path, int(length_seconds), loop), processed_key)
+                else:
+                    results[idx] = self._candidate_entry(file_path, meta)
+
+        for idx, (future, processed_key) in processing.items():
+            file_path, meta = jobs[idx]
+            proc_info = self._post_process_result(future, file_path, int(length_seconds), loop)
+            if proc_info.get('processed'):
+                meta['processed'] = True
+                if proc_info.get('loop_seconds'):
+                    meta['loop_seconds'] = proc_info['loop_seconds']
+                if processed_key:
+                    self.cache.store(processed_key, file_path, kind='audio')
+            meta['processing_notes'] = proc_info.get('notes', [])
+            results[idx] = self._candidate_entry(file_path, meta)
+
+        return [r for r in results if r]
+
+    def _fetch_candidate(self, file_path, meta, prompt, phash, length_seconds, model, dry_run, loop, postprocess):
+        """
+        Writes one candidate (cache, API or placeholder) to file_path.
+        Returns (needs_post_processing, processed_cache_key).
+        """
+        idx = meta['candidate_index']
+        filename = os.path.basename(file_path)
+        try:
+            processed_key = None
+            if dry_run or not self.api_key:
+                # Create silent placeholder
+                _write_silence_mp3(file_path, int(length_seconds))
+                meta['placeholder'] = True
+                meta['note'] = 'Dry-run or missing API key; placeholder silence written.'
+            else:
+                # Reroll 0 keeps the keys of earlier runs valid
+                salt = {'reroll': meta['reroll']} if meta['reroll'] else {}
+                processed_key = AssetCache.make_key(
+                    kind='elevenlabs_processed', prompt_hash=phash, candidate_index=idx, loop=loop,
+                    **_processing_params(int(length_seconds)), **salt
+                ) if self.cache and postprocess else None
+                if processed_key and self.cache.fetch(processed_key, file_path):
+                    meta['cached'] = True
+                    meta['processed'] = True
+                    meta['processing_notes'] = ['Processed audio restored from the asset cache.']
+                    print(f"♻️ Asset cache hit (processed): {filename}")
+                    return False, None
+
+                cache_key = AssetCache.make_key(
+                    kind='elevenlabs', prompt_hash=phash, prompt=prompt, model=model,
+                    length_seconds=length_seconds, loop=loop, candidate_index=idx, **salt
+                ) if self.cache else None
+                if cache_key and self.cache.fetch(cache_key, file_path):
+                    meta['cached'] = True
+                    print(f"♻️ Asset cache hit: {filename}")
                 else:
                     audio_bytes = self._call_elevenlabs(prompt, length_seconds, model, loop=loop)
                     if not audio_bytes:
@@ -221,50 +398,61 @@ class SoundWeaver:
                     # Write raw bytes and ensure it ends up as mp3; if API returns WAV, we'll post-process/convert
                     with open(file_path, 'wb') as f:
                         f.write(audio_bytes)
+                    if cache_key:
+                        self.cache.store(cache_key, file_path, kind='audio')
 
-                # Post-process for loopability and normalization (if enabled)
-                if postprocess:
-                    proc_info = _post_process(file_path, int(length_seconds), crossfade_ms=100, target_lufs=-14.0)
-                    if proc_info.get('processed'):
-                        meta['processed'] = True
-                    meta['processing_notes'] = proc_info.get('notes', [])
-                else:
-                    meta['processing_notes'] = ['Post-processing skipped by configuration.']
-
-                # Do NOT persist a .meta.json on disk — keep metadata in-memory only for the caller.
-                # Remove any pre-existing .meta.json for this audio file.
-                meta_path = file_path + '.meta.json'
-                if os.path.exists(meta_path):
-                    try:
-                        os.remove(meta_path)
-                    except Exception:
-                        pass
+            if not postprocess:
+                meta['processing_notes'] = ['Post-processing skipped by configuration.']
+            return postprocess, processed_key
 
-                rel_path = os.path.relpath(file_path, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
-                out.append({'file': rel_path.replace('\\', '/'), 'meta': meta})
+        except Exception as e:
+            # On any error, write a placeholder so the UI can still show a candidate and the author can upload a custom sound
+            try:
+                _write_silence_mp3(file_path, int(length_seconds))
+                meta['placeholder'] = True
+                meta['error'] = str(e)
+            except Exception:
+                # If even placeholder writing fails, append nothing for this candidate
+                meta['failed'] = True
+            return False, None
+
+    def _submit_post_process(self, file_path, length_seconds, loop=False):
+        """Runs _post_process in a worker process (decode/normalize/encode are CPU-bound)."""
+        pool = _get_process_pool(self.process_workers)
+        if pool is not None:
+            try:
+                return pool.submit(_post_process, file_path, length_seconds, loop=loop, **POSTPROCESS_PARAMS)
+            except Exception as e:
+                print(f"⚠️ Sound post-processing pool unavailable, processing inline: {e}")
+                _reset_process_pool()
+        return None
 
+    @staticmethod
+    def _post_process_result(future, file_path, length_seconds, loop=False):
+        if future is not None:
+            try:
+                return future.result()
             except Exception as e:
-                # On any error, write a placeholder so the UI can still show a candidate and the author can upload a custom sound
-                try:
-                    _write_silence_mp3(file_path, int(length_seconds))
-                    meta['placeholder'] = True
-                    meta['error'] = str(e)
-
-                    # Do NOT persist a .meta.json on disk — keep metadata in-memory only for the caller.
-                    meta_path = file_path + '.meta.json'
-                    if os.path.exists(meta_path):
-                        try:
-                            os.remove(meta_path)
-                        except Exception:
-                            pass
-
-                    rel_path = os.path.relpath(file_path, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
-                    out.append({'file': rel_path.replace('\\', '/'), 'meta': meta})
-                except Exception:
-                    # If even placeholder writing fails, append nothing for this candidate
-                    continue
-
-        return out
+                # A crashed worker breaks the pool; the next submit starts a fresh one
+                print(f"⚠️ Sound post-processing worker failed, processing inline: {e}")
+                _reset_process_pool()
+        return _post_process(file_path, length_seconds, loop=loop, **POSTPROCESS_PARAMS)
+
+    @staticmethod
+    def _candidate_entry(file_path, meta):
+        if meta.pop('failed', False):
+            return None
+        # Do NOT persist a .meta.json on disk — keep metadata in-memory only for the caller.
+        # Remove any pre-existing .meta.json for this audio file.
+        meta_path = file_path + '.meta.json'
+        if os.path.exists(meta_path):
+            try:
+                os.remove(meta_path)
+            except Exception:
+                pass
+
+        rel_path = os.path.relpath(file_path, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+        return {'file': rel_path.replace('\\', '/'), 'meta': meta}
 
 
 if __name__ == '__main__':
@@ -0,0 +1,243 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+
+JOURNAL_SUFFIX = ".journal.jsonl"
+# Fold the journal into the base once it holds this many ops, or grows larger than the base
+COMPACT_AFTER_OPS = 64
+COMPACT_MIN_BYTES = 64 * 1024
+# String fields longer than this are journaled as a splice when only part of them changed
+SPLICE_MIN_CHARS = 200
+
+_MISSING = object()
+
+_cache = {}  # abs path -> (signature, pack, journal_ops)
+_lock = threading.RLock()
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+
+
+def _splice(old, new):
+    """[start, end, text, digest(old)] such that old[:start] + text + old[end:] == new."""
+    start = 0
+    limit = min(len(old), len(new))
+    while start < limit and old[start] == new[start]:
+        start += 1
+    end = 0
+    while end < limit - start and old[-1 - end] == new[-1 - end]:
+        end += 1
+    return [start, len(old) - end, new[start:len(new) - end], _digest(old)]
+
+
+class StoryPackStore:
+    """
+    Journaled storage for story_pack.json.
+
+    The base file is only rewritten when a pack is created or the journal is compacted.
+    Every other change is one JSON line appended to <name>.journal.jsonl:
+        {"op": "scene", "index": 3, "scene": {...}}          add/replace a whole scene
+        {"op": "patch", "index": 3, "set": {...}, "unset": [], "splice": {...}}
+                                                               changed fields of a scene
+        {"op": "meta", "meta": {...}}                          merge into meta
+        {"op": "progress", "next_index": 4, "saved_scene_id": "..."}
+    All ops are idempotent, so a journal replayed over an already compacted base (crash
+    between the two steps) gives the same pack, and a torn last line is ignored.
+    Parsed packs are cached per process and invalidated by the mtime/size of both files.
+    The pack returned by `load` is shared: treat it as read-only and change it through the store.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.journal_path = os.path.splitext(self.path)[0] + JOURNAL_SUFFIX
+
+    # --- Reading -----------------------------------------------------------------
+    def load(self):
+        """Returns the current pack (base + journal) or None if there is none / it is invalid."""
+        with _lock:
+            signature = self._signature()
+            hit = _cache.get(self.path)
+            if hit and hit[0] == signature:
+                return hit[1]
+            pack, ops = self._read()
+            if pack is None:
+                _cache.pop(self.path, None)
+            else:
+                _cache[self.path] = (signature, pack, ops)
+            return pack
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return None, 0
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                pack = self._normalize(json.load(f))
+        except Exception as e:
+            print(f"⚠️ Could not load story pack: {e}")
+            return None, 0
+        if pack is None:
+            return None, 0
+        ops = 0
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        op = json.loads(line)
+                    except ValueError:
+                        continue  # torn write at the end of the journal
+                    self._apply(pack, op)
+                    ops += 1
+        return pack, ops
+
+    @staticmethod
+    def _normalize(data):
+        if not isinstance(data, dict):
+            return None
+        if "scenes" not in data or not isinstance(data.get("scenes"), list):
+            return None
+        data.setdefault("meta", {})
+        data.setdefault("progress", {})
+        data["progress"].setdefault("next_index", 0)
+        data["progress"].setdefault("saved_scene_ids", [])
+        return data
+
+    def _signature(self):
+        sig = []
+        for p in (self.path, self.journal_path):
+            try:
+                st = os.stat(p)
+                sig.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                sig.append(None)
+        return tuple(sig)
+
+    # --- Writing -----------------------------------------------------------------
+    def create(self, pack):
+        """Writes a complete pack as the new base and drops the journal."""
+        with _lock:
+            pack = self._normalize(pack)
+            if pack is None:
+                raise ValueError("story pack needs a 'scenes' list")
+            self._write_base(pack)
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            _cache[self.path] = (self._signature(), pack, 0)
+        return self.path
+
+    def append_scene(self, scene, meta=None):
+        with _lock:
+            pack = self.load()
+            ops = [{"op": "meta", "meta": meta}] if meta else []
+            self._record(pack, ops + [{"op": "scene", "index": len(pack["scenes"]), "scene": scene}])
+
+    def replace_scene(self, index, scene):
+        """Stores only the fields of scene `index` that differ from the current version."""
+        with _lock:
+            pack = self.load()
+            current = pack["scenes"][index] if index < len(pack["scenes"]) else None
+            if not isinstance(current, dict) or not isinstance(scene, dict):
+                op = {"op": "scene", "index": index, "scene": scene}
+            else:
+                changed = {k: v for k, v in scene.items() if current.get(k, _MISSING) != v}
+                removed = [k for k in current if k not in scene]
+                if not changed and not removed:
+                    return
+                op = {"op": "patch", "index": index, "set": changed, "unset": removed}
+                # Long texts that were only touched up are journaled as a splice
+                for key, value in list(changed.items()):
+                    old = current.get(key)
+                    if isinstance(old, str) and isinstance(value, str) and len(old) > SPLICE_MIN_CHARS:
+                        splice = _splice(old, value)
+                        if len(splice[2]) < len(value) // 2:
+                            op.setdefault("splice", {})[key] = splice
+                            del changed[key]
+            self._record(pack, [op])
+
+    def update_meta(self, meta):
+        with _lock:
+            self._record(self.load(), [{"op": "meta", "meta": meta}])
+
+    def set_progress(self, next_index, saved_scene_id=None):
+        with _lock:
+            op = {"op": "progress", "next_index": int(next_index)}
+            if saved_scene_id:
+                op["saved_scene_id"] = saved_scene_id
+            self._record(self.load(), [op])
+
+    def compact(self):
+        """Folds the journal into a new base file."""
+        with _lock:
+            pack = self.load()
+            if pack is None:
+                return
+            self._write_base(pack)
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            _cache[self.path] = (self._signature(), pack, 0)
+
+    def _record(self, pack, ops):
+        if pack is None:
+            raise FileNotFoundError(self.path)
+        if not ops:
+            return
+        data = "".join(json.dumps(op, ensure_ascii=False) + "\n" for op in ops)
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(data)
+        for op in ops:
+            self._apply(pack, op)
+        journal_ops = _cache[self.path][2] + len(ops)
+        _cache[self.path] = (self._signature(), pack, journal_ops)
+
+        journal_bytes = os.path.getsize(self.journal_path)
+        base_bytes = os.path.getsize(self.path)
+        if journal_ops >= COMPACT_AFTER_OPS or journal_bytes > max(COMPACT_MIN_BYTES, base_bytes):
+            self.compact()
+
+    @staticmethod
+    def _apply(pack, op):
+        kind = op.get("op")
+        scenes = pack["scenes"]
+        if kind == "scene":
+            index = int(op.get("index", len(scenes)))
+            if index < len(scenes):
+                scenes[index] = op.get("scene")
+            else:
+                scenes.append(op.get("scene"))
+        elif kind == "patch":
+            index = int(op.get("index", -1))
+            if 0 <= index < len(scenes) and isinstance(scenes[index], dict):
+                scene = dict(scenes[index])  # never mutate a dict a caller may still hold
+                scene.update(op.get("set", {}))
+                for key, (start, end, text, source) in op.get("splice", {}).items():
+                    old = scene.get(key)
+                    # Only splice the text it was computed from (a replay after compaction is a no-op)
+                    if isinstance(old, str) and _digest(old) == source:
+                        scene[key] = old[:start] + text + old[end:]
+                for key in op.get("unset", []):
+                    scene.pop(key, None)
+                scenes[index] = scene
+        elif kind == "meta":
+            pack["meta"] = {**pack["meta"], **(op.get("meta") or {})}
+        elif kind == "progress":
+            progress = pack["progress"]
+            progress["next_index"] = int(op.get("next_index", progress.get("next_index", 0)))
+            scene_id = op.get("saved_scene_id")
+            if scene_id and scene_id not in progress["saved_scene_ids"]:
+                progress["saved_scene_ids"] = progress["saved_scene_ids"] + [scene_id]
+
+    def _write_base(self, pack):
+        folder = os.path.dirname(self.path)
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".story_pack.", suffix=".tmp", dir=folder)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(pack, f, indent=2, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
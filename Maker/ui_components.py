@@ -1,10 +1,14 @@
 import os
+import hashlib
 import streamlit as st
 import re
 from utils import DashboardUtils
-from sound_weaver import SoundWeaver
+from job_queue import JobQueue, QUEUED, RUNNING, DONE, FAILED, CANCELLED
 import shutil
 
+# How often a scene waiting on a background render job re-checks its status
+JOB_POLL_SECONDS = 1.0
+
 def render_character_selection():
     # FIX: Check if selection has already happened to avoid unnecessary re-renders
     if st.session_state.engine_ready:
@@ -99,7 +103,11 @@ def render_sidebar_tabs(current_config, weaver, available_books):
         lang_filter = langs[selected_lang]
         search_mode = st.radio("Search by:", ["Title", "Author"], horizontal=True, key="lib_mode")
         search_query = st.text_input("Search term", key="lib_query")
-        if st.button("🔍 Search Library", key="lib_search"):
+        # The FTS index answers instantly, so searching as soon as the term changes is cheap
+        search_key = (search_query, search_mode, lang_filter)
+        query_changed = bool(search_query.strip()) and st.session_state.get("lib_last_search") != search_key
+        if st.button("🔍 Search Library", key="lib_search") or query_changed:
+            st.session_state.lib_last_search = search_key
             st.session_state.search_results = DashboardUtils.search_gutenberg_native(
                 search_query, 
                 search_mode.lower(), 
@@ -156,6 +164,14 @@ def render_sidebar_tabs(current_config, weaver, available_books):
                 snd_count = st.slider("Sounds per Scene", 0, 5, gen_cfg.get('sounds_per_scene', 1))
                 snd_len = st.number_input("Sound Duration (sec)", 1, 30, gen_cfg.get('sound_length_seconds', 5))
                 snd_loop = st.checkbox("Seamless Loop", value=gen_cfg.get('sound_loop', False))
+            strategies = {"single": "One call", "outline": "Outline + parallel scenes", "stream": "Streamed (edit while it arrives)"}
+            pack_strategy = st.selectbox("Story Pack Generation", list(strategies.keys()), format_func=strategies.get,
+                                         index=list(strategies.keys()).index(gen_cfg.get('story_pack_strategy', 'single')) if gen_cfg.get('story_pack_strategy', 'single') in strategies else 0,
+                                         help="Outline + parallel scenes writes every scene in its own request; recommended for long books. "
+                                              "Streamed saves each scene as soon as it arrives, so you can start editing scene 1 right away.")
+            llm_concurrency = st.number_input("Parallel Scene Requests", 1, 16, int(gen_cfg.get('llm_concurrency', 4)))
+            prefetch_lookahead = st.slider("Prefetch Lookahead (Story Pack scenes)", 0, 5, gen_cfg.get('prefetch_lookahead', 2),
+                                           help="Render art and audio for upcoming scenes in the background while you edit. 0 disables it.")
                 
             st.divider()
             title = st.text_input("Project Title", value=st.session_state.get("c_title", current_config.get("title", "New Adventure")), key="c_title_in")
@@ -165,6 +181,8 @@ def render_sidebar_tabs(current_config, weaver, available_books):
             default_model = current_config.get("llm_model", "gemini-2.0-flash-exp")
             default_idx = available_llms.index(default_model) if default_model in available_llms else 0
             llm_model = st.selectbox("LLM Model", options=available_llms, index=default_idx)
+            context_budget = st.number_input("Story Context Budget (tokens)", 500, 100000, int(gen_cfg.get('context_budget_tokens', 6000)), step=500,
+                                             help="Latest scenes are sent in full, older ones as one-line summaries, up to this many tokens.")
 
             st.markdown("#### 🎨 Visual Style")
             vis = current_config.get("visual_settings", {})
@@ -207,6 +225,23 @@ def render_sidebar_tabs(current_config, weaver, available_books):
                     cfg = st.number_input("CFG Scale", value=sd.get("cfg_scale", 7.0))
                     # RE-INTRODUCED: Scheduler
                     scheduler = st.text_input("Scheduler (Type)", value=sd.get("scheduler", "normal"))
+                batch_modes = ["batch", "parallel", "serial"]
+                batch_mode = st.selectbox("Candidate Batching", batch_modes,
+                                          index=batch_modes.index(sd.get("batch_mode", "batch")) if sd.get("batch_mode", "batch") in batch_modes else 0,
+                                          help="batch: one request for all candidates; parallel: several requests at once; serial: one after another")
+                max_workers = st.number_input("Parallel Requests", 1, 8, int(sd.get("max_workers", 2)))
+                # Keyed by URL so entries with their own max_jobs survive a save
+                backend_entries = {(b if isinstance(b, str) else b.get("url", "")): b for b in sd.get("backends") or [weaver.base_url]}
+                backends_text = st.text_area("WebUI Backends", value="\n".join(backend_entries), height=80,
+                                             help="One URL per line; candidates are spread over all of them")
+                dispatch_modes = ["least_loaded", "round_robin"]
+                dispatch = st.selectbox("Backend Dispatch", dispatch_modes,
+                                        index=dispatch_modes.index(sd.get("dispatch")) if sd.get("dispatch") in dispatch_modes else 0)
+                asset_cache = getattr(weaver, "cache", None)
+                if asset_cache:
+                    cache_stats = asset_cache.stats()
+                    st.caption(f"♻️ Asset cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses · "
+                               f"{cache_stats['entries']} files · {cache_stats['size_bytes'] / (1024 * 1024):.0f} MB")
 
             st.markdown("#### 👥 Character Bible")
             if "temp_char_map" not in st.session_state:
@@ -233,11 +268,16 @@ def render_sidebar_tabs(current_config, weaver, available_books):
                     "traits": traits_cfg,
                     "character_map": st.session_state.temp_char_map,
                     "generation": {
+                        **gen_cfg,
                         "target_scene_count": scene_count, 
                         "images_per_scene": img_count, 
                         "sounds_per_scene": snd_count, 
                         "sound_length_seconds": snd_len, 
-                        "sound_loop": snd_loop
+                        "sound_loop": snd_loop,
+                        "prefetch_lookahead": prefetch_lookahead,
+                        "story_pack_strategy": pack_strategy,
+                        "llm_concurrency": llm_concurrency,
+                        "context_budget_tokens": context_budget
                     },
                     "visual_settings": {
                         "master_style": m_style, 
@@ -245,13 +285,18 @@ def render_sidebar_tabs(current_config, weaver, available_books):
                         "negative_prompt": n_prompt
                     },
                     "sd_settings": {
+                        **sd,
                         "sd_model": sd_m, 
                         "width": width, 
                         "height": height, 
                         "steps": steps, 
                         "cfg_scale": cfg,
                         "sampler_name": sampler,   # Ensure saved to config
-                        "scheduler": scheduler      # Ensure saved to config
+                        "scheduler": scheduler,      # Ensure saved to config
+                        "batch_mode": batch_mode,
+                        "max_workers": max_workers,
+                        "dispatch": dispatch,
+                        "backends": [backend_entries.get(u.strip(), u.strip()) for u in backends_text.splitlines() if u.strip()]
                     }
                 })
                 DashboardUtils.save_config(current_config)
@@ -260,9 +305,136 @@ def render_sidebar_tabs(current_config, weaver, available_books):
 
             st.divider()
             if st.button("⚙️ Compile .ink to .json", use_container_width=True):
-                success, msg = DashboardUtils.compile_ink_to_json(current_config.get("book_id"))
-                if success: st.success(f"✅ {msg}")
-                else: st.error(f"⚠️ {msg}")
+                book_id = current_config.get("book_id")
+                start_compile_job(book_id, st.session_state.get("active_project_path", DashboardUtils.get_project_output_dir(book_id=book_id)))
+                st.rerun()
+
+def _job_outputs_exist(result):
+    """True if every file a finished render job reported is still on disk (not selected/cleaned up yet)."""
+    repo_root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    paths = [r if isinstance(r, str) else os.path.join(repo_root, r.get("file", "")) for r in result or []]
+    return bool(paths) and all(os.path.exists(p) for p in paths)
+
+def _generation_job(state_key, job_key, target, params, label):
+    """
+    Renders a background job's progress until it finishes, then stores its result in
+    st.session_state[state_key] and reruns. The job key includes a hash of the prompt, so a
+    rerun or a reconnecting browser re-attaches to the job instead of starting another one.
+    After "Regenerate" (see _regenerate_button) the re-roll count goes into params and key.
+    """
+    jobs = JobQueue.shared()
+    prompt_hash = hashlib.sha1(str(params.get("prompt", "")).encode("utf-8")).hexdigest()[:12]
+    job_key = f"{job_key}:{prompt_hash}"
+    reroll = st.session_state.get(f"reroll_{state_key}", 0)
+    if reroll:
+        params = {**params, "reroll": reroll}
+        job_key = f"{job_key}:r{reroll}"
+    job = jobs.find(job_key)
+    finished = job and job["status"] in (DONE, FAILED, CANCELLED)
+    if finished and st.session_state.get(f"job_{state_key}") != job["id"] and not (
+            job["status"] == DONE and _job_outputs_exist(job["result"])):
+        job = None  # finished before this session and nothing left to pick from: render again
+    if job is None:
+        job = jobs.get(jobs.submit(target, params, key=job_key))
+    st.session_state[f"job_{state_key}"] = job["id"]
+
+    if job["status"] == DONE and job["result"]:
+        st.session_state[state_key] = job["result"]
+        st.session_state.pop(f"job_{state_key}", None)
+        st.rerun()
+    if job["status"] in (DONE, FAILED, CANCELLED):
+        st.error(f"❌ {label} failed: {job.get('error') or 'no candidates were produced'}")
+        if st.button("🔄 Retry", key=f"retry_{state_key}"):
+            jobs.submit(target, params, key=job_key)
+            st.rerun()
+        st.stop()
+
+    _job_progress(job["id"], label)
+    st.stop()
+
+def _regenerate_button(state_key):
+    """Drops the current candidates and bumps the re-roll count, so the next job renders new
+    seeds instead of replaying the deterministic (cached) ones."""
+    if st.button("🎲 Regenerate", key=f"regen_{state_key}"):
+        st.session_state[f"reroll_{state_key}"] = st.session_state.get(f"reroll_{state_key}", 0) + 1
+        st.session_state.pop(state_key, None)
+        st.rerun()
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def _job_progress(job_id, label):
+    """Polls one job on a timer without blocking the script; a finished job triggers a full rerun."""
+    job = JobQueue.shared().get(job_id)
+    if job is None or job["status"] not in (QUEUED, RUNNING):
+        st.rerun(scope="app")
+    progress = int(job.get("progress") or 0)
+    st.progress(progress, text=job.get("message") or f"{label}... ({job['status']})")
+    st.caption("⏳ Running in the background; you can reload the page without losing the work.")
+
+def _claim_prefetched(state_key, scene_id, kind, prompt, label):
+    """
+    Moves the scene prefetcher's candidates into st.session_state[state_key] and reruns.
+    While the matching prefetch is still rendering, it is polled like a job instead of
+    blocking the script or starting a second render of the same prompt.
+    """
+    prefetcher = st.session_state.get("prefetcher")
+    if state_key in st.session_state or not prefetcher:
+        return
+    with st.spinner(f"{label}..."):
+        prefetched = prefetcher.claim(scene_id, kind, prompt)
+    if prefetched:
+        st.session_state[state_key] = prefetched
+        st.rerun()
+    if prefetcher.is_pending(scene_id, kind):
+        _prefetch_progress(scene_id, kind, label)
+        st.stop()
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def _prefetch_progress(scene_id, kind, label):
+    """Waits for a running prefetch on a timer; once it is done a full rerun claims it."""
+    prefetcher = st.session_state.get("prefetcher")
+    if not prefetcher or not prefetcher.is_pending(scene_id, kind):
+        st.rerun(scope="app")
+    st.info(f"{label}: still rendering in the background...")
+
+def render_story_pack_job(params):
+    """Generates the story pack as a background job and polls it; reruns once story_pack.json is written."""
+    _generation_job("story_pack_result", f"story_pack:{os.path.abspath(params['pack_path'])}",
+                    "generation_jobs:generate_story_pack", params, "🕵️ Architect is drafting the story pack")
+
+def start_compile_job(book_id, project_path):
+    """Compiles adventure.ink to adventure.json as a background job; render_compile_status shows the outcome."""
+    st.session_state["job_compile"] = JobQueue.shared().submit(
+        "generation_jobs:compile_ink", {"book_id": book_id, "project_path": project_path},
+        key=f"compile:{os.path.abspath(project_path)}")
+
+def render_compile_status():
+    """Progress of the compile started by start_compile_job while it runs, then its result (once)."""
+    job_id = st.session_state.get("job_compile")
+    if not job_id:
+        return
+    job = JobQueue.shared().get(job_id)
+    if job and job["status"] in (QUEUED, RUNNING):
+        _job_progress(job_id, "📦 Compiling .ink to .json")
+        return
+    st.session_state.pop("job_compile", None)
+    result = (job or {}).get("result") or {}
+    if result.get("success"):
+        st.success(f"✅ {result['message']} (→ {result['json_path']})")
+    else:
+        st.error(f"⚠️ {result.get('message') or (job or {}).get('error') or 'The compile job was lost.'}")
+
+def render_story_pack_wait(path, index):
+    """Shows the streamed pack's progress until scene `index` arrives or the stream ends, then reruns."""
+    _story_pack_stream_progress(path, index)
+    st.stop()
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def _story_pack_stream_progress(path, index):
+    """Polls the pack on a timer instead of blocking the script; a new scene or the stream's end triggers a full rerun."""
+    pack = DashboardUtils.load_story_pack_file(path)
+    if not pack or len(pack["scenes"]) > index or not DashboardUtils.story_pack_stream_alive(path):
+        st.rerun(scope="app")
+    st.info(f"📨 Waiting for scene {index + 1} from the Architect ({len(pack['scenes'])} received so far)...")
 
 def render_art_selection(scene, current_config, weaver, current_dir):
     """Handles the UI and file logic for selecting Scene Art, Reward Art, and Audio."""
@@ -278,7 +450,8 @@ def render_art_selection(scene, current_config, weaver, current_dir):
     if img_count > 0 and not os.path.exists(final_main_img):
         st.subheader(f"🎨 Scene Art: {base_id}")
         gen_key = f"gen_main_{base_id}"
-        
+        _claim_prefetched(gen_key, base_id, "main", scene['visual_prompt'], "🔮 Collecting pre-rendered scene art")
+
         if gen_key not in st.session_state:
             is_online, err_msg = weaver.check_connection()
             if not is_online:
@@ -286,29 +459,22 @@ def render_art_selection(scene, current_config, weaver, current_dir):
                 if st.button("🔄 Retry Connection"): st.rerun()
                 st.stop()
 
-            with st.spinner("💎 Painting Scene..."):
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                def update_ui(p, c, t):
-                    progress_bar.progress(p)
-                    status_text.text(f"🎨 Image {c}/{t} ({p}%)")
-                
-                paths = weaver.generate_batch(prompt=scene['visual_prompt'], count=img_count, base_filename=base_id, callback=update_ui)
-                st.session_state[gen_key] = paths
-                st.rerun()
-        
+            _generation_job(gen_key, f"{project_folder}:{base_id}:main", "generation_jobs:render_images", {
+                "prompt": scene['visual_prompt'], "base_filename": base_id,
+                "count": img_count, "output_dir": weaver.output_dir, "api_url": weaver.base_url
+            }, "💎 Painting Scene")
+
         candidates = st.session_state.get(gen_key, [])
         if candidates:
             cols = st.columns(len(candidates))
             for idx, img_path in enumerate(candidates):
                 with cols[idx]:
-                    st.image(img_path)
+                    st.image(DashboardUtils.asset_thumbnail(img_path))
                     if st.button("Select", key=f"sel_main_{idx}"):
-                        shutil.move(img_path, final_main_img)
-                        for c in candidates: 
-                            if os.path.exists(c) and c != final_main_img: os.remove(c)
+                        DashboardUtils.select_image_candidate(img_path, final_main_img, candidates)
                         st.session_state.pop(gen_key, None)
                         st.rerun()
+            _regenerate_button(gen_key)
         st.stop()
 
     # --- PHASE 2: REWARD IMAGES ---
@@ -318,36 +484,26 @@ def render_art_selection(scene, current_config, weaver, current_dir):
         if not os.path.exists(reward_target) and img_count > 0:
             st.subheader(f"💎 Reward Art: {base_id}_REW")
             gen_key_rew = f"gen_rew_{base_id}"
-            
+            _claim_prefetched(gen_key_rew, base_id, "reward", exquisite_choice.get('reward_visual_prompt'),
+                              "🔮 Collecting pre-rendered reward art")
+
             if gen_key_rew not in st.session_state:
-                with st.spinner("💎 Painting Reward..."):
-                    progress_bar = st.progress(0)
-                    status_text = st.empty()
-                    def update_ui(p, c, t):
-                        progress_bar.progress(p)
-                        status_text.text(f"💎 Image {c}/{t} ({p}%)")
-
-                    imgs = weaver.generate_batch(
-                        prompt=exquisite_choice.get('reward_visual_prompt'),
-                        count=img_count,
-                        base_filename=f"{base_id}_REW",
-                        callback=update_ui
-                    )
-                    st.session_state[gen_key_rew] = imgs
-                    st.rerun()
+                _generation_job(gen_key_rew, f"{project_folder}:{base_id}:reward", "generation_jobs:render_images", {
+                    "prompt": exquisite_choice.get('reward_visual_prompt'), "base_filename": f"{base_id}_REW",
+                    "count": img_count, "output_dir": weaver.output_dir, "api_url": weaver.base_url
+                }, "💎 Painting Reward")
 
             candidates = st.session_state.get(gen_key_rew, [])
             if candidates:
                 cols = st.columns(len(candidates))
                 for idx, img_path in enumerate(candidates):
                     with cols[idx]:
-                        st.image(img_path)
+                        st.image(DashboardUtils.asset_thumbnail(img_path))
                         if st.button("Select", key=f"sel_rew_{idx}"):
-                            shutil.move(img_path, reward_target)
-                            for c in candidates:
-                                if os.path.exists(c) and c != reward_target: os.remove(c)
+                            DashboardUtils.select_image_candidate(img_path, reward_target, candidates)
                             st.session_state.pop(gen_key_rew, None)
                             st.rerun()
+                _regenerate_button(gen_key_rew)
             st.stop()
 
     # --- PHASE 3: SOUND GENERATION ---
@@ -355,19 +511,17 @@ def render_art_selection(scene, current_config, weaver, current_dir):
     if snd_count > 0 and not os.path.exists(final_sound):
         st.subheader("🎧 Audio Atmosphere")
         snd_key = f"gen_snd_{base_id}"
-        
+        _claim_prefetched(snd_key, base_id, "sound", scene.get('audio_prompt', scene['visual_prompt']),
+                          "🔮 Collecting pre-rendered audio")
+
         if snd_key not in st.session_state:
-            sw = SoundWeaver()
-            with st.spinner(f"🎧 Composing {snd_count} Audio Candidates..."):
-                snds = sw.generate_candidates(
-                    project_folder, base_id, 
-                    scene.get('audio_prompt', scene['visual_prompt']), 
-                    count=snd_count,
-                    length_seconds=current_config['generation'].get('sound_length_seconds', 5),
-                    loop=current_config['generation'].get('sound_loop', False)
-                )
-                st.session_state[snd_key] = snds
-                st.rerun()
+            _generation_job(snd_key, f"{project_folder}:{base_id}:sound", "generation_jobs:render_sounds", {
+                "project_folder": project_folder, "scene_id": base_id,
+                "prompt": scene.get('audio_prompt', scene['visual_prompt']),
+                "count": snd_count,
+                "length_seconds": current_config['generation'].get('sound_length_seconds', 5),
+                "loop": current_config['generation'].get('sound_loop', False)
+            }, f"🎧 Composing {snd_count} Audio Candidates")
 
         sounds = st.session_state.get(snd_key, [])
         if sounds:
@@ -388,4 +542,5 @@ def render_art_selection(scene, current_config, weaver, current_dir):
                         st.rerun()
                 with c2:
                     st.audio(s['file'])
+            _regenerate_button(snd_key)
         st.stop()
\ No newline at end of file
@@ -5,12 +5,16 @@ import requests
 import shutil
 import sqlite3
 import re
+import threading
 import streamlit as st
 from google import genai
 from session_manager import initialize_session_state, current_dir, BOOKS_DIR, CONFIG_PATH, DEFAULT_LLMS, DB_NAME
 
 initialize_session_state()
 
+# story_pack.json is written by the script thread and by the streaming generator thread
+_story_pack_lock = threading.RLock()
+
 class DashboardUtils:
 
     @staticmethod
@@ -42,46 +46,62 @@ class DashboardUtils:
         return title_path
    
     @staticmethod
-    def update_game_manifest():
-        """Scans output folder and updates the manifest.json for the Player."""
-        # current_dir is defined on line 14, so we make sure this runs after that
-        output_dir = os.path.join(current_dir, "..", "data", "output")
-        manifest_path = os.path.join(output_dir, "manifest.json")      
-        projects = []
-        
-        if os.path.exists(output_dir):
-            for folder in os.listdir(output_dir):
-                folder_path = os.path.join(output_dir, folder)
-                if os.path.isdir(folder_path):
-                    ink_path = os.path.join(folder_path, "adventure.ink")
-                    
-                    # Default values if not found in .ink
-                    lang = "English"
-                    p_name = "Unknown"
-                    
-                    if os.path.exists(ink_path):
-                        with open(ink_path, 'r', encoding='utf-8') as f:
-                            content = f.read()
-                            # Extract Language
-                            l_m = re.search(r'VAR\s+language\s*=\s*"([^"]+)"', content)
-                            if l_m: lang = l_m.group(1)
-                            # Extract Protagonist
-                            n_m = re.search(r'VAR\s+protagonist_name\s*=\s*"([^"]+)"', content)
-                            if n_m: p_name = n_m.group(1)
-
-                    if os.path.exists(os.path.join(folder_path, "adventure.json")):
-                        projects.append({
-                            "id": folder, 
-                            "title": folder.replace("_", " ").title(),
-                            "protagonist": p_name,
-                            "language": lang
-                        })
-                        
-
-        with open(manifest_path, 'w') as f:
-            json.dump(projects, f, indent=4)
-        
-        return len(projects)
+    def update_game_manifest(project_dir=None):
+        """
+        Updates the manifest.json for the Player. With project_dir only that project's
+        entry is refreshed; otherwise a cheap stat-only verify pass runs over data/output.
+        The dashboard's project index is brought up to date alongside.
+        """
+        from manifest_service import ManifestService
+        service = ManifestService(os.path.join(current_dir, "..", "data", "output"))
+        if project_dir:
+            DashboardUtils.refresh_project_index(project_dir)
+            return service.update_project(os.path.basename(os.path.normpath(project_dir)))
+        return service.verify()
+
+    @staticmethod
+    def refresh_project_index(project_dir):
+        """Writers call this after changing a project so the index does not wait for the watcher."""
+        from project_index import ProjectIndex
+        try:
+            ProjectIndex.shared().refresh(project_dir)
+        except Exception as e:
+            print(f"⚠️ Could not update project index: {e}")
+
+    @staticmethod
+    def derive_project_assets(project_dir):
+        """Publish step: refreshes thumbnails/WebP copies and assets/asset_index.json for the Player."""
+        from asset_derivatives import AssetDerivatives
+        try:
+            derivatives = AssetDerivatives.from_config(DashboardUtils.load_config(), os.path.join(project_dir, "assets"))
+            if derivatives:
+                count = derivatives.derive_all()
+                print(f"🖼️ Asset index updated ({count} images)")
+        except Exception as e:
+            print(f"⚠️ Could not update asset derivatives: {e}")
+
+    @staticmethod
+    def asset_thumbnail(img_path):
+        """Thumbnail to show for an image candidate; the PNG itself when derivatives are off."""
+        from asset_derivatives import AssetDerivatives
+        derivatives = AssetDerivatives.from_config(DashboardUtils.load_config(), os.path.dirname(img_path))
+        return derivatives.thumbnail(img_path) if derivatives else img_path
+
+    @staticmethod
+    def select_image_candidate(chosen, target, candidates):
+        """Moves the chosen candidate to `target`, deletes the others and keeps the derivatives in step."""
+        from asset_derivatives import AssetDerivatives
+        config = DashboardUtils.load_config()
+        for c in candidates:
+            derivatives = AssetDerivatives.from_config(config, os.path.dirname(c))
+            if derivatives:
+                derivatives.discard(c)
+        shutil.move(chosen, target)
+        for c in candidates:
+            if os.path.exists(c) and c != target: os.remove(c)
+        derivatives = AssetDerivatives.from_config(config, os.path.dirname(target))
+        if derivatives:
+            derivatives.derive(target)
         
     @staticmethod
     def get_protagonist_from_ink(book_id):
@@ -105,6 +125,7 @@ class DashboardUtils:
         # OVERWRITE LOGIC: Wipe existing folder if it exists for this combination
         if os.path.exists(output_dir):
             shutil.rmtree(output_dir)
+            DashboardUtils.update_game_manifest(output_dir)  # drop the wiped project from the Player
         os.makedirs(output_dir, exist_ok=True)
         ink_path = os.path.join(output_dir, "adventure.ink")
         current_lang = st.session_state.get("lib_lang", "English")
@@ -128,26 +149,50 @@ class DashboardUtils:
         return True
     
     @staticmethod
-    def compile_ink_to_json(book_id):
+    def compile_ink_to_json(book_id, project_path=None):
         """
         Compiles the adventure.ink into adventure.json and updates manifest.
+        Uses the built-in compiler (see ink_compiler.py) unless book_config.json sets
+        "ink_compiler": "inklecate"; scripts outside its Ink subset fall back to inklecate.
+        An explicit `project_path` compiles that project without reading session state
+        (background jobs, see generation_jobs.compile_ink).
         Returns (success: bool, message: str)
         """
         import subprocess
-        output_dir = st.session_state.get("active_project_path", DashboardUtils.get_project_output_dir(book_id=book_id))
+        from ink_compiler import InkCompileError, UnsupportedInkSyntax
+        output_dir = project_path or st.session_state.get("active_project_path", DashboardUtils.get_project_output_dir(book_id=book_id))
         ink_path = os.path.join(output_dir, "adventure.ink")
         json_path = os.path.join(output_dir, "adventure.json")
 
         if not os.path.exists(ink_path):
             return False, f"File not found: {ink_path}"
 
+        if DashboardUtils.load_config().get("ink_compiler", "builtin") != "inklecate":
+            smith = None if project_path else st.session_state.get("smith")
+            if smith is None or os.path.abspath(smith.ink_path) != os.path.abspath(ink_path):
+                from ink_smith import InkSmith
+                smith = InkSmith(book_id, project_path=output_dir, auto_create=False)
+            try:
+                warnings = smith.compile_json(json_path)
+                DashboardUtils.derive_project_assets(output_dir)
+                DashboardUtils.update_game_manifest(output_dir)
+                for w in warnings:
+                    print(f"⚠️ Ink: {w}")
+                note = f" ({len(warnings)} warnings, see console)" if warnings else ""
+                return True, f"Compilation Successful! 'adventure.json' updated.{note}"
+            except UnsupportedInkSyntax as e:
+                print(f"⚠️ Built-in Ink compiler cannot handle this script, trying inklecate: {e}")
+            except InkCompileError as e:
+                return False, f"Compilation Failed: {e}"
+
         inklecate_cmd = DashboardUtils.locate_inklecate()
         if not inklecate_cmd:
             return False, "Ink compiler 'inklecate' not found. Please check your installation."
 
         try:
             result = subprocess.run([inklecate_cmd, "-o", json_path, ink_path], check=True, capture_output=True)
-            DashboardUtils.update_game_manifest()
+            DashboardUtils.derive_project_assets(output_dir)
+            DashboardUtils.update_game_manifest(output_dir)
             return True, "Compilation Successful! 'adventure.json' updated."
         except subprocess.CalledProcessError as e:
             err_msg = e.stderr.decode('utf-8') if e.stderr else str(e)
@@ -155,40 +200,6 @@ class DashboardUtils:
         except Exception as e:
             return False, f"Unexpected Error: {e}"
         
-    @staticmethod
-    def update_game_manifest():
-        """Scans output folder and updates the manifest.json for the Player."""
-        # current_dir is defined on line 14, so we make sure this runs after that
-        output_dir = os.path.join(current_dir, "..", "data", "output")
-        manifest_path = os.path.join(output_dir, "manifest.json")
-        
-        projects = []
-        
-        if os.path.exists(output_dir):
-            for folder in os.listdir(output_dir):
-                folder_path = os.path.join(output_dir, folder)
-                if os.path.isdir(folder_path):
-                    ink_path = os.path.join(folder_path, "adventure.ink")
-                    lang = "English" # Default
-                    # We check for the compiled json file
-                    json_path = os.path.join(folder_path, "adventure.json")
-                    if os.path.exists(json_path):
-                        # Read content only if ink_path exists
-                        if os.path.exists(ink_path):
-                            with open(ink_path, 'r', encoding='utf-8') as f:
-                                content = f.read()
-                            lang_match = re.search(r'VAR\s+language\s*=\s*"([^"]+)"', content)
-                            if lang_match:
-                                lang = lang_match.group(1)
-                    title = folder.replace("_", " ").title()
-                    projects.append({"id": folder, "title": title, "language": lang})
-                        
-
-        with open(manifest_path, 'w') as f:
-            json.dump(projects, f, indent=4)
-        
-        return len(projects)
-    
     @staticmethod
     def locate_inklecate():
         ink_env = os.getenv("INKLECATE_PATH") or os.getenv("INKLECATE")
@@ -245,6 +256,7 @@ class DashboardUtils:
 
         # In Story Pack mode we know all scene IDs up front, so we can link directly
         # to the next scene and avoid synthetic "_next" placeholder knots.
+        awaiting_stream = False
         if use_story_pack:
             cfg = DashboardUtils.load_config()
             pack = DashboardUtils.load_story_pack(cfg.get("book_id", ""))
@@ -254,61 +266,67 @@ class DashboardUtils:
                 if idx + 1 < len(scenes):
                     next_scene = scenes[idx + 1] if isinstance(scenes[idx + 1], dict) else {}
                     next_node_id = next_scene.get("scene_id", f"scene_{idx+2}")
+                elif pack["meta"].get("streaming"):
+                    # The next scene is still on its way: link through a placeholder, which
+                    # link_story_pack_placeholder points at it once it has arrived
+                    awaiting_stream = True
                 else:
                     next_node_id = "END"
         
         smith = st.session_state.smith
         
-        # 1. Linking & Cleanup
-        if curr_id != "intro":
-            # If we are creating a NEW scene from a placeholder (e.g. intro_next -> oak_closet),
-            # we must update 'intro_next' to point to 'oak_closet'.
-            if curr_id != base_id:
-                smith.connect_scenes(curr_id, base_id)
+        # All edits of this save go to the in-memory script and are written once, atomically.
+        with smith.batch():
+            # 1. Linking & Cleanup
+            if curr_id != "intro":
+                # If we are creating a NEW scene from a placeholder (e.g. intro_next -> oak_closet),
+                # we must update 'intro_next' to point to 'oak_closet'.
+                if curr_id != base_id:
+                    smith.connect_scenes(curr_id, base_id)
             
-            # Always remove the definition of the new node if it existed previously
-            # to ensure we write a clean version.
-            smith.remove_knot(base_id)
-
-        # 2. Write the Main Node
-        if curr_id == "intro":
-            # Handle potential ID renaming for intro
-            if base_id != "intro":
-                smith.patch_placeholder_links("intro", base_id)
-            smith.write_intro(scene, next_node_id, audio_file=selected_audio, audio_prompt=scene.get('audio_prompt'))
-        else:
-            smith.write_main_node_start(
-                base_id, 
-                scene['scene_text'], 
-                f"{base_id}_main",
-                scene['choices'], 
-                next_node_id,
-                audio_file=selected_audio,
-                audio_prompt=scene.get('audio_prompt')
-            )
-
-        # --- NEW: keep resume marker up to date ---
-        # append a runtime assignment so `get_resume_state` doesn’t
-        # fall back to the stale VAR at the top of the file.
-        try:
-            with open(smith.ink_path, "a", encoding="utf-8") as f:
-                f.write(f'\n~ last_node = "{current_real_id}"\n')
-        except Exception:
-            pass
-
-        # 3. Write Outcomes
-        smith.write_choice_outcomes(base_id, scene['choices'], next_node_id)
+                # Always remove the definition of the new node if it existed previously
+                # to ensure we write a clean version.
+                smith.remove_knot(base_id)
+
+            # 2. Write the Main Node
+            if curr_id == "intro":
+                # Handle potential ID renaming for intro
+                if base_id != "intro":
+                    smith.patch_placeholder_links("intro", base_id)
+                smith.write_intro(scene, next_node_id, audio_file=selected_audio, audio_prompt=scene.get('audio_prompt'))
+            else:
+                smith.write_main_node_start(
+                    base_id, 
+                    scene['scene_text'], 
+                    f"{base_id}_main",
+                    scene['choices'], 
+                    next_node_id,
+                    audio_file=selected_audio,
+                    audio_prompt=scene.get('audio_prompt')
+                )
+
+            # --- NEW: keep resume marker up to date ---
+            # append a runtime assignment so `get_resume_state` doesn’t
+            # fall back to the stale VAR at the top of the file.
+            smith.set_last_node(current_real_id)
+
+            # 3. Write Outcomes
+            smith.write_choice_outcomes(base_id, scene['choices'], next_node_id)
         
-        # 4. Check if this is the end (no choices)
-        is_end = not scene.get('choices')
-        if not is_end:
-            # Create placeholder knots only for legacy per-scene generation mode.
-            if not use_story_pack and next_node_id != "END":
-                smith.write_placeholder_knot(next_node_id)
-            st.session_state.node_id = next_node_id
-            st.session_state.current_step = "narrative"
-        else:
-            st.session_state.current_step = "finished"
+            # 4. Check if this is the end (no choices)
+            is_end = not scene.get('choices')
+            if not is_end:
+                # Create placeholder knots only for legacy per-scene generation mode.
+                if (not use_story_pack or awaiting_stream) and next_node_id != "END":
+                    smith.write_placeholder_knot(next_node_id)
+                st.session_state.node_id = next_node_id
+                st.session_state.current_step = "narrative"
+            else:
+                st.session_state.current_step = "finished"
+
+        # Validate right away (in-process, incremental) instead of at export time
+        for err in smith.validate():
+            st.warning(f"⚠️ Ink check: {err}")
 
         # 5. Reset
         st.toast(f"✅ Scene '{base_id}' saved to .ink file.")
@@ -331,36 +349,63 @@ class DashboardUtils:
 
     @staticmethod
     def load_config():
-        """Lädt die Config und fängt Fehler ab, falls die Datei leer oder kaputt ist."""
-        if not os.path.exists(CONFIG_PATH):
-            return {"book_id": "unknown_book", "llm_model": "gemini-2.0-flash-exp"}
-        
-        try:
-            with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-                content = f.read().strip()
-                if not content: # Datei ist leer
-                    return {"book_id": "unknown_book", "llm_model": "gemini-2.0-flash-exp"}
-                return json.loads(content)
-        except (json.JSONDecodeError, FileNotFoundError):
-            return {"book_id": "unknown_book", "llm_model": "gemini-2.0-flash-exp"}
+        """Lädt die Config aus dem Cache (ConfigService liest die Datei nur neu, wenn sie sich geändert hat).
+        Flache Kopie: Top-Level-Änderungen des Aufrufers landen nicht im Cache."""
+        from config_service import ConfigService
+        return dict(ConfigService.shared(CONFIG_PATH).get())
 
     @staticmethod
     def save_config(config):
-        """Speichert die Config sicher."""
-        with open(CONFIG_PATH, "w", encoding="utf-8") as f:
-            json.dump(config, f, indent=4)
-        
-        if os.path.exists(CONFIG_PATH):
-            try:
-                # FIX: Use utf-8 to handle emojis/special chars on Windows
-                with open(CONFIG_PATH, "r", encoding='utf-8') as f:
-                    loaded_data = json.load(f)
-                    config.update(loaded_data)
-            except Exception as e:
-                print(f"⚠️ Config Load Error: {e}")
-                # Do not silence errors; let the user know via console
+        """Speichert die Config atomar und aktualisiert den Cache."""
+        from config_service import ConfigService
+        config.update(ConfigService.shared(CONFIG_PATH).save(dict(config)))
         return config
 
+    @staticmethod
+    def _fts_terms(query):
+        """Splits a search query into lower-case word tokens, matching FTS5's unicode61 tokenizer."""
+        return [t.lower() for t in re.findall(r"\w+", query or "")]
+
+    @staticmethod
+    def _fuzzy_terms(c, term):
+        """
+        Typo tolerance: close matches for `term` from the FTS vocabulary. Candidates share
+        the first letter and have a similar length, which keeps the comparison set small.
+        """
+        import difflib
+        if len(term) < 4:
+            return []
+        rows = c.execute("""SELECT term FROM books_vocab WHERE term >= ? AND term < ?
+                            AND length(term) BETWEEN ? AND ?""",
+                         (term[0], term[0] + "\uffff", len(term) - 2, len(term) + 2)).fetchall()
+        return difflib.get_close_matches(term, [r[0] for r in rows], n=3, cutoff=0.75)
+
+    @staticmethod
+    def _search_gutenberg_fts(c, query, search_type, language):
+        terms = DashboardUtils._fts_terms(query)
+        if not terms:
+            return []
+        column = "title" if search_type == "title" else "author"
+        sql = """SELECT t.book_id, t.name, a.name FROM books_fts f
+                 JOIN titles t ON t.book_id = f.rowid
+                 LEFT JOIN authors a ON a.book_id = t.book_id
+                 WHERE books_fts MATCH ?""" + (" AND t.language = ?" if language else "") + """
+                 ORDER BY bm25(books_fts) LIMIT 500"""
+
+        def run(groups):
+            # Every word must match (as a prefix); alternatives within a word are OR-ed
+            expr = " AND ".join("(" + " OR ".join(f'"{w}"*' for w in group) + ")" for group in groups)
+            params = [f"{column} : ({expr})"] + ([language] if language else [])
+            return c.execute(sql, params).fetchall()
+
+        rows = run([[t] for t in terms])
+        if not rows:
+            # Nothing found: retry with spelling variants from the index vocabulary
+            groups = [[t] + DashboardUtils._fuzzy_terms(c, t) for t in terms]
+            if any(len(g) > 1 for g in groups):
+                rows = run(groups)
+        return rows
+
     @staticmethod
     def search_gutenberg_native(query, search_type="title", language=""):
         # FIX: Absolute path to database
@@ -370,6 +415,13 @@ class DashboardUtils:
             return []
         try:
             conn = sqlite3.connect(db_path); c = conn.cursor()
+            has_fts = c.execute("SELECT 1 FROM sqlite_master WHERE name = 'books_fts'").fetchone()
+            if has_fts:
+                rows = DashboardUtils._search_gutenberg_fts(c, query, search_type, language)
+                conn.close()
+                return [f"[{r[0]}] {r[1]} - {r[2]}" for r in rows]
+
+            # Legacy index without FTS (built by an older db_builder.py): plain LIKE scan
             search_param = f"%{query}%"
             lang_param = f"%[Language: {language}]%" if language else ""
             if search_type == "title":
@@ -434,8 +486,9 @@ class DashboardUtils:
         if os.path.exists(ink_path):
             files_to_delete.append(ink_path)
         story_pack_path = os.path.join(output_dir, "story_pack.json")
-        if os.path.exists(story_pack_path):
-            files_to_delete.append(story_pack_path)
+        for pack_file in (story_pack_path, os.path.join(output_dir, "story_pack.journal.jsonl")):
+            if os.path.exists(pack_file):
+                files_to_delete.append(pack_file)
 
         if os.path.exists(assets_dir):
             for f in os.listdir(assets_dir):
@@ -447,6 +500,15 @@ class DashboardUtils:
                 if f.endswith(('.mp3', '.wav', '.ogg')):
                     files_to_delete.append(os.path.join(audio_dir, f))
         
+        # Unclaimed speculative renders from the scene prefetcher
+        shutil.rmtree(os.path.join(assets_dir, "prefetch"), ignore_errors=True)
+        shutil.rmtree(os.path.join(audio_dir, "prefetch"), ignore_errors=True)
+        # Thumbnails/WebP copies belong to the deleted images
+        for derived in ("thumbs", "webp"):
+            shutil.rmtree(os.path.join(assets_dir, derived), ignore_errors=True)
+        if os.path.exists(os.path.join(assets_dir, "asset_index.json")):
+            os.remove(os.path.join(assets_dir, "asset_index.json"))
+
         if not files_to_delete:
             return 0, True
         
@@ -466,6 +528,7 @@ class DashboardUtils:
                 except Exception as e:
                     print(f"   ⚠️ Could not delete {os.path.basename(fpath)}: {e}")
             print(f"✅ Deleted {deleted}/{len(files_to_delete)} old files")
+            DashboardUtils.refresh_project_index(output_dir)
             return deleted, True
         except Exception as e:
             print(f"❌ Cleanup failed: {e}")
@@ -478,36 +541,132 @@ class DashboardUtils:
 
     @staticmethod
     def load_story_pack(book_id):
-        path = DashboardUtils.get_story_pack_path(book_id)
-        if not os.path.exists(path):
-            return None
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            if not isinstance(data, dict):
-                return None
-            if "scenes" not in data or not isinstance(data.get("scenes"), list):
-                return None
-            data.setdefault("meta", {})
-            data.setdefault("progress", {})
-            data["progress"].setdefault("next_index", 0)
-            data["progress"].setdefault("saved_scene_ids", [])
-            return data
-        except Exception as e:
-            print(f"⚠️ Could not load story pack: {e}")
-            return None
+        return DashboardUtils.load_story_pack_file(DashboardUtils.get_story_pack_path(book_id))
+
+    @staticmethod
+    def load_story_pack_file(path):
+        """Current pack (base file + edits journal, cached until either file changes). Treat as read-only."""
+        from story_pack_store import StoryPackStore
+        return StoryPackStore(path).load()
 
     @staticmethod
     def save_story_pack(book_id, pack_data):
+        return DashboardUtils.save_story_pack_file(DashboardUtils.get_story_pack_path(book_id), pack_data)
+
+    @staticmethod
+    def save_story_pack_file(path, pack_data):
+        """Writes a whole pack as the new base (atomic) and resets its edits journal."""
+        from story_pack_store import StoryPackStore
+        with _story_pack_lock:
+            return StoryPackStore(path).create(pack_data)
+
+    @staticmethod
+    def append_story_pack_scene(path, scene, meta=None):
+        """Streaming mode: adds one freshly generated scene, creating the pack on the first one."""
+        from story_pack_store import StoryPackStore
+        with _story_pack_lock:
+            store = StoryPackStore(path)
+            if not store.load():
+                store.create({
+                    "meta": {"created_at": datetime.datetime.utcnow().isoformat() + "Z"},
+                    "scenes": [],
+                    "progress": {"next_index": 0, "saved_scene_ids": []}
+                })
+            store.append_scene(scene, {**(meta or {}), "streaming": True})
+            return path
+
+    @staticmethod
+    def finish_story_pack_stream(path):
+        """
+        Marks a streamed pack as complete. The last scene becomes the finale; if the director
+        has already saved it (a stream that broke off mid-adventure), the placeholder its
+        choices lead to is turned into a closing knot of adventure.ink instead.
+        """
+        from story_pack_store import StoryPackStore
+        with _story_pack_lock:
+            store = StoryPackStore(path)
+            pack = store.load()
+            if not pack or not pack["meta"].get("streaming"):
+                return
+            scenes = pack["scenes"]
+            store.update_meta({"streaming": False, "target_scene_count": len(scenes)})
+            if scenes and int(pack["progress"].get("next_index", 0)) < len(scenes):
+                finale = dict(scenes[-1], choices=[])
+                if not finale.get("ending"):
+                    finale["ending"] = finale.get("scene_text", "")
+                store.replace_scene(len(scenes) - 1, finale)
+            elif scenes:
+                DashboardUtils._close_story_pack_ink(path, pack)
+            # The stream journaled one op per scene; start the edit session from a compact base
+            store.compact()
+
+    @staticmethod
+    def _close_story_pack_ink(path, pack):
+        """Rewrites the '<last saved scene>_next' placeholder (see finalize_ink_node) as the story's end."""
+        from ink_document import InkDocument
+        saved = pack["progress"].get("saved_scene_ids") or []
+        ink_path = os.path.join(os.path.dirname(path), "adventure.ink")
+        if not saved or not os.path.exists(ink_path):
+            return
+        placeholder = f"{saved[-1]}_next"
+        doc = InkDocument.load(ink_path)
+        if placeholder not in doc:
+            return
+        ending = (pack["scenes"][-1].get("ending") or "").strip()
+        doc.set_knot(placeholder, ["// The story pack ends here"] + ([ending] if ending else []) + ["-> END", ""])
+        doc.save(ink_path)
+
+    @staticmethod
+    def start_story_pack_stream(book_path, book_id, protagonist_name=None, scene_count=12):
+        """
+        Streams a story pack as a background job (see generation_jobs.stream_story_pack). An empty
+        pack flagged as streaming is written first; every scene is appended as soon as it has been
+        parsed, so the director can edit scene 1 while the rest is still being written. A broken
+        stream keeps the scenes received. Returns the pack path; a stream already running for it
+        is kept.
+        """
+        from job_queue import JobQueue
         path = DashboardUtils.get_story_pack_path(book_id)
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(pack_data, f, indent=2, ensure_ascii=False)
+        if DashboardUtils.story_pack_stream_alive(path):
+            return path
+        DashboardUtils.save_story_pack_file(path, {
+            "meta": {"streaming": True, "created_at": datetime.datetime.utcnow().isoformat() + "Z"},
+            "scenes": [],
+            "progress": {"next_index": 0, "saved_scene_ids": []}
+        })
+        JobQueue.shared().submit("generation_jobs:stream_story_pack", {
+            "book_path": book_path,
+            "pack_path": path,
+            "protagonist_name": protagonist_name,
+            "scene_count": int(scene_count)
+        }, key=DashboardUtils._story_pack_stream_key(path))
         return path
 
+    @staticmethod
+    def _story_pack_stream_key(path):
+        return f"story_pack_stream:{os.path.abspath(path)}"
+
+    @staticmethod
+    def story_pack_stream_alive(path):
+        """True while the stream job for this pack is queued or running (survives reruns; not restarts)."""
+        from job_queue import JobQueue, ACTIVE
+        return JobQueue.shared().find(DashboardUtils._story_pack_stream_key(path), statuses=ACTIVE) is not None
+
+    @staticmethod
+    def link_story_pack_placeholder(smith, book_id, scene_id):
+        """Points the placeholder left by a save that ran ahead of the stream at the scene that has now arrived."""
+        pack = DashboardUtils.load_story_pack(book_id)
+        saved = (pack or {}).get("progress", {}).get("saved_scene_ids") or []
+        if saved and saved[-1] != scene_id:
+            smith.connect_scenes(f"{saved[-1]}_next", scene_id)
+
     @staticmethod
     def create_story_pack(book_id, raw_pack):
         """Persists a freshly generated story pack and initializes resume metadata."""
+        return DashboardUtils.create_story_pack_file(DashboardUtils.get_story_pack_path(book_id), raw_pack)
+
+    @staticmethod
+    def create_story_pack_file(path, raw_pack):
         if not isinstance(raw_pack, dict):
             return None
         scenes = raw_pack.get("scenes", [])
@@ -523,7 +682,7 @@ class DashboardUtils:
             }
         }
         pack["meta"]["created_at"] = pack["meta"].get("created_at") or datetime.datetime.utcnow().isoformat() + "Z"
-        return DashboardUtils.save_story_pack(book_id, pack)
+        return DashboardUtils.save_story_pack_file(path, pack)
 
     @staticmethod
     def get_next_story_pack_scene(book_id):
@@ -538,6 +697,7 @@ class DashboardUtils:
             return None, total, None
         scene = scenes[idx]
         if isinstance(scene, dict):
+            scene = dict(scene)  # the cached pack is shared
             scene.setdefault("scene_id", f"scene_{idx+1}")
             scene.setdefault("scene_text", "")
             scene.setdefault("visual_prompt", "")
@@ -545,10 +705,26 @@ class DashboardUtils:
             scene.setdefault("choices", [])
         return idx, total, scene
 
+    @staticmethod
+    def get_upcoming_story_pack_scenes(book_id, count):
+        """Returns up to `count` scenes starting at the resume cursor (the one under review first)."""
+        pack = DashboardUtils.load_story_pack(book_id)
+        if not pack or count <= 0:
+            return []
+        idx = int(pack.get("progress", {}).get("next_index", 0))
+        return [s for s in pack.get("scenes", [])[idx:idx + count] if isinstance(s, dict)]
+
     @staticmethod
     def advance_story_pack(book_id, edited_scene):
         """Saves edited scene back into the pack and advances resume cursor."""
-        pack = DashboardUtils.load_story_pack(book_id)
+        with _story_pack_lock:
+            return DashboardUtils._advance_story_pack(book_id, edited_scene)
+
+    @staticmethod
+    def _advance_story_pack(book_id, edited_scene):
+        from story_pack_store import StoryPackStore
+        store = StoryPackStore(DashboardUtils.get_story_pack_path(book_id))
+        pack = store.load()
         if not pack:
             return False
         scenes = pack.get("scenes", [])
@@ -557,15 +733,11 @@ class DashboardUtils:
             return False
 
         if isinstance(edited_scene, dict):
-            scenes[idx] = edited_scene
+            # Journals only the fields the director changed
+            store.replace_scene(idx, edited_scene)
             scene_id = edited_scene.get("scene_id", f"scene_{idx+1}")
         else:
             scene_id = f"scene_{idx+1}"
 
-        saved_ids = pack.get("progress", {}).get("saved_scene_ids", [])
-        if scene_id not in saved_ids:
-            saved_ids.append(scene_id)
-        pack["progress"]["saved_scene_ids"] = saved_ids
-        pack["progress"]["next_index"] = idx + 1
-        DashboardUtils.save_story_pack(book_id, pack)
+        store.set_progress(idx + 1, saved_scene_id=scene_id)
         return True
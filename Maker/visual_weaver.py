@@ -1,10 +1,15 @@
-import requests
-import base64
 import os
 import json
 import time
 import sys # Added for real-time terminal clearing
 import random
+import hashlib
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from asset_cache import AssetCache
+from asset_derivatives import AssetDerivatives
+from sd_client import AsyncSDClient, httpx
+from sd_pool import SDBackendPool
 from session_manager import initialize_session_state, BOOKS_DIR, current_dir, CONFIG_PATH, DEFAULT_LLMS
 
 class VisualWeaver:
@@ -24,8 +29,8 @@ class VisualWeaver:
         print(f"📖 book_config.json top-level sd_model: {self.config.get('sd_model')}")
         
         if not self.config.get("sd_model") and sd_settings.get("sd_model"):
-            self.config["sd_model"] = sd_settings.get("sd_model")
             print(f"✅ Normalized: copied sd_settings.sd_model to top-level sd_model")
+        self.config = self._normalize_config(self.config)
         # Also keep a convenience attribute
         self.sd_model = self.config.get("sd_model")
         print(f"✅ VisualWeaver initialized with SD model: {self.sd_model}")
@@ -46,26 +51,49 @@ class VisualWeaver:
         # create the directory only if permitted
         if auto_make_dir and not os.path.exists(self.output_dir):
             os.makedirs(self.output_dir, exist_ok=True)
+
+        # Content-addressed cache of finished renders (None when disabled in config)
+        self.cache = AssetCache.from_config(self.config)
+
+        # WebUI node(s) to render on (sd_settings.backends, else api_url), each with a pooled
+        # keep-alive client shared by all weavers; self.client is the first node
+        self._connect_pool()
+
+        # Render settings follow sidebar edits without recreating the weaver (the project folder stays)
+        from config_service import ConfigService
+        ConfigService.shared().subscribe(self._on_config_change)
+
+    @staticmethod
+    def _normalize_config(config):
+        """Copy of the config with sd_settings.sd_model mirrored to top-level sd_model if that is unset."""
+        config = dict(config)
+        sd_settings = config.get("sd_settings", {})
+        if not config.get("sd_model") and sd_settings.get("sd_model"):
+            config["sd_model"] = sd_settings.get("sd_model")
+        return config
+
+    def _on_config_change(self, config):
+        self.config = self._normalize_config(config)
+        self.sd_model = self.config.get("sd_model")
+        self._connect_pool()
+
+    def _connect_pool(self):
+        sd_settings = self.config.get("sd_settings", {})
+        self.pool = SDBackendPool.from_config(
+            self.config, self.base_url,
+            timeouts=sd_settings.get("http_timeouts"),
+            pool_size=max(4, int(sd_settings.get("max_workers", 2)) + 2)
+        )
+        self.client = self.pool.primary.client
     
     def check_connection(self):
-        """Checks if the SD WebUI is reachable. Returns (Success, Message)."""
-        try:
-            response = requests.get(f"{self.base_url}/sdapi/v1/options", timeout=3)
-            if response.status_code == 200:
-                return True, "Connected"
-            elif response.status_code == 404:
-                return False, "Server Running but API not found. Add '--api' to COMMANDLINE_ARGS."
-            else:
-                return False, f"Server Error (Status: {response.status_code})"
-        except requests.exceptions.ConnectionError:
-            return False, "Connection Refused. Is WebForge running?"
-        except Exception as e:
-            return False, f"Error: {e}"
+        """Checks if the SD WebUI (any node of the pool) is reachable. Returns (Success, Message)."""
+        return self.pool.check_connection()
     
     def get_sd_models(self):
         """Fetches the list of available model checkpoints from SD WebUI."""
         try:
-            response = requests.get(f"{self.base_url}/sdapi/v1/sd-models", timeout=3)
+            response = self.client.sd_models()
             if response.status_code == 200:
                 # Return list of model titles (e.g. "v1-5-pruned.ckpt [e144158e]")
                 return [m['title'] for m in response.json()]
@@ -90,22 +118,33 @@ class VisualWeaver:
         if current == total:
             print() # Move to next line when done
 
-    def generate_batch(self, prompt, base_filename, count=4, callback=None):
+    def generate_batch(self, prompt, base_filename, count=4, callback=None, reroll=0):
         """
         Generates 'count' images.
         :param callback: A function that accepts (percent, current_step, total_steps) to update UI.
+        :param reroll: bumped by an explicit "Regenerate"; gives new seeds (and so new cache keys).
+
+        The strategy comes from sd_settings.batch_mode in book_config.json:
+          - "batch" (default): one txt2img request with batch_size=count. The WebUI
+            seeds the images seed, seed+1, ... so every candidate still differs.
+          - "parallel": up to sd_settings.max_workers concurrent single-image
+            requests, each with its own seed.
+          - "serial": the old one-request-per-candidate loop.
+        With several WebUI nodes (sd_settings.backends), "batch" splits the candidates into
+        one sub-batch per available node and "parallel" spreads single renders over all of them.
         """
         # Defensive: if caller requests zero images, return early with no work
         if count <= 0:
             print(f"ℹ️ generate_batch called with count={count}; nothing to generate.")
             return []
 
-        paths = []
         # Ensure the desired SD model from config is active before starting
-        try:
-            self.ensure_correct_model()
-        except Exception as e:
-            print(f"⚠️ Warning: ensure_correct_model raised: {e}")
+        # (with several nodes every node is checked when a render is dispatched to it)
+        if len(self.pool) == 1:
+            try:
+                self.ensure_correct_model()
+            except Exception as e:
+                print(f"⚠️ Warning: ensure_correct_model raised: {e}")
 
         print(f"\n🎨 Starting art production for: {base_filename}")
         
@@ -114,55 +153,218 @@ class VisualWeaver:
         
         # Initial UI update (if connected) — send percent, current, total
         if callback: callback(0, 0, count)
-        
-        for i in range(count):
-            file_name = f"{base_filename}_{i}"
-            path = self.generate_image(prompt, file_name)
-            
-            if path:
-                paths.append(path)
-            
-            # 1. Update Terminal Bar
-            self._draw_progress_bar(i + 1, count)
-            
-            # 2. Update Streamlit UI (The new link)
-            if callback:
-                # We calculate percentage (0 to 100) and current step
-                percent = int((i + 1) / count * 100)
-                callback(percent, i + 1, count)
-            
+
+        sd_settings = self.config.get("sd_settings", {})
+        mode = sd_settings.get("batch_mode", "batch")
+        if len(self.pool) > 1 and mode in ("batch", "parallel") and count > 1:
+            paths = self._generate_fanout(prompt, base_filename, count, mode, callback, reroll)
+        elif mode == "batch" and count > 1:
+            paths = self._generate_single_request(prompt, base_filename, count, callback, reroll=reroll)
+        elif mode == "parallel" and count > 1:
+            workers = max(1, int(sd_settings.get("max_workers", 2)))
+            paths = self._generate_parallel(prompt, base_filename, count, workers, callback, reroll)
+        else:
+            paths = []
+            for i in range(count):
+                file_name = f"{base_filename}_{i}"
+                path = self.generate_image(prompt, file_name, seed=self._candidate_seed(prompt, i, reroll))
+                
+                if path:
+                    paths.append(path)
+                
+                self._report_progress(i + 1, count, callback)
+
+        self._derive_candidates(paths)
+        return paths
+
+    def _derive_candidates(self, paths):
+        """Writes thumbnails/WebP copies next to the candidates so the selection grid loads small files."""
+        derivatives = AssetDerivatives.from_config(self.config, self.output_dir)
+        if not derivatives or not paths:
+            return
+        for path in paths:
+            derivatives.derive(path)
+
+    def _report_progress(self, current, total, callback=None):
+        """Updates the terminal bar and, if given, the Streamlit callback."""
+        self._draw_progress_bar(current, total)
+        if callback:
+            percent = int(current / total * 100) if total > 0 else 0
+            callback(percent, current, total)
+
+    def _generate_fanout(self, prompt, base_filename, count, mode, callback=None, reroll=0):
+        """Spreads the candidates over the pool's nodes, one chunk per request.
+        Candidate i keeps seed base + i whichever node renders it, so results match the
+        single-node modes (and the asset cache). A chunk that fails on every node is dropped.
+        """
+        nodes = len(self.pool.available())
+        size = 1 if mode == "parallel" else -(-count // nodes)
+        chunks = [(start, min(size, count - start)) for start in range(0, count, size)]
+        base_seed = self._candidate_seed(prompt, 0, reroll)
+        results = [None] * count
+        done = 0
+        with ThreadPoolExecutor(max_workers=min(len(chunks), self.pool.capacity())) as pool:
+            futures = {
+                pool.submit(self._render_chunk, prompt, base_filename, start, n, base_seed + start): (start, n)
+                for start, n in chunks
+            }
+            for future in as_completed(futures):
+                start, n = futures[future]
+                try:
+                    for offset, path in enumerate(future.result()):
+                        results[start + offset] = path
+                except Exception as e:
+                    print(f"⚠️ Candidates {start}-{start + n - 1} failed on every backend: {e}")
+                done += n
+                self._report_progress(done, count, callback)
+        return [p for p in results if p]
+
+    def _render_chunk(self, prompt, base_filename, start, n, seed):
+        """Renders candidates start..start+n-1 as one request on whichever node the pool picks."""
+        payload = self._build_payload(prompt, seed=seed, batch_size=n)
+        save_paths = [os.path.join(self.output_dir, f"{base_filename}_{start + i}.png") for i in range(n)]
+        keys = [self._cache_key(payload, seed + i) for i in range(n)] if self.cache else []
+        if keys and self.cache.fetch_all(keys, save_paths):
+            print(f"♻️ Asset cache hit for candidates {start}-{start + n - 1} of {base_filename}")
+            return save_paths
+        written = self._post_txt2img(payload, save_paths, timeout=60 * n, attempts=3)
+        if keys:
+            for key, path in zip(keys, written):
+                self.cache.store(key, path, kind="image")
+        return written
+
+    def _generate_parallel(self, prompt, base_filename, count, workers, callback=None, reroll=0):
+        """Runs up to `workers` txt2img requests at once, one seed per candidate.
+        Callbacks are fired from the calling thread so Streamlit widgets stay valid.
+        Uses the async client (one pooled httpx connection set) when httpx is available.
+        """
+        if httpx is not None:
+            return asyncio.run(self._generate_parallel_async(prompt, base_filename, count, workers, callback, reroll))
+        results = [None] * count
+        done = 0
+        with ThreadPoolExecutor(max_workers=min(workers, count)) as pool:
+            futures = {
+                pool.submit(self.generate_image, prompt, f"{base_filename}_{i}", seed=self._candidate_seed(prompt, i, reroll)): i
+                for i in range(count)
+            }
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+                done += 1
+                self._report_progress(done, count, callback)
+        return [p for p in results if p]
+
+    async def _generate_parallel_async(self, prompt, base_filename, count, workers, callback=None, reroll=0):
+        semaphore = asyncio.Semaphore(min(workers, count))
+        # One pooled async client per node; renders are dispatched through the shared pool
+        clients = {
+            b.url: AsyncSDClient(b.url, timeouts=b.client.timeouts, max_connections=workers)
+            for b in self.pool.backends
+        }
+        try:
+            async def render(i):
+                async with semaphore:
+                    return i, await self._generate_image_async(clients, prompt, f"{base_filename}_{i}",
+                                                               seed=self._candidate_seed(prompt, i, reroll))
+
+            results = [None] * count
+            done = 0
+            for next_done in asyncio.as_completed([render(i) for i in range(count)]):
+                i, path = await next_done
+                results[i] = path
+                done += 1
+                self._report_progress(done, count, callback)
+        finally:
+            for client in clients.values():
+                await client.aclose()
+        return [p for p in results if p]
+
+    async def _generate_image_async(self, clients, prompt, filename, retries=3, seed=None):
+        payload, save_path, cache_key = self._prepare_image(prompt, filename, seed)
+        if payload is None:
+            return save_path
+
+        async def render(backend):
+            if len(self.pool) > 1:
+                await asyncio.to_thread(self.ensure_correct_model, backend.client)
+            written = await clients[backend.url].txt2img_to_files(self._payload_for(backend.client, payload), [save_path])
+            if not written:
+                raise ValueError("txt2img response contained no image")
+            return written
+
+        # Failed attempts move to another node when there is one (see SDBackendPool.run_async)
+        written = await self.pool.run_async(render, checkpoint=self.config.get("sd_model"), attempts=retries)
+        return self._finish_image(written, save_path, cache_key)
+
+    def _generate_single_request(self, prompt, base_filename, count, callback=None, retries=3, reroll=0):
+        """Asks the WebUI for all candidates in one txt2img call (batch_size=count).
+        While the request is running, /sdapi/v1/progress is polled so the callback
+        keeps moving instead of jumping from 0 to 100.
+        """
+        payload = self._build_payload(prompt, seed=self._candidate_seed(prompt, 0, reroll), batch_size=count)
+        save_paths = [os.path.join(self.output_dir, f"{base_filename}_{i}.png") for i in range(count)]
+        # The WebUI seeds batch image i with seed + i, so each image has its own cache key
+        keys = [self._cache_key(payload, payload["seed"] + i) for i in range(count)] if self.cache else []
+        if keys and self.cache.fetch_all(keys, save_paths):
+            print(f"♻️ Asset cache hit for all {count} candidates of {base_filename}")
+            self._report_progress(count, count, callback)
+            return save_paths
+        print(f"📋 Payload will use sd_model_checkpoint: {self.config.get('sd_model')} (batch_size={count})")
+
+        # Failed attempts move to another node when there is one (see SDBackendPool.run)
+        dispatched = {}
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            future = pool.submit(self._post_txt2img, payload, save_paths, 60 * count, retries,
+                                 lambda backend: dispatched.update(client=backend.client))
+            while not future.done():
+                time.sleep(1)
+                fraction = self._poll_progress(dispatched.get("client"))
+                if fraction is None:
+                    continue
+                current = min(int(fraction * count), count - 1)
+                self._draw_progress_bar(current, count)
+                if callback:
+                    callback(min(int(fraction * 100), 99), current, count)
+            paths = future.result()
+
+        if keys:
+            for key, path in zip(keys, paths):
+                self.cache.store(key, path, kind="image")
+        self._report_progress(count, count, callback)
         return paths
 
-    def ensure_correct_model(self):
+    def _poll_progress(self, client=None):
+        """Returns the WebUI's current job progress (0.0 - 1.0), or None if unavailable."""
+        try:
+            response = (client or self.client).progress()
+            if response.status_code == 200:
+                return float(response.json().get("progress", 0.0))
+        except Exception:
+            pass
+        return None
+
+    def ensure_correct_model(self, client=None):
         """Ensure the Web UI is using the SD model specified in book_config.json.
         Supports model being defined either at top-level `sd_model` or under `sd_settings.sd_model`.
+        The shared client remembers the loaded checkpoint, so repeated batches skip the check;
+        a real switch waits until the WebUI reports the new model (sd_settings.model_load_timeout).
         """
         target_model = getattr(self, 'sd_model', None) or self.config.get('sd_model')
         if not target_model:
             print("ℹ️ No SD model configured in book_config.json; leaving Web UI model unchanged.")
-            return
+            return False
 
         try:
-            opt_res = requests.get(f"{self.base_url}/sdapi/v1/options", timeout=5)
-            if opt_res.status_code == 200:
-                current_model = opt_res.json().get("sd_model_checkpoint")
-                print(f"🔍 Web UI currently has sd_model_checkpoint: {current_model}")
-                print(f"🔍 Target model from book_config.json: {target_model}")
-                if current_model != target_model:
-                    print(f"🔄 Switching model to: {target_model}...")
-                    requests.post(f"{self.base_url}/sdapi/v1/options", json={"sd_model_checkpoint": target_model})
-                    # Give it a few seconds to load the heavy weights
-                    time.sleep(5)
-                    print(f"✅ Model switch completed")
-                else:
-                    print(f"✅ SD model already set to: {target_model}")
+            timeout = float(self.config.get("sd_settings", {}).get("model_load_timeout", 180))
+            return (client or self.client).ensure_checkpoint(target_model, timeout=timeout)
         except Exception as e:
             print(f"⚠️ Could not check/switch model: {e}")
+            return False
 
-    def generate_image(self, prompt, filename, retries=3):
+    def _build_payload(self, prompt, seed=None, batch_size=1):
+        """Builds the txt2img payload from book_config.json."""
         sampler = self.config.get("sd_settings", {}).get("sampler_name", "Euler a")
         scheduler = self.config.get("sd_settings", {}).get("scheduler", "Automatic")
-        random_seed = random.randint(1, 1000000000)
+        random_seed = seed if seed is not None else random.randint(1, 1000000000)
         width = self.config.get("visual_settings", {}).get("width", 512)
         height = self.config.get("visual_settings", {}).get("height", 768)
         
@@ -176,35 +378,89 @@ class VisualWeaver:
             "scheduler": scheduler,
             "seed": random_seed,
             "cfg_scale": self.config.get("sd_settings", {}).get("cfg_scale", 7.0),
-            "override_settings": {
-                "sd_model_checkpoint": self.config.get("sd_model")
-            }
         }
+        if batch_size > 1:
+            payload["batch_size"] = batch_size
+            payload["n_iter"] = 1
+        return payload
+
+    def _payload_for(self, client, payload):
+        """The payload as sent to one node. The checkpoint is only forced per request when that
+        node is not known to have it loaded; an override makes the WebUI compare (and possibly
+        reload) weights on every call."""
+        if self.config.get("sd_model") and not client.has_checkpoint(self.config.get("sd_model")):
+            return {**payload, "override_settings": {"sd_model_checkpoint": self.config.get("sd_model")}}
+        return payload
 
+    def _candidate_seed(self, prompt, index, reroll=0):
+        """Seed for candidate `index`.
+        With the asset cache enabled (or sd_settings.deterministic_seeds), seeds are
+        derived from the prompt so re-running a scene reproduces the same candidates and
+        hits the cache. Candidate i always uses base + i, matching the WebUI's batch seeds.
+        An explicit "Regenerate" passes a new `reroll` count, which is salted into the seed,
+        so the user gets fresh candidates (under new cache keys) instead of the cached ones.
+        """
+        sd_settings = self.config.get("sd_settings", {})
+        if not sd_settings.get("deterministic_seeds", self.cache is not None):
+            return random.randint(1, 1000000000)
+        salt = f"|{reroll}" if reroll else ""
+        digest = hashlib.sha256(f"{self.config.get('sd_model')}|{prompt}{salt}".encode("utf-8")).hexdigest()
+        return int(digest[:8], 16) % 1000000000 + index
+
+    def _cache_key(self, payload, seed):
+        return AssetCache.make_key(
+            kind="sd_image",
+            model=self.config.get("sd_model"),
+            master_style=self.config.get("visual_settings", {}).get("master_style"),
+            prompt=payload.get("prompt"),
+            negative_prompt=payload.get("negative_prompt"),
+            steps=payload.get("steps"),
+            cfg_scale=payload.get("cfg_scale"),
+            sampler=payload.get("sampler_name"),
+            scheduler=payload.get("scheduler"),
+            size=(payload.get("width"), payload.get("height")),
+            seed=seed,
+        )
+
+    def _post_txt2img(self, payload, save_paths, timeout=60, attempts=1, on_dispatch=None):
+        """Renders on a node picked by the pool and streams the returned images straight into
+        save_paths. Returns the paths written. Up to `attempts` nodes are tried."""
+        def render(backend):
+            if len(self.pool) > 1:
+                self.ensure_correct_model(backend.client)
+            body = self._payload_for(backend.client, payload)
+            print(f"Posting to {backend.url}/sdapi/v1/txt2img with payload keys: {list(body.keys())}")
+            written = backend.client.txt2img_to_files(body, save_paths, timeout=timeout)
+            if not written:
+                raise ValueError("txt2img response contained no image")
+            return written
+        return self.pool.run(render, checkpoint=self.config.get("sd_model"), attempts=attempts, on_dispatch=on_dispatch)
+
+    def _prepare_image(self, prompt, filename, seed=None):
+        """Returns (payload, save_path, cache_key); payload is None when the asset cache already had it."""
+        payload = self._build_payload(prompt, seed=seed)
         save_path = os.path.join(self.output_dir, f"{filename}.png")
+
+        cache_key = self._cache_key(payload, payload["seed"]) if self.cache else None
+        if cache_key and self.cache.fetch(cache_key, save_path):
+            print(f"♻️ Asset cache hit: {filename}")
+            return None, save_path, cache_key
         
         print(f"📋 Payload will use sd_model_checkpoint: {self.config.get('sd_model')}")
+        return payload, save_path, cache_key
 
-        # FIX: The retry loop logic
-        for attempt in range(retries):
-            try:
-                print(f"Posting to {self.base_url}/sdapi/v1/txt2img with payload keys: {list(payload.keys())}")
-                response = requests.post(f"{self.base_url}/sdapi/v1/txt2img", json=payload, timeout=60)
-                response.raise_for_status()
-                r = response.json()
-
-                # Process and save the image
-                image_data = base64.b64decode(r['images'][0])
-                os.makedirs(os.path.dirname(save_path), exist_ok=True)
-                with open(save_path, "wb") as f:
-                    f.write(image_data)
-                
-                return save_path # Success! Return the path
+    def _finish_image(self, written, save_path, cache_key):
+        if not written:
+            raise ValueError("txt2img response contained no image")
+        if cache_key:
+            self.cache.store(cache_key, save_path, kind="image")
+        return save_path
 
-            except Exception as e:
-                print(f"⚠️ Attempt {attempt+1} failed: {e}")
-                if attempt < retries - 1:
-                    time.sleep(2) # Wait before retrying
-                else:
-                    raise e 
-                    return None
\ No newline at end of file
+    def generate_image(self, prompt, filename, retries=3, seed=None):
+        payload, save_path, cache_key = self._prepare_image(prompt, filename, seed)
+        if payload is None:
+            return save_path
+
+        # Failed attempts move to another node when there is one (see SDBackendPool.run)
+        written = self._post_txt2img(payload, [save_path], attempts=retries)
+        return self._finish_image(written, save_path, cache_key) # Success! Return the path
@@ -1,69 +1,157 @@
 import sqlite3
 import re
 import os
+import sys
+import time
+from itertools import islice
 
 # CONFIGURATION
 INPUT_FILE = "GUTINDEX.ALL.new"  # Change to "Gutindex_test.txt" to test first
 DB_NAME = "gutenberg_index.db"
+BATCH_SIZE = 5000
 
-def build_database():
+# An entry starts with an unindented "Title, by Author      12345" line; wrapped title text
+# and "[Language: ...]" style metadata follow on indented lines.
+ENTRY_RE = re.compile(r"^([^\s~<].*?)\s+(\d{1,6})\s*$")
+
+def create_schema(c):
+    """
+    (Re)creates the catalogue tables:
+    - titles/authors keyed by book_id, so the joins are index lookups
+    - titles.language holds the normalised "[Language: ...]" tag (English if untagged)
+    - books_fts: FTS5 index over title + author with prefix indexes, ranked via bm25
+    - books_vocab: the FTS vocabulary, used for typo-tolerant matching
+    - build_info: bookkeeping for incremental builds
+    """
+    c.execute("DROP TABLE IF EXISTS titles")
+    c.execute("DROP TABLE IF EXISTS authors")
+    c.execute("DROP TABLE IF EXISTS books_fts")
+    c.execute("DROP TABLE IF EXISTS books_vocab")
+    c.execute("DROP TABLE IF EXISTS build_info")
+    c.execute("CREATE TABLE titles (book_id INTEGER PRIMARY KEY, name TEXT, language TEXT)")
+    c.execute("CREATE TABLE authors (book_id INTEGER PRIMARY KEY, name TEXT)")
+    c.execute("CREATE INDEX idx_titles_language ON titles (language)")
+    c.execute("""CREATE VIRTUAL TABLE books_fts USING fts5 (
+                     title, author, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')""")
+    c.execute("CREATE VIRTUAL TABLE books_vocab USING fts5vocab (books_fts, 'row')")
+    c.execute("CREATE TABLE build_info (key TEXT PRIMARY KEY, value TEXT)")
+
+def normalize_language(meta_tags):
+    """'[Language: german]' -> 'German'. Untagged entries are English in GUTINDEX."""
+    for tag in meta_tags:
+        m = re.match(r"\[Language:\s*([^\]]+)\]", tag, re.IGNORECASE)
+        if m:
+            return " ".join(w.capitalize() for w in m.group(1).split())
+    return "English"
+
+def make_entry(text_block, book_id, extra_meta):
+    """Turns one raw catalogue entry into a (book_id, title, author, language) row."""
+    # Clean up newlines and extra spaces within the title/author block
+    clean_text = " ".join(text_block.split())
+
+    # Detect Author (Gutenberg usually uses "Title, by Author")
+    if ", by " in clean_text:
+        parts = clean_text.split(", by ")
+        title = parts[0].strip()
+        author = parts[1].strip()
+    else:
+        title = clean_text.strip()
+        author = "Unknown"
+
+    # Append [Language: ...] / [Subtitle: ...] to the title so the Search Filter can find it.
+    if extra_meta:
+        title = f"{title} {' '.join(extra_meta)}"
+
+    return int(book_id), title, author, normalize_language(extra_meta)
+
+def iter_entries(path):
+    """
+    Streams GUTINDEX line by line and yields (book_id, title, author, language) rows.
+    Memory use is bounded by a single entry, whatever the size of the index file.
+    """
+    current = None  # [text_lines, book_id, meta_tags, open_meta]
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            line = line.rstrip("\r\n")
+            m = ENTRY_RE.match(line)
+            if m:
+                if current:
+                    yield make_entry(" ".join(current[0]), current[1], current[2])
+                current = [[m.group(1)], m.group(2), [], None]
+                continue
+            if current is None:
+                continue
+            stripped = line.strip()
+            if not stripped or not line[0].isspace():
+                # Blank line or an unindented non-entry line (section header) ends the entry
+                yield make_entry(" ".join(current[0]), current[1], current[2])
+                current = None
+            elif current[3] is not None or stripped.startswith("["):
+                # Metadata, possibly wrapped over several lines until the closing bracket
+                current[3] = f"{current[3]} {stripped}" if current[3] else stripped
+                if current[3].endswith("]"):
+                    current[2].append(current[3])
+                    current[3] = None
+            else:
+                current[0].append(stripped)
+    if current:
+        yield make_entry(" ".join(current[0]), current[1], current[2])
+
+def _schema_exists(c):
+    return c.execute("SELECT 1 FROM sqlite_master WHERE name = 'build_info'").fetchone() is not None
+
+def build_database(incremental=False):
     if not os.path.exists(INPUT_FILE):
         print(f"❌ Error: {INPUT_FILE} not found.")
         return
 
-    # 1. Setup Database
-    conn = sqlite3.connect(DB_NAME)
+    # 1. Setup Database (WAL + no fsync while bulk loading; the build can simply be rerun)
+    conn = sqlite3.connect(DB_NAME, isolation_level=None)
     c = conn.cursor()
-    c.execute("DROP TABLE IF EXISTS titles")
-    c.execute("DROP TABLE IF EXISTS authors")
-    c.execute("CREATE TABLE titles (book_id INTEGER, name TEXT)")
-    c.execute("CREATE TABLE authors (book_id INTEGER, name TEXT)")
+    c.execute("PRAGMA journal_mode = WAL")
+    c.execute("PRAGMA synchronous = OFF")
 
-    print(f"🛠️  Processing {INPUT_FILE}...")
+    last_id = 0
+    if incremental and _schema_exists(c):
+        row = c.execute("SELECT value FROM build_info WHERE key = 'max_book_id'").fetchone()
+        last_id = int(row[0]) if row else 0
+        print(f"🛠️  Processing {INPUT_FILE} (incremental, after #{last_id})...")
+    else:
+        create_schema(c)
+        print(f"🛠️  Processing {INPUT_FILE}...")
 
-    # 2. Parsing Logic
-    # We read the file and split into blocks by detecting the book ID at the end of lines
-    with open(INPUT_FILE, "r", encoding="utf-8", errors="ignore") as f:
-        content = f.read()
+    # 2. Stream entries into the DB in large batches, all inside one transaction
+    start = time.time()
+    processed_count = 0
+    max_id = last_id
+    c.execute("BEGIN")
+    entries = (e for e in iter_entries(INPUT_FILE) if e[0] > last_id)
+    while True:
+        batch = list(islice(entries, BATCH_SIZE))
+        if not batch:
+            break
+        c.executemany("INSERT OR REPLACE INTO titles VALUES (?, ?, ?)",
+                      [(book_id, title, language) for book_id, title, _, language in batch])
+        c.executemany("INSERT OR REPLACE INTO authors VALUES (?, ?)",
+                      [(book_id, author) for book_id, _, author, _ in batch])
+        processed_count += len(batch)
+        max_id = max(max_id, max(e[0] for e in batch))
 
-    # Regex to find a title/author block ending with a 1-6 digit ID
-    # Matches: [Title/Author Text] [Spaces] [ID]
-    entries = re.findall(r"(.+?)\s+(\d{1,6})\n", content, re.DOTALL)
+    # 3. Full-text index (rowid = book_id) for the newly added rows
+    c.execute("""INSERT INTO books_fts (rowid, title, author)
+                 SELECT t.book_id, t.name, a.name FROM titles t JOIN authors a ON a.book_id = t.book_id
+                 WHERE t.book_id > ?""", (last_id,))
+    if processed_count:
+        c.execute("INSERT INTO books_fts (books_fts) VALUES ('optimize')")
+    c.execute("INSERT OR REPLACE INTO build_info VALUES ('max_book_id', ?)", (str(max_id),))
+    c.execute("INSERT OR REPLACE INTO build_info VALUES ('built_at', ?)", (time.strftime("%Y-%m-%d %H:%M:%S"),))
+    c.execute("COMMIT")
 
-    processed_count = 0
-    for text_block, book_id in entries:
-        # Clean up newlines and extra spaces within the title/author block
-        clean_text = " ".join(text_block.split())
-        
-        # Detect Author (Gutenberg usually uses "Title, by Author")
-        if ", by " in clean_text:
-            parts = clean_text.split(", by ")
-            title = parts[0].strip()
-            author = parts[1].strip()
-        else:
-            title = clean_text.strip()
-            author = "Unknown"
-
-        # Check for [Language: ...] or [Subtitle: ...] in the block
-        # and append it to the title so the Search Filter can find it.
-        # This ensures "[Language: French]" is indexed!
-        extra_meta = re.findall(r"(\[.*?\])", clean_text)
-        if extra_meta:
-            # Re-attach metadata to title for indexing
-            meta_str = " ".join(extra_meta)
-            # Remove meta from the clean title to avoid duplication
-            for m in extra_meta:
-                title = title.replace(m, "").strip()
-            title = f"{title} {meta_str}"
-
-        # 3. Insert into DB
-        c.execute("INSERT INTO titles VALUES (?, ?)", (book_id, title))
-        c.execute("INSERT INTO authors VALUES (?, ?)", (book_id, author))
-        processed_count += 1
-
-    conn.commit()
+    c.execute("PRAGMA synchronous = NORMAL")
+    c.execute("PRAGMA wal_checkpoint(TRUNCATE)")
     conn.close()
-    print(f"✅ Success! Indexed {processed_count} books into {DB_NAME}.")
+    print(f"✅ Success! Indexed {processed_count} books into {DB_NAME} in {time.time() - start:.1f}s.")
 
 if __name__ == "__main__":
-    build_database()
\ No newline at end of file
+    # python db_builder.py --incremental  -> only add entries newer than the last build
+    build_database(incremental="--incremental" in sys.argv[1:])
@@ -1,11 +1,13 @@
 import os
-import json
+import sys
+
+sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), "Maker"))
+from manifest_service import ManifestService
 
 def fix_installation():
     # 1. Determine Paths
     root_dir = os.path.abspath(os.path.dirname(__file__))
     data_dir = os.path.join(root_dir, "data", "output")
-    manifest_path = os.path.join(data_dir, "manifest.json")
     
     print(f"🔍 Scanning: {data_dir}")
 
@@ -13,31 +15,20 @@ def fix_installation():
         print("❌ Error: 'data/output' folder not found!")
         return
 
-    # 2. Find Games (Folders with adventure.json)
-    games = []
-    for folder_name in os.listdir(data_dir):
-        folder_path = os.path.join(data_dir, folder_name)
-        adventure_path = os.path.join(folder_path, "adventure.json")
-        
-        if os.path.isdir(folder_path) and os.path.exists(adventure_path):
-            print(f"   ✅ Found game: {folder_name}")
-            games.append({
-                "id": folder_name,
-                "title": folder_name.replace("_", " ").title() # Make a pretty title
-            })
+    # 2. Rebuild the manifest from scratch (folders with adventure.json are games)
+    service = ManifestService(data_dir)
+    try:
+        count = service.rebuild()
+    except Exception as e:
+        print(f"❌ Failed to write file: {e}")
+        return
 
-    if not games:
+    if not count:
         print("❌ No games found! Make sure you have an 'adventure.json' inside a folder in data/output.")
         return
 
-    # 3. Write Valid Manifest
-    try:
-        with open(manifest_path, "w", encoding="utf-8") as f:
-            json.dump(games, f, indent=4)
-        print(f"🎉 Success! Created valid manifest.json with {len(games)} games.")
-        print(f"   Location: {manifest_path}")
-    except Exception as e:
-        print(f"❌ Failed to write file: {e}")
+    print(f"🎉 Success! Created valid manifest.json with {count} games.")
+    print(f"   Location: {service.manifest_path}")
 
 if __name__ == "__main__":
     fix_installation()
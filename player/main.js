@@ -1,6 +1,7 @@
 // --- GLOBAL STATE ---
 let story;
 let currentProject = "";
+let assetIndex = {};
 let unlockedImages = { scenes: [], rewards: [] };
 let activeGalleryTab = 'scenes';
 let trackedTraits = [];
@@ -374,6 +375,36 @@ function getAssetPath(type, fileName = "") {
     if (fileName) base += fileName;
     return base;
 }
+
+// --- OPTIMISED IMAGES ---
+// assets/asset_index.json (written by the Maker on publish) maps each PNG to a
+// thumbnail and a compressed WebP copy. Missing entries fall back to the PNG.
+function loadAssetIndex() {
+    const project = currentProject;
+    assetIndex = {};
+    return fetch(getAssetPath('assets', 'asset_index.json'))
+        .then(r => r.ok ? r.json() : {})
+        .then(index => {
+            if (project === currentProject) assetIndex = index || {};
+        })
+        .catch(() => {});
+}
+
+function getImageVariantPath(fileName, variant) {
+    // variant: 'webp' for the scene view, 'thumb' for the gallery
+    const entry = assetIndex[fileName];
+    if (!entry || !entry[variant]) return getAssetPath('assets', fileName);
+    return getAssetPath('assets', `${entry[variant]}?v=${entry.mtime_ns || 0}`);
+}
+
+function setImageSource(img, fileName, variant) {
+    const pngPath = getAssetPath('assets', fileName);
+    img.onerror = () => {
+        img.onerror = null;
+        if (img.src !== new URL(pngPath, window.location.href).href) img.src = pngPath;
+    };
+    img.src = getImageVariantPath(fileName, variant);
+}
 window.onload = () => {
     // Restore typewriter setting from localStorage
     const saved = localStorage.getItem('typewriter_enabled');
@@ -482,6 +513,9 @@ function startGame(saveData = null) {
     // Reset UI for new game
     resetGameUI();
     
+    // Fetched alongside the story; images fall back to the PNGs until it arrives
+    loadAssetIndex();
+
     const expectedPath = getAssetPath('assets', '../adventure.json');
     fetch(expectedPath)
         .then(r => {
@@ -931,20 +965,87 @@ function renderContinueButton(label) {
 const audioManager = {
     currentTrack: null,
     audioElement: null,
+    // Web Audio loops the decoded buffer sample-accurately; <audio loop> leaves a gap at every repeat
+    audioContext: null,
+    source: null,
+    gainNode: null,
+    buffers: {},
+    maxBuffers: 8,
+    volume: 0.6,
     
     init() {
-        this.audioElement = new Audio();
-        this.audioElement.loop = true;
-        this.audioElement.volume = 0.6;
+        if (!this.audioElement) {
+            this.audioElement = new Audio();
+            this.audioElement.loop = true;
+            this.audioElement.volume = this.volume;
+        }
+        const AudioCtx = window.AudioContext || window.webkitAudioContext;
+        if (AudioCtx && !this.audioContext) {
+            try {
+                this.audioContext = new AudioCtx();
+            } catch (e) {
+                console.log("Web Audio unavailable, ambience uses <audio>:", e);
+            }
+        }
     },
     
     play(audioFile) {
         const audioPath = getAssetPath('audio', audioFile);
         if (this.currentTrack === audioFile) return; // Already playing
-        // Fade out old track
-        if (this.audioElement && this.audioElement.src) {
-            this.audioElement.volume = 0;
+        this.currentTrack = audioFile;
+        if (!this.audioContext) {
+            this.playElement(audioPath);
+            return;
         }
+        this.loadBuffer(audioPath)
+            .then(buffer => {
+                if (this.currentTrack === audioFile) this.playBuffer(buffer);
+            })
+            .catch(e => {
+                console.log("Gapless loop unavailable, falling back to <audio>:", e);
+                if (this.currentTrack === audioFile) this.playElement(audioPath);
+            });
+    },
+
+    loadBuffer(audioPath) {
+        if (!this.buffers[audioPath]) {
+            const keys = Object.keys(this.buffers);
+            if (keys.length >= this.maxBuffers) delete this.buffers[keys[0]];
+            this.buffers[audioPath] = fetch(audioPath)
+                .then(r => {
+                    if (!r.ok) throw new Error(`HTTP ${r.status}`);
+                    return r.arrayBuffer();
+                })
+                // Callback form: older Safari has no promise-based decodeAudioData
+                .then(data => new Promise((resolve, reject) => this.audioContext.decodeAudioData(data, resolve, reject)));
+            this.buffers[audioPath].catch(() => delete this.buffers[audioPath]);
+        }
+        return this.buffers[audioPath];
+    },
+
+    playBuffer(buffer) {
+        const ctx = this.audioContext;
+        if (ctx.state === 'suspended') {
+            ctx.resume().catch(() => {});
+        }
+        this.stopCurrent();
+        const now = ctx.currentTime;
+        // Fade in over 2 seconds
+        const gain = ctx.createGain();
+        gain.gain.setValueAtTime(0, now);
+        gain.gain.linearRampToValueAtTime(this.volume, now + 2);
+        gain.connect(ctx.destination);
+        const source = ctx.createBufferSource();
+        source.buffer = buffer;
+        source.loop = true;
+        source.connect(gain);
+        source.start(now);
+        this.source = source;
+        this.gainNode = gain;
+    },
+
+    playElement(audioPath) {
+        this.stopCurrent();
         // Fade in new track
         this.audioElement.src = audioPath;
         this.audioElement.volume = 0;
@@ -952,19 +1053,31 @@ const audioManager = {
         // Fade in over 2 seconds
         let vol = 0;
         const fadeInterval = setInterval(() => {
-            vol = Math.min(vol + 0.1, 0.6);
+            vol = Math.min(vol + 0.1, this.volume);
             this.audioElement.volume = vol;
-            if (vol >= 0.6) clearInterval(fadeInterval);
+            if (vol >= this.volume) clearInterval(fadeInterval);
         }, 200);
-        this.currentTrack = audioFile;
     },
-    
-    stop() {
-        if (this.audioElement) {
+
+    stopCurrent() {
+        if (this.source) {
+            const now = this.audioContext.currentTime;
+            this.gainNode.gain.cancelScheduledValues(now);
+            this.gainNode.gain.setValueAtTime(this.gainNode.gain.value, now);
+            this.gainNode.gain.linearRampToValueAtTime(0, now + 0.3);
+            this.source.stop(now + 0.3);
+            this.source = null;
+            this.gainNode = null;
+        }
+        if (this.audioElement && this.audioElement.src) {
             this.audioElement.volume = 0;
             this.audioElement.pause();
-            this.currentTrack = null;
         }
+    },
+    
+    stop() {
+        this.stopCurrent();
+        this.currentTrack = null;
     }
 };
 
@@ -1037,17 +1150,18 @@ function handleTags(tags) {
             if (imageElement) {
                 // Preload image to prevent "pop-in"
                 const tempImg = new Image();
-                tempImg.src = fullPath;
                 tempImg.onload = () => {
+                    const loadedPath = tempImg.src; // WebP copy, or the PNG if that failed
                     imageElement.style.opacity = 0; // Fade out old (start transition)
                     setTimeout(() => {
-                        imageElement.src = fullPath;
+                        imageElement.src = loadedPath;
                         imageElement.style.opacity = 1; 
                     }, 300);
                     requestAnimationFrame(() => {
                         scrollStoryToBottom(1200);
                     });
                 };
+                setImageSource(tempImg, fileName, 'webp');
             }
 
             const isReward = fileName.includes("_reward");
@@ -1093,10 +1207,13 @@ function handleTags(tags) {
 function toggleGallery(show) {
     document.getElementById('gallery-overlay').style.display = show ? 'flex' : 'none';
     if (show) {
-        currentProject = document.getElementById('project-selector').value;
+        const project = document.getElementById('project-selector').value;
+        const indexReady = project === currentProject && Object.keys(assetIndex).length > 0;
+        currentProject = project;
         const storedArt = localStorage.getItem(`unlocked_art_${currentProject}`);
         unlockedImages = storedArt ? JSON.parse(storedArt) : { scenes: [], rewards: [] };
-        renderGallery();
+        if (indexReady) renderGallery();
+        else loadAssetIndex().then(renderGallery);
     }
 }
 
@@ -1122,7 +1239,8 @@ function renderGallery() {
 
     images.forEach(fileName => {
         const img = document.createElement('img');
-        img.src = getAssetPath('assets', fileName);
+        img.loading = "lazy";
+        setImageSource(img, fileName, 'thumb');
         img.className = "gallery-thumb";
         img.title = fileName;
         grid.appendChild(img);
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The Maker modules import each other by their flat names (run from Maker/ by Streamlit)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "Maker"), ROOT]
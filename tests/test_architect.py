@@ -0,0 +1,92 @@
+import re
+import json
+import types
+import llm_schemas
+from architect import AutonomousArchitect
+from llm_cache import LLMResponseCache
+
+OUTLINE = [
+    {"scene_id": "rabbit_hole", "summary": "Alice follows the rabbit."},
+    {"scene_id": "pool_of_tears", "summary": "Alice cries a pool."},
+    {"scene_id": "tea_party", "summary": "A mad tea party."},
+    {"scene_id": "trial", "summary": "The trial of the Knave."},
+]
+
+
+class FakeModels:
+    """Answers scene requests; `fails(scene_id, summary)` decides which ones break."""
+
+    def __init__(self, fails):
+        self.fails = fails
+        self.prompts = []
+
+    async def generate_content(self, model, contents, config):
+        self.prompts.append(contents)
+        scene_id, summary = re.search(r"THIS SCENE: (\w+) - (.*)", contents).groups()
+        if self.fails(scene_id, summary):
+            return types.SimpleNamespace(text="not json")
+        finale = "This is the FINALE" in contents
+        choices = [] if finale else [{"text": t, "type": t, "outcome_text": "...", "trait_changes": {}}
+                                     for t in ("golden", "exquisite", "bad")]
+        scene = {"scene_id": scene_id, "scene_text": summary, "visual_prompt": "v", "audio_prompt": "a",
+                 "choices": choices}
+        if finale:
+            scene["ending"] = "The end."
+        return types.SimpleNamespace(text=json.dumps(scene))
+
+
+def make_architect(tmp_path, fails):
+    arch = object.__new__(AutonomousArchitect)
+    arch.config = {"generation": {"llm_concurrency": 4, "scene_retries": 0}}
+    arch.llm_cache = LLMResponseCache(str(tmp_path / "llm.db"), "passthrough")
+    arch.model_name, arch.cache_identity = "model", "book"
+    arch.response_schemas = llm_schemas.build_schemas(["sanity"])
+    arch.models = FakeModels(fails)
+    arch.client = types.SimpleNamespace(aio=types.SimpleNamespace(models=arch.models))
+    arch._ensure_chat_ready = lambda live=False: None
+    arch._json_config = lambda kind: None
+    arch._story_pack_hints = lambda name: ("sanity", "")
+    arch._send_structured = lambda prompt, kind: {"meta": {}, "outline": [dict(o) for o in OUTLINE]}
+    return arch
+
+
+def test_all_scenes_written(tmp_path):
+    pack = make_architect(tmp_path, lambda scene_id, summary: False).generate_story_pack_parallel(scene_count=4)
+    assert [s["scene_id"] for s in pack["scenes"]] == [o["scene_id"] for o in OUTLINE]
+    assert "failed_scenes" not in pack["meta"]
+
+
+def test_failed_scene_is_bridged_by_the_next_one(tmp_path):
+    arch = make_architect(tmp_path, lambda scene_id, summary: scene_id == "pool_of_tears")
+    pack = arch.generate_story_pack_parallel(scene_count=4)
+    assert [s["scene_id"] for s in pack["scenes"]] == ["rabbit_hole", "tea_party", "trial"]
+    assert pack["scenes"][1]["scene_text"] == "Alice cries a pool. A mad tea party."
+    assert pack["meta"]["failed_scenes"] == ["pool_of_tears"]
+    assert pack["meta"]["bridged_scenes"] == {"tea_party": ["pool_of_tears"]}
+    # The bridge is written against the shortened outline
+    bridge_prompt = arch.models.prompts[-1]
+    assert "pool_of_tears" not in bridge_prompt and "scene 2 of 3" in bridge_prompt
+    assert pack["scenes"][-1]["choices"] == [] and pack["scenes"][-1]["ending"] == "The end."
+
+
+def test_failed_finale_is_folded_into_the_previous_scene(tmp_path):
+    arch = make_architect(tmp_path, lambda scene_id, summary: scene_id == "trial")
+    pack = arch.generate_story_pack_parallel(scene_count=4)
+    assert [s["scene_id"] for s in pack["scenes"]] == ["rabbit_hole", "pool_of_tears", "tea_party"]
+    finale = pack["scenes"][-1]
+    assert finale["scene_text"] == "A mad tea party. The trial of the Knave."
+    assert finale["choices"] == [] and finale["ending"] == "The end."
+    assert pack["meta"]["bridged_scenes"] == {"tea_party": ["trial"]}
+
+
+def test_outline_conclusion_survives_a_failed_bridge(tmp_path):
+    fails = lambda scene_id, summary: scene_id == "trial" or "Knave" in summary
+    pack = make_architect(tmp_path, fails).generate_story_pack_parallel(scene_count=4)
+    finale = pack["scenes"][-1]
+    assert finale["scene_id"] == "tea_party" and finale["scene_text"] == "A mad tea party."
+    assert finale["choices"] == [] and finale["ending"] == "The trial of the Knave."
+    assert pack["meta"]["failed_scenes"] == ["trial"]
+
+
+def test_nothing_written_gives_no_pack(tmp_path):
+    assert make_architect(tmp_path, lambda scene_id, summary: True).generate_story_pack_parallel(scene_count=4) is None
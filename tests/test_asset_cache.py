@@ -0,0 +1,68 @@
+import os
+import pytest
+from asset_cache import AssetCache
+
+
+def write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return AssetCache(str(tmp_path / "cache"), max_bytes=250)
+
+
+def test_make_key_is_order_independent():
+    assert AssetCache.make_key(prompt="a", seed=1) == AssetCache.make_key(seed=1, prompt="a")
+    assert AssetCache.make_key(prompt="a", seed=1) != AssetCache.make_key(prompt="a", seed=2)
+
+
+def test_store_then_fetch(cache, tmp_path):
+    cache.store("k1", write(tmp_path / "src.png", b"image"), kind="image")
+    dest = tmp_path / "out" / "copy.png"
+    assert cache.fetch("k1", str(dest)) and read(dest) == b"image"
+    assert not cache.fetch("k2", str(tmp_path / "none.png"))
+    assert not os.path.exists(tmp_path / "none.png")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"], stats["size_bytes"]) == (1, 1, 1, 5)
+
+
+def test_fetch_all_is_all_or_nothing(cache, tmp_path):
+    cache.store("a", write(tmp_path / "a.png", b"A"))
+    cache.store("b", write(tmp_path / "b.png", b"B"))
+    dests = [str(tmp_path / f"out_{i}.png") for i in range(3)]
+    assert not cache.fetch_all(["a", "b", "c"], dests)
+    assert not any(os.path.exists(d) for d in dests)
+    assert cache.fetch_all(["a", "b"], dests[:2])
+    assert [read(d) for d in dests[:2]] == [b"A", b"B"]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+
+
+def test_file_removed_behind_the_index_is_a_miss(cache, tmp_path):
+    cache.store("a", write(tmp_path / "a.png", b"A"))
+    os.remove(os.path.join(cache.root, "a", "a.png"))
+    assert not cache.fetch_all(["a"], [str(tmp_path / "out.png")])
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entries_are_evicted(cache, tmp_path):
+    cache.store("old", write(tmp_path / "old.bin", b"x" * 100))
+    cache.store("used", write(tmp_path / "used.bin", b"y" * 100))
+    assert cache.fetch("old", str(tmp_path / "touch.bin"))
+    cache.store("new", write(tmp_path / "new.bin", b"z" * 100))
+    assert cache.fetch("old", str(tmp_path / "o.bin"))
+    assert not cache.fetch("used", str(tmp_path / "u.bin"))
+    stats = cache.stats()
+    assert (stats["evictions"], stats["entries"], stats["size_bytes"]) == (1, 2, 200)
+
+
+def test_disabled_in_config():
+    assert AssetCache.from_config({"asset_cache": {"enabled": False}}) is None
@@ -0,0 +1,72 @@
+import os
+import json
+import pytest
+from PIL import Image
+from asset_derivatives import AssetDerivatives, INDEX_NAME
+
+
+def png(assets_dir, name, size=(800, 400), color="red"):
+    path = os.path.join(assets_dir, name)
+    Image.new("RGB", size, color).save(path)
+    return path
+
+
+@pytest.fixture
+def assets(tmp_path):
+    path = tmp_path / "assets"
+    path.mkdir()
+    return str(path)
+
+
+def test_derive_writes_thumbnail_webp_and_index(assets):
+    entry = AssetDerivatives(assets, thumb_size=100).derive(png(assets, "intro_main.png"))
+    assert entry["thumb"] == "thumbs/intro_main.webp" and (entry["width"], entry["height"]) == (800, 400)
+    with Image.open(os.path.join(assets, entry["thumb"])) as thumb:
+        assert thumb.format == "WEBP" and thumb.size == (100, 50)
+    with Image.open(os.path.join(assets, entry["webp"])) as full:
+        assert full.size == (800, 400)
+    with open(os.path.join(assets, INDEX_NAME), encoding="utf-8") as f:
+        assert json.load(f)["intro_main.png"] == entry
+
+
+def test_unchanged_png_is_not_reencoded(assets):
+    stage = AssetDerivatives(assets)
+    path = png(assets, "a.png")
+    stage.derive(path)
+    webp = os.path.join(assets, "webp", "a.webp")
+    os.utime(webp, ns=(1, 1))
+    stage.derive(path)
+    assert os.stat(webp).st_mtime_ns == 1
+    # A changed PNG is encoded again
+    png(assets, "a.png", size=(64, 64))
+    os.utime(path, ns=(10 ** 18, 10 ** 18))
+    assert stage.derive(path)["width"] == 64
+
+
+def test_derive_all_drops_removed_images(assets):
+    stage = AssetDerivatives(assets)
+    png(assets, "keep.png")
+    gone = png(assets, "gone.png")
+    assert stage.derive_all() == 2
+    os.remove(gone)
+    assert stage.derive_all() == 1
+    assert not os.path.exists(os.path.join(assets, "thumbs", "gone.webp"))
+    assert set(stage._load()) == {"keep.png"}
+
+
+def test_discard_and_thumbnail_fallback(assets):
+    stage = AssetDerivatives(assets)
+    path = png(assets, "x.png")
+    assert stage.thumbnail(path).endswith(os.path.join("thumbs", "x.webp"))
+    stage.discard(path)
+    assert stage._load() == {}
+    broken = os.path.join(assets, "broken.png")
+    with open(broken, "wb") as f:
+        f.write(b"not a png")
+    assert stage.thumbnail(broken) == broken
+
+
+def test_from_config():
+    assert AssetDerivatives.from_config({"asset_derivatives": {"enabled": False}}, "assets") is None
+    stage = AssetDerivatives.from_config({"asset_derivatives": {"thumb_size": 200}}, "assets")
+    assert stage.thumb_size == 200
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+import audio_loop
+
+RATE = 8000
+
+
+def tone(seconds, freq=220.0, rate=RATE):
+    t = np.arange(int(seconds * rate)) / rate
+    return (0.5 * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+def test_loop_end_is_found_at_a_matching_phase():
+    x = tone(2.0, freq=100.0)  # period of 80 samples
+    crossfade = 200
+    end = audio_loop.find_loop_end(x, crossfade, target_end=len(x), search=800)
+    assert len(x) - 800 <= end <= len(x)
+    # x[end - crossfade:end] lines up with the head, so the end is a whole number of periods away
+    assert (end - crossfade) % 80 == 0
+
+
+def test_seam_has_no_jump():
+    rng = np.random.default_rng(1)
+    x = tone(3.0) + 0.05 * rng.standard_normal(3 * RATE).astype(np.float32)
+    loop = audio_loop.make_seamless_loop(x, RATE, length_seconds=2, crossfade_ms=100)
+    assert abs(len(loop) - 2 * RATE) <= RATE // 2 and loop.dtype == np.float32
+    steps = np.abs(np.diff(loop))
+    # Wrapping from the last sample to the first is no bigger a step than the clip's own
+    assert abs(float(loop[0]) - float(loop[-1])) <= steps.max() + 1e-6
+
+
+def test_short_clips_are_returned_unchanged():
+    x = np.array([0.1, -0.1, 0.2], dtype=np.float32)
+    assert np.array_equal(audio_loop.make_seamless_loop(x, RATE), x)
+
+
+def test_peak_normalisation_and_int16_roundtrip():
+    x = np.array([0.0, 0.25, -0.5], dtype=np.float32)
+    y = audio_loop.normalize_peak(x)
+    assert np.max(np.abs(y)) == pytest.approx(10 ** (-audio_loop.PEAK_HEADROOM_DB / 20), rel=1e-5)
+    assert np.allclose(audio_loop.from_int16(audio_loop.to_int16(y)), y, atol=1e-4)
+    silent = np.zeros(4, dtype=np.float32)
+    assert audio_loop.normalize_peak(silent) is silent
@@ -0,0 +1,76 @@
+import gc
+import os
+import json
+import pytest
+from config_service import ConfigService, DEFAULT_CONFIG
+
+
+@pytest.fixture
+def service(tmp_path):
+    return ConfigService(str(tmp_path / "book_config.json"))
+
+
+def write(service, config, mtime_ns=None):
+    with open(service.path, "w", encoding="utf-8") as f:
+        json.dump(config, f)
+    if mtime_ns:
+        os.utime(service.path, ns=(mtime_ns, mtime_ns))
+
+
+def test_missing_or_broken_file_gives_defaults(service):
+    assert service.get() == DEFAULT_CONFIG
+    with open(service.path, "w", encoding="utf-8") as f:
+        f.write("{not json")
+    assert service.get() == DEFAULT_CONFIG
+
+
+def test_file_is_read_once_until_it_changes(service, monkeypatch):
+    write(service, {"book_id": "a"}, mtime_ns=10 ** 18)
+    reads = []
+    real_read = service._read
+    monkeypatch.setattr(service, "_read", lambda: reads.append(1) or real_read())
+    first = service.get()
+    assert service.get() is first and len(reads) == 1
+    write(service, {"book_id": "b"}, mtime_ns=10 ** 18 + 10 ** 9)  # edited behind our back
+    assert service.get()["book_id"] == "b" and len(reads) == 2
+
+
+def test_save_is_atomic_and_refreshes_the_cache(service):
+    service.save({"book_id": "saved", "generation": {"images_per_scene": 2}})
+    assert service.get()["book_id"] == "saved"
+    with open(service.path, encoding="utf-8") as f:
+        assert json.load(f)["generation"] == {"images_per_scene": 2}
+    assert [n for n in os.listdir(os.path.dirname(service.path)) if n.endswith(".tmp")] == []
+
+
+def test_broken_sections_are_dropped(service):
+    config = service.save({"book_id": "x", "traits": ["not", "an", "object"], "generation": {}})
+    assert "traits" not in config and config["generation"] == {}
+    assert ConfigService.validate([1, 2]) == DEFAULT_CONFIG
+
+
+def test_subscribers_hear_changes_and_bound_methods_are_weak(service):
+    seen = []
+
+    class Weaver:
+        def on_config(self, config):
+            seen.append(("weaver", config["book_id"]))
+
+    weaver = Weaver()
+    service.subscribe(weaver.on_config)
+    unsubscribe = service.subscribe(lambda config: seen.append(("fn", config["book_id"])))
+    service.save({"book_id": "one"})
+    service.save({"book_id": "one"})  # unchanged: nobody is called
+    assert seen == [("weaver", "one"), ("fn", "one")]
+
+    del weaver
+    gc.collect()
+    unsubscribe()
+    service.save({"book_id": "two"})
+    assert seen == [("weaver", "one"), ("fn", "one")]
+    assert service._subscribers == []
+
+
+def test_shared_instance_per_path(tmp_path):
+    path = str(tmp_path / "book_config.json")
+    assert ConfigService.shared(path) is ConfigService.shared(os.path.join(str(tmp_path), ".", "book_config.json"))
@@ -0,0 +1,93 @@
+import time
+import types
+import pytest
+from context_cache import ContextCacheRegistry
+from architect import AutonomousArchitect
+
+
+class FakeCaches:
+    def __init__(self):
+        self.live = {}
+        self.created = 0
+
+    def create(self, model, config):
+        self.created += 1
+        name = f"cachedContents/{self.created}"
+        self.live[name] = time.time() + 3600
+        return types.SimpleNamespace(name=name, expire_time=None, display_name=config.display_name)
+
+    def update(self, name, config):
+        if name not in self.live:
+            raise RuntimeError("404 cache not found")
+        self.live[name] = time.time() + 3600
+        return types.SimpleNamespace(name=name, expire_time=None)
+
+
+def test_registry_round_trip(tmp_path):
+    registry = ContextCacheRegistry(str(tmp_path / "contexts.json"))
+    key = registry.make_key("book text", "model", "instruction")
+    assert key != registry.make_key("book text", "model", "other instruction")
+    registry.put(key, "cachedContents/1", time.time() + 3600)
+    assert registry.get(key)["name"] == "cachedContents/1"
+    assert registry.get(key, min_remaining=7200) is None
+    registry.forget(key)
+    assert registry.get(key) is None
+
+
+def test_expired_entries_are_pruned_on_write(tmp_path):
+    registry = ContextCacheRegistry(str(tmp_path / "contexts.json"))
+    registry.put("old", "cachedContents/old", time.time() - 1)
+    registry.put("new", "cachedContents/new", time.time() + 3600)
+    assert set(registry._read()) == {"new"}
+
+
+@pytest.fixture
+def make_architect(tmp_path):
+    book = tmp_path / "book.txt"
+    book.write_text("Once upon a time.", encoding="utf-8")
+    registry = ContextCacheRegistry(str(tmp_path / "contexts.json"))
+    caches = FakeCaches()
+
+    def make():
+        arch = object.__new__(AutonomousArchitect)
+        arch.book_path, arch.book_id, arch.model_name = str(book), "book", "model"
+        arch.cache_registry = registry
+        arch.client = types.SimpleNamespace(caches=caches)
+        arch.cache, arch.chat, arch.cache_identity, arch.cache_expires_at = None, None, None, 0.0
+        return arch
+    return make, caches
+
+
+def test_second_session_reuses_the_uploaded_book(make_architect):
+    make, caches = make_architect
+    first = make()._setup_context_cache("instruction")
+    second = make()._setup_context_cache("instruction")
+    assert caches.created == 1 and second.name == first.name
+    make()._setup_context_cache("another instruction")
+    assert caches.created == 2
+
+
+def test_cache_gone_on_the_server_is_uploaded_again(make_architect):
+    make, caches = make_architect
+    make()._setup_context_cache("instruction")
+    caches.live.clear()
+    arch = make()
+    cache = arch._setup_context_cache("instruction")
+    assert caches.created == 2 and cache.name == "cachedContents/2"
+    assert arch.cache_registry.get(arch.cache_identity)["name"] == "cachedContents/2"
+
+
+def test_live_cache_is_extended_before_it_expires(make_architect):
+    make, caches = make_architect
+    arch = make()
+    arch.cache = arch._setup_context_cache("instruction")
+    arch.chat = object()
+    arch.cache_expires_at = time.time() + 60  # inside the refresh margin
+    arch._refresh_context_cache()
+    assert arch.cache_expires_at > time.time() + 3000 and arch.chat is not None
+
+    caches.live.clear()
+    arch.cache_expires_at = time.time() + 60
+    arch._refresh_context_cache()
+    assert arch.cache is None and arch.chat is None
+    assert arch.cache_registry.get(arch.cache_identity) is None
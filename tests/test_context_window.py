@@ -0,0 +1,70 @@
+from context_window import InkContextBuilder
+
+HEADER = "VAR sanity = 50\nVAR has_key = false"
+
+
+def scene(i, words=40):
+    return (f"=== scene_{i}\nScene {i} opens here. " + "filler " * words +
+            f"\n* [Go] -> scene_{i}_result_0\n\n=== scene_{i}_result_0\nResult {i}.\n-> scene_{i + 1}")
+
+
+def script(n, words=40):
+    return HEADER + "\n\n" + "\n\n".join(scene(i, words) for i in range(n))
+
+
+def counter(calls):
+    def count(text):
+        calls.append(text)
+        return len(text) // 4 + 1
+    return count
+
+
+def test_split_groups_result_knots_with_their_scene():
+    header, blocks = InkContextBuilder(len).split(script(3))
+    assert header == HEADER
+    assert [name for name, _ in blocks] == ["scene_0", "scene_1", "scene_2"]
+    assert "=== scene_1_result_0" in blocks[1][1]
+
+
+def test_large_budget_keeps_recent_scenes_and_summarizes_older():
+    builder = InkContextBuilder(counter([]), budget_tokens=100000, recent_knots=2)
+    context = builder.build(script(5))
+    assert context.startswith(HEADER)
+    assert "=== scene_4" in context and "=== scene_3" in context
+    assert "=== scene_2" not in context
+    assert "// scene_0: Scene 0 opens here." in context
+    assert context.index("// scene_0") < context.index("// scene_2") < context.index("=== scene_3")
+
+
+def test_small_budget_omits_the_oldest_scenes():
+    builder = InkContextBuilder(counter([]), budget_tokens=120, recent_knots=3)
+    context = builder.build(script(30, words=5))
+    assert "=== scene_29" in context
+    assert "earlier scenes omitted)" in context
+    assert "// scene_0:" not in context
+    assert len(context) // 4 < 200
+
+
+def test_newest_scene_is_kept_even_over_budget():
+    builder = InkContextBuilder(counter([]), budget_tokens=10)
+    context = builder.build(script(2, words=500))
+    assert "=== scene_1" in context and "(1 earlier scene omitted)" in context
+
+
+def test_counts_are_memoized():
+    calls = []
+    builder = InkContextBuilder(counter(calls), budget_tokens=100000)
+    builder.build(script(4))
+    first = len(calls)
+    builder.build(script(5))
+    assert len(calls) == first + 1  # only the new scene is measured
+
+
+def test_failed_counter_falls_back_to_estimate():
+    def broken(text):
+        raise RuntimeError("quota")
+    assert InkContextBuilder(broken).tokens("x" * 40) == 11
+
+
+def test_script_without_knots_is_returned_as_is():
+    assert InkContextBuilder(len).build(HEADER) == HEADER
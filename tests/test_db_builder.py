@@ -0,0 +1,98 @@
+import sqlite3
+import pytest
+import db_builder
+
+GUTINDEX = """GUTINDEX.ALL
+~ ~ ~ ~ Posting Dates for the below eBooks:  1 Jan 2024 to 31 Dec 2024 ~ ~ ~ ~
+
+TITLE and AUTHOR                                                     EBOOK NO.
+
+Faust: Der Tragödie erster Teil, by Johann Wolfgang                     72003
+ von Goethe
+ [Language: German]
+
+The Adventures of Sherlock Holmes, by Arthur Conan Doyle                 1661
+ [Subtitle: A collection of twelve stories
+  from the Strand Magazine]
+
+Anonymous Pamphlet                                                         42
+"""
+
+
+def write_index(path, text):
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_iter_entries_joins_wrapped_lines_and_metadata(tmp_path):
+    entries = list(db_builder.iter_entries(write_index(tmp_path / "GUTINDEX.ALL", GUTINDEX)))
+    assert entries == [
+        (72003, "Faust: Der Tragödie erster Teil [Language: German]", "Johann Wolfgang von Goethe", "German"),
+        (1661, "The Adventures of Sherlock Holmes [Subtitle: A collection of twelve stories from the Strand Magazine]",
+         "Arthur Conan Doyle", "English"),
+        (42, "Anonymous Pamphlet", "Unknown", "English"),
+    ]
+
+
+@pytest.mark.parametrize("tags, language", [
+    ([], "English"),
+    (["[Subtitle: x]"], "English"),
+    (["[language: old english]"], "Old English"),
+])
+def test_normalize_language(tags, language):
+    assert db_builder.normalize_language(tags) == language
+
+
+@pytest.fixture
+def build(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(db_builder, "INPUT_FILE", write_index(tmp_path / "GUTINDEX.ALL", GUTINDEX))
+    monkeypatch.setattr(db_builder, "DB_NAME", str(tmp_path / "index.db"))
+    return tmp_path
+
+
+def search(query):
+    with sqlite3.connect(db_builder.DB_NAME) as conn:
+        return [row[0] for row in conn.execute(
+            "SELECT rowid FROM books_fts WHERE books_fts MATCH ? ORDER BY bm25(books_fts)", (query,))]
+
+
+def test_build_indexes_titles_and_authors(build):
+    db_builder.build_database()
+    assert search("goethe") == [72003]
+    assert search("tragodie") == [72003]  # diacritics removed
+    assert search("sher*") == [1661]
+    with sqlite3.connect(db_builder.DB_NAME) as conn:
+        assert conn.execute("SELECT value FROM build_info WHERE key = 'max_book_id'").fetchone() == ("72003",)
+        assert conn.execute("SELECT language FROM titles WHERE book_id = 72003").fetchone() == ("German",)
+
+
+def test_incremental_build_adds_only_newer_entries(build):
+    db_builder.build_database()
+    newer = "Moby Dick, by Herman Melville                                         72004\n\n"
+    write_index(build / "GUTINDEX.ALL", newer + GUTINDEX.replace("Anonymous Pamphlet", "Renamed Pamphlet"))
+    db_builder.build_database(incremental=True)
+    assert search("melville") == [72004]
+    assert search("anonymous") == [42]  # older entries are not rewritten
+    with sqlite3.connect(db_builder.DB_NAME) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM books_fts").fetchone() == (4,)
+
+
+def test_dashboard_search_ranks_prefixes_and_tolerates_typos(build):
+    from utils import DashboardUtils
+    db_builder.build_database()
+    with sqlite3.connect(db_builder.DB_NAME) as conn:
+        c = conn.cursor()
+        rows = lambda *args: [r[0] for r in DashboardUtils._search_gutenberg_fts(c, *args)]
+        assert rows("adventures sher", "title", "") == [1661]
+        assert rows("faust", "title", "German") == [72003]
+        assert rows("faust", "title", "English") == []
+        assert rows("doyle", "author", "") == [1661]
+        assert rows("sherlok", "title", "") == [1661]  # close spelling from the vocabulary
+        assert rows("sherlock", "author", "") == []
+
+
+def test_missing_input_is_reported(build, monkeypatch, capsys):
+    monkeypatch.setattr(db_builder, "INPUT_FILE", "nope.txt")
+    db_builder.build_database()
+    assert "not found" in capsys.readouterr().out
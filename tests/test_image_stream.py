@@ -0,0 +1,43 @@
+import os
+import json
+import base64
+import pytest
+from image_stream import ImageStreamDecoder
+
+IMAGES = [os.urandom(5000), os.urandom(1), os.urandom(4099)]
+
+
+def response(escape_slashes=False, data_uri=False):
+    encoded = [base64.b64encode(img).decode() for img in IMAGES]
+    if data_uri:
+        encoded = ["data:image/png;base64," + e for e in encoded]
+    body = json.dumps({"parameters": {"prompt": "a \"quoted\" [prompt]", "images": ["no"]},
+                       "images": encoded, "info": "{\"seed\": 1}"})
+    if escape_slashes:
+        body = body.replace("/", "\\/")
+    return body.encode()
+
+
+def decode(data, size, paths):
+    decoder = ImageStreamDecoder(paths)
+    for i in range(0, len(data), size):
+        decoder.feed(data[i:i + size])
+    return decoder.close()
+
+
+@pytest.mark.parametrize("size", [1, 3, 4, 5, 1000, 1 << 20])
+@pytest.mark.parametrize("variant", [{}, {"escape_slashes": True}, {"data_uri": True}])
+def test_split_chunks_decode_to_the_same_files(tmp_path, size, variant):
+    paths = [str(tmp_path / f"img_{i}.png") for i in range(len(IMAGES))]
+    written = decode(response(**variant), size, paths)
+    assert written == paths
+    for path, img in zip(paths, IMAGES):
+        with open(path, "rb") as f:
+            assert f.read() == img
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(p) for p in paths)
+
+
+def test_images_beyond_the_given_paths_are_skipped(tmp_path):
+    paths = [str(tmp_path / "only.png")]
+    assert decode(response(), 512, paths) == paths
+    assert os.listdir(tmp_path) == ["only.png"]
@@ -0,0 +1,107 @@
+import os
+import json
+import shutil
+import subprocess
+import pytest
+from ink_document import InkDocument
+from ink_compiler import InkCompiler, InkCompileError, UnsupportedInkSyntax
+
+INK_JS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "player", "ink.js")
+
+SCRIPT = """VAR sanity = 50
+VAR last_node = "intro"
+VAR protagonist_name = "Alice"
+-> intro
+== intro ==
+The hall is dark. # IMAGE: intro_main.png
+* [Light a candle] -> intro_result_1
+* [Wait] -> intro_result_2
+== intro_result_1 ==
+~ sanity = sanity + 5
+The flame steadies you.
+-> cave
+== intro_result_2 ==
+~ sanity = sanity - 10
+-> cave
+== cave ==
+A cave. # IMAGE: cave_main.png
+-> END
+"""
+
+# Plays a compiled story with ink.js: picks choices in order, prints text, tags and variables
+PLAY_JS = """
+const inkjs = require(process.argv[1]);
+const story = new inkjs.Story(require('fs').readFileSync(0, 'utf8'));
+const picks = JSON.parse(process.argv[2]);
+const out = {text: [], tags: [], choices: []};
+for (;;) {
+  while (story.canContinue) { out.text.push(story.Continue()); out.tags.push(...story.currentTags); }
+  if (!story.currentChoices.length) break;
+  out.choices.push(story.currentChoices.map(c => c.text));
+  story.ChooseChoiceIndex(picks.shift() || 0);
+}
+out.sanity = story.variablesState['sanity'];
+out.name = story.variablesState['protagonist_name'];
+console.log(JSON.stringify(out));
+"""
+
+
+def compile_script(text=SCRIPT, **kwargs):
+    return InkCompiler().compile(InkDocument.parse(text), **kwargs)
+
+
+def test_layout_matches_inklecate():
+    text, warnings = compile_script()
+    story = json.loads(text)
+    assert warnings == []
+    assert story["inkVersion"] == 21
+    named = story["root"][-1]
+    assert set(named) == {"intro", "intro_result_1", "intro_result_2", "cave", "global decl"}
+    # Knot containers end with inklecate's count flags, choice containers with theirs
+    assert named["cave"][-1] == {"#f": 1}
+    assert named["intro"][0][-1]["c-0"][-1] == {"#f": 5}
+
+
+def test_unknown_divert_is_an_error_unless_lenient():
+    script = SCRIPT.replace("-> cave\n== cave", "-> cellar\n== cave")
+    with pytest.raises(InkCompileError) as err:
+        compile_script(script)
+    assert "-> cellar" in str(err.value)
+    _, warnings = compile_script(script, strict=False)
+    assert any("cellar" in w for w in warnings)
+
+
+def test_undeclared_variable_is_an_error():
+    with pytest.raises(InkCompileError):
+        compile_script(SCRIPT.replace("~ sanity = sanity + 5", "~ luck = luck + 5"))
+
+
+def test_unsupported_syntax_is_reported():
+    with pytest.raises(UnsupportedInkSyntax):
+        compile_script(SCRIPT.replace("A cave.", "A {dark|damp} cave."))
+
+
+def test_unchanged_knots_are_reused():
+    compiler = InkCompiler()
+    doc = InkDocument.parse(SCRIPT)
+    compiler.compile(doc)
+    cached = compiler._knots["intro"]
+    doc.append_text("== cave ==\nAnother cave.\n-> END\n")
+    compiler.compile(doc)
+    assert compiler._knots["intro"] is cached
+    assert compiler._knots["cave"].source[1] == "Another cave."
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+@pytest.mark.parametrize("pick, sanity", [(0, 55), (1, 40)])
+def test_ink_js_plays_compiled_story(pick, sanity):
+    text, _ = compile_script()
+    run = subprocess.run(["node", "-e", PLAY_JS, INK_JS, json.dumps([pick])],
+                         input=text, capture_output=True, text=True, timeout=60)
+    assert run.returncode == 0, run.stderr
+    out = json.loads(run.stdout.splitlines()[-1])
+    assert out["choices"] == [["Light a candle", "Wait"]]
+    assert out["text"][0] == "The hall is dark.\n"
+    assert out["tags"] == ["IMAGE: intro_main.png", "IMAGE: cave_main.png"]
+    assert out["sanity"] == sanity
+    assert out["name"] == "Alice"
@@ -0,0 +1,51 @@
+from ink_document import InkDocument
+
+SCRIPT = """VAR last_node = "intro"
+-> intro
+== intro ==
+The introduction of intro.
+* [Go] -> intro_result_1
+* [Look] -> scene_intro
+-> intro_next
+== intro_result_1 ==
+-> intro_next
+== intro_next ==
+-> END
+== scene_intro ==
+-> introduction
+"""
+
+
+def test_round_trip_keeps_text():
+    assert InkDocument.parse(SCRIPT).to_text() == SCRIPT
+
+
+def test_knots_are_indexed_in_order():
+    doc = InkDocument.parse(SCRIPT)
+    assert list(doc.knots) == ["intro", "intro_result_1", "intro_next", "scene_intro"]
+    assert doc.header == ['VAR last_node = "intro"', "-> intro"]
+
+
+def test_append_replaces_existing_knot_and_moves_it_last():
+    doc = InkDocument.parse(SCRIPT)
+    doc.append_text("== intro_next ==\nNew text\n-> END\n")
+    assert list(doc.knots)[-1] == "intro_next"
+    assert doc.knots["intro_next"][1] == "New text"
+
+
+def test_rename_target_moves_derived_knots_and_diverts():
+    doc = InkDocument.parse(SCRIPT)
+    doc.rename_target("intro", "gate")
+    text = doc.to_text()
+    assert list(doc.knots) == ["gate", "gate_result_1", "gate_next", "scene_intro"]
+    assert "-> gate\n" in text and "-> gate_result_1" in text and "-> gate_next" in text
+    # Prose and identifiers that merely contain the old name are left alone
+    assert "The introduction of intro." in text
+    assert "-> scene_intro" in text and "-> introduction" in text
+
+
+def test_save_and_load(tmp_path):
+    path = tmp_path / "adventure.ink"
+    InkDocument.parse(SCRIPT).save(str(path))
+    assert InkDocument.load(str(path)).to_text() == SCRIPT
+    assert not [p for p in tmp_path.iterdir() if p.name != "adventure.ink"]
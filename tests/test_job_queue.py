@@ -0,0 +1,181 @@
+import os
+import time
+import sqlite3
+import subprocess
+import sys
+import threading
+import pytest
+import job_queue
+from job_queue import JobQueue, QUEUED, RUNNING, DONE, FAILED, CANCELLED
+
+GATE = threading.Event()
+
+
+def echo(params, report):
+    report(50, "halfway")
+    return {"echo": params["value"]}
+
+
+def explode(params, report):
+    raise ValueError("bad params")
+
+
+def wait_for_gate(params, report):
+    GATE.wait(10)
+    return "released"
+
+
+def wait_done(queue, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job["status"] not in (QUEUED, RUNNING):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+@pytest.fixture
+def queue(tmp_path):
+    q = JobQueue(str(tmp_path / "jobs.db"), max_threads=1)
+    yield q
+    GATE.set()
+    q.shutdown(wait=True)
+
+
+def test_thread_job_records_result(queue):
+    job = wait_done(queue, queue.submit("test_job_queue:echo", {"value": "ü"}))
+    assert job["status"] == DONE and job["progress"] == 100
+    assert job["result"] == {"echo": "ü"} and job["params"] == {"value": "ü"}
+    assert job["worker_pid"] == os.getpid()
+
+
+def test_failed_job_records_error(queue):
+    job = wait_done(queue, queue.submit("test_job_queue:explode"))
+    assert job["status"] == FAILED and job["error"] == "ValueError: bad params"
+
+
+def test_key_deduplicates_active_jobs_and_queued_jobs_cancel(queue):
+    GATE.clear()
+    running = queue.submit("test_job_queue:wait_for_gate", key="render:a")
+    while queue.get(running)["status"] == QUEUED:
+        time.sleep(0.01)
+    assert queue.submit("test_job_queue:wait_for_gate", key="render:a") == running
+    waiting = queue.submit("test_job_queue:echo", {"value": 1}, key="render:b")
+    assert queue.cancel(waiting)
+    assert not queue.cancel(running)  # already started
+    GATE.set()
+    assert wait_done(queue, running)["result"] == "released"
+    assert queue.get(waiting)["status"] == CANCELLED
+    # Once finished, the key can be submitted again
+    assert queue.submit("test_job_queue:echo", {"value": 2}, key="render:a") != running
+    assert queue.find("render:a")["params"] == {"value": 2}
+
+
+def test_unknown_executor_is_rejected(queue):
+    with pytest.raises(ValueError):
+        queue.submit("test_job_queue:echo", executor="gpu")
+
+
+def _dead_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def test_restart_recovers_orphaned_jobs(tmp_path):
+    db = str(tmp_path / "jobs.db")
+    JobQueue(db).shutdown()
+    live = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    rows = {
+        "dead_owner": (_dead_pid(), "old-token"),
+        "recycled_pid": (os.getpid(), "old-token"),
+        "live_foreign": (live.pid, "other-token"),
+        "this_session": (os.getpid(), job_queue.SESSION_TOKEN),
+    }
+    try:
+        with sqlite3.connect(db) as conn:
+            for job_id, (pid, token) in rows.items():
+                conn.execute("""INSERT INTO jobs (id, target, params, executor, status, progress,
+                                                  owner_pid, owner_token, created_at)
+                                VALUES (?, 'x:y', '{}', 'thread', ?, 0, ?, ?, ?)""",
+                             (job_id, RUNNING, pid, token, time.time()))
+        queue = JobQueue(db)
+        status = {job_id: queue.get(job_id)["status"] for job_id in rows}
+        queue.shutdown()
+    finally:
+        live.kill()
+        live.wait()
+    assert status == {"dead_owner": FAILED, "recycled_pid": FAILED,
+                      "live_foreign": RUNNING, "this_session": RUNNING}
+
+
+def test_old_finished_jobs_are_pruned(tmp_path):
+    db = str(tmp_path / "jobs.db")
+    JobQueue(db).shutdown()
+    old = time.time() - job_queue.KEEP_FINISHED_SECONDS - 1
+    with sqlite3.connect(db) as conn:
+        conn.execute("INSERT INTO jobs (id, status, created_at, finished_at) VALUES ('old', ?, ?, ?)", (DONE, old, old))
+        conn.execute("INSERT INTO jobs (id, status, created_at, finished_at) VALUES ('new', ?, ?, ?)",
+                     (DONE, time.time(), time.time()))
+    queue = JobQueue(db)
+    assert queue.get("old") is None and queue.get("new") is not None
+
+
+def test_connections_are_closed(queue, monkeypatch):
+    opened = []
+    real_connect = sqlite3.connect
+    monkeypatch.setattr(job_queue.sqlite3, "connect", lambda *a, **k: opened.append(real_connect(*a, **k)) or opened[-1])
+    wait_done(queue, queue.submit("test_job_queue:echo", {"value": 1}))
+    queue.jobs()
+    assert opened
+    for conn in opened:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    from utils import DashboardUtils
+    monkeypatch.setattr(DashboardUtils, "update_game_manifest", staticmethod(lambda project_dir=None: None))
+    monkeypatch.setattr(DashboardUtils, "derive_project_assets", staticmethod(lambda project_dir: None))
+    monkeypatch.setattr(DashboardUtils, "load_config", staticmethod(lambda: {"book_id": "b1"}))
+    folder = tmp_path / "project"
+    folder.mkdir()
+    return folder
+
+
+def test_compile_job_reports_success_and_failure(queue, project):
+    (project / "adventure.ink").write_text("-> intro\n== intro ==\nHello.\n-> END\n", encoding="utf-8")
+    job = wait_done(queue, queue.submit("generation_jobs:compile_ink", {"project_path": str(project)}))
+    assert job["status"] == DONE and job["result"]["success"]
+    assert os.path.exists(job["result"]["json_path"])
+
+    (project / "adventure.ink").write_text("-> nowhere\n", encoding="utf-8")
+    job = wait_done(queue, queue.submit("generation_jobs:compile_ink", {"project_path": str(project)}))
+    assert job["status"] == DONE and not job["result"]["success"]
+    assert "Compilation Failed" in job["result"]["message"]
+
+
+def test_story_pack_job_writes_the_pack(queue, project, monkeypatch):
+    import architect
+    from utils import DashboardUtils
+
+    class FakeArchitect:
+        def __init__(self, book_path):
+            pass
+
+        def generate_story_pack(self, protagonist_name=None, scene_count=12):
+            if protagonist_name == "nobody":
+                return None
+            return {"meta": {"failed_scenes": ["s2"]}, "scenes": [{"scene_id": "s1", "choices": []}]}
+
+    monkeypatch.setattr(architect, "AutonomousArchitect", FakeArchitect)
+    params = {"book_path": "book.txt", "pack_path": str(project / "story_pack.json"), "scene_count": 2}
+    job = wait_done(queue, queue.submit("generation_jobs:generate_story_pack", params))
+    assert job["status"] == DONE and job["result"]["failed_scenes"] == ["s2"]
+    pack = DashboardUtils.load_story_pack_file(job["result"]["pack_path"])
+    assert pack["scenes"][0]["scene_id"] == "s1" and pack["progress"]["next_index"] == 0
+
+    job = wait_done(queue, queue.submit("generation_jobs:generate_story_pack", {**params, "protagonist_name": "nobody"}))
+    assert job["status"] == FAILED and "Story pack generation failed" in job["error"]
@@ -0,0 +1,48 @@
+import json
+import pytest
+from json_stream import JsonObjectStream
+
+PACK = {
+    "meta": {"protagonist": "Alice {the brave}", "target_scene_count": 3},
+    "scenes": [
+        {"scene_id": "s1", "scene_text": "A \"quoted\" } brace", "choices": [{"text": "[go]"}]},
+        {"scene_id": "s2", "scene_text": "Back\\slash and ünïcode", "choices": []},
+        {"scene_id": "s3", "scene_text": "{\"nested\": [1, 2]}", "choices": []},
+    ],
+}
+TEXT = "```json\n" + json.dumps(PACK, ensure_ascii=False, indent=2) + "\n```"
+
+
+def collect(chunks):
+    stream = JsonObjectStream(array_keys=("scenes",), object_keys=("meta",))
+    found = []
+    for chunk in chunks:
+        found.extend(stream.feed(chunk))
+    return stream, found
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, len(TEXT)])
+def test_every_split_yields_the_same_objects(size):
+    stream, found = collect(TEXT[i:i + size] for i in range(0, len(TEXT), size))
+    assert found == [("meta", PACK["meta"])] + [("scenes", s) for s in PACK["scenes"]]
+    assert stream.finished
+
+
+def test_split_inside_escape_sequences():
+    # Cut right after every backslash so escapes straddle two chunks
+    cuts = [i + 1 for i, ch in enumerate(TEXT) if ch == "\\"]
+    chunks = [TEXT[a:b] for a, b in zip([0] + cuts, cuts + [len(TEXT)])]
+    _, found = collect(chunks)
+    assert [obj["scene_id"] for key, obj in found if key == "scenes"] == ["s1", "s2", "s3"]
+
+
+def test_objects_are_emitted_as_soon_as_they_close():
+    first_end = TEXT.index('"s2"')
+    stream, found = collect([TEXT[:first_end]])
+    assert [key for key, _ in found] == ["meta", "scenes"]
+    assert not stream.finished
+
+
+def test_text_after_the_top_level_object_is_ignored():
+    _, found = collect([json.dumps({"scenes": [{"a": 1}]}) + ' trailing {"scenes": [{"b": 2}]}'])
+    assert found == [("scenes", {"a": 1})]
@@ -0,0 +1,85 @@
+import os
+import types
+import pytest
+from architect import AutonomousArchitect
+from llm_cache import LLMResponseCache, LLMCacheMiss
+
+
+@pytest.fixture(autouse=True)
+def clean_env(monkeypatch):
+    monkeypatch.delenv("LLM_CACHE_PATH", raising=False)
+    monkeypatch.delenv("LLM_CACHE_MODE", raising=False)
+
+
+def test_record_then_replay(tmp_path):
+    path = str(tmp_path / "llm.db")
+    LLMResponseCache(path, "record").store("gemini", "book:1", "scene", "prompt", "response")
+    replay = LLMResponseCache(path, "replay")
+    assert replay.offline and replay.strict
+    assert replay.lookup("gemini", "book:1", "scene", "prompt") == "response"
+    # Any part of the key changing is a miss
+    assert replay.lookup("gemini", "book:1", "beat", "prompt") is None
+    assert replay.lookup("gemini", "book:2", "scene", "prompt") is None
+    assert replay.lookup("other", "book:1", "scene", "prompt") is None
+
+
+def test_record_overwrites_and_only_replay_reads(tmp_path):
+    path = str(tmp_path / "llm.db")
+    record = LLMResponseCache(path, "record")
+    record.store("m", "c", "k", "p", "old")
+    record.store("m", "c", "k", "p", "new")
+    assert record.lookup("m", "c", "k", "p") is None
+    assert LLMResponseCache(path, "replay").lookup("m", "c", "k", "p") == "new"
+    record.clear()
+    assert LLMResponseCache(path, "replay").lookup("m", "c", "k", "p") is None
+
+
+def test_passthrough_never_touches_disk(tmp_path):
+    path = str(tmp_path / "llm.db")
+    cache = LLMResponseCache(path)
+    assert cache.mode == "passthrough" and not cache.offline
+    cache.store("m", "c", "k", "p", "response")
+    assert not os.path.exists(path)
+
+
+def test_mode_from_environment(tmp_path, monkeypatch):
+    monkeypatch.setenv("LLM_CACHE_MODE", " Replay ")
+    monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "env.db"))
+    cache = LLMResponseCache(str(tmp_path / "ignored.db"))
+    assert cache.mode == "replay" and cache.path == str(tmp_path / "env.db")
+    monkeypatch.setenv("LLM_CACHE_MODE", "bogus")
+    assert LLMResponseCache(str(tmp_path / "x.db")).mode == "passthrough"
+
+
+def make_architect(cache):
+    """An Architect with a key and a live chat, so only the cache mode decides whether it goes live."""
+    arch = object.__new__(AutonomousArchitect)
+    arch.llm_cache = cache
+    arch.model_name, arch.cache_identity = "m", "book"
+    arch.client = object()
+    arch.sent = []
+    arch.chat = types.SimpleNamespace(
+        send_message=lambda prompt: arch.sent.append(prompt) or types.SimpleNamespace(text="live"))
+    arch._refresh_context_cache = lambda: None
+    return arch
+
+
+def test_replay_miss_never_goes_live(tmp_path):
+    path = str(tmp_path / "llm.db")
+    LLMResponseCache(path, "record").store("m", "book", "reset", "known", "recorded")
+    arch = make_architect(LLMResponseCache(path, "replay"))
+    assert arch._send_text("known", "reset") == "recorded"
+    with pytest.raises(LLMCacheMiss):
+        arch._send_text("unknown", "reset")
+    assert arch.sent == []
+
+
+def test_replay_or_record_fills_the_gaps(tmp_path):
+    path = str(tmp_path / "llm.db")
+    cache = LLMResponseCache(path, "replay_or_record")
+    assert cache.offline and not cache.strict
+    arch = make_architect(cache)
+    assert arch._send_text("unknown", "reset") == "live"
+    assert arch._send_text("unknown", "reset") == "live"
+    assert arch.sent == ["unknown"]  # the second call was replayed
+    assert LLMResponseCache(path, "replay").lookup("m", "book", "reset", "unknown") == "live"
@@ -0,0 +1,61 @@
+import pytest
+from google.genai import types
+import llm_schemas
+
+TRAITS = ["courage", "wit"]
+
+
+def scene(**overrides):
+    data = {
+        "scene_id": "the_gate",
+        "scene_text": "A gate.",
+        "visual_prompt": "an iron gate",
+        "choices": [
+            {"text": "Open it", "type": "golden", "outcome_text": "It opens.", "trait_changes": {"courage": 5}},
+            {"text": "Climb", "type": "exquisite", "outcome_text": "You climb.", "reward_visual_prompt": "a view"},
+            {"text": "Wait", "type": "bad", "outcome_text": "Nothing happens."},
+        ],
+    }
+    data.update(overrides)
+    return data
+
+
+@pytest.mark.parametrize("kind", sorted(llm_schemas.build_schemas(TRAITS)))
+def test_schemas_are_valid_gemini_response_schemas(kind):
+    types.Schema.model_validate(llm_schemas.build_schemas(TRAITS)[kind])
+
+
+def test_valid_scene_passes():
+    assert llm_schemas.validate(scene(), llm_schemas.scene_schema(TRAITS)) == []
+
+
+def test_scene_errors_name_the_offending_path():
+    data = scene(choices=[{"text": "Go", "type": "sideways", "outcome_text": 3, "trait_changes": {"wit": 50}}])
+    del data["visual_prompt"]
+    errors = llm_schemas.validate(data, llm_schemas.scene_schema(TRAITS))
+    assert "$.visual_prompt: required" in errors
+    assert any(e.startswith("$.choices[0].type:") and "sideways" in e for e in errors)
+    assert "$.choices[0].outcome_text: expected string, got int" in errors
+    assert f"$.choices[0].trait_changes.wit: 50 > {llm_schemas.TRAIT_DELTA_LIMIT}" in errors
+
+
+def test_conclusion_needs_no_scene_id_and_caps_choices():
+    schema = llm_schemas.build_schemas(TRAITS)["conclusion"]
+    data = scene()
+    del data["scene_id"]
+    assert llm_schemas.validate(data, schema) == []
+    data["choices"] = data["choices"] * 2
+    assert llm_schemas.validate(data, schema) == ["$.choices: more than 3 items"]
+
+
+def test_booleans_are_not_integers_and_unknown_keys_pass():
+    schema = llm_schemas.trait_changes_schema(TRAITS)
+    assert llm_schemas.validate({"courage": True, "luck": "x"}, schema) == [
+        "$.courage: expected integer, got bool"]
+
+
+def test_story_pack_needs_at_least_one_scene_and_streams_meta_first():
+    schema = llm_schemas.story_pack_schema(TRAITS)
+    assert schema["property_ordering"][0] == "meta"
+    assert llm_schemas.validate({"meta": {}, "scenes": []}, schema) == ["$.scenes: fewer than 1 items"]
+    assert llm_schemas.validate({"meta": {"target_scene_count": 1}, "scenes": [scene()]}, schema) == []
@@ -0,0 +1,64 @@
+import os
+import json
+from manifest_service import ManifestService
+
+HEADER = 'VAR language = "German"\nVAR protagonist_name = "Faust"\n\n=== intro\nVAR language = "French"\n'
+
+
+def make_project(root, project_id, ink=HEADER):
+    folder = root / project_id
+    folder.mkdir(parents=True, exist_ok=True)
+    (folder / "adventure.json").write_text("{}")
+    if ink is not None:
+        (folder / "adventure.ink").write_text(ink, encoding="utf-8")
+    return folder
+
+
+def manifest(service):
+    with open(service.manifest_path, encoding="utf-8") as f:
+        return {p["id"]: p for p in json.load(f)}
+
+
+def test_update_project_reads_only_the_header(tmp_path):
+    service = ManifestService(str(tmp_path))
+    make_project(tmp_path, "faust_one")
+    assert service.update_project("faust_one") == 1
+    assert manifest(service)["faust_one"] == {"id": "faust_one", "title": "Faust One",
+                                              "protagonist": "Faust", "language": "German"}
+
+
+def test_projects_without_a_compiled_story_are_left_out(tmp_path):
+    service = ManifestService(str(tmp_path))
+    (tmp_path / "draft").mkdir()
+    make_project(tmp_path, "plain", ink=None)
+    assert service.verify() == 1
+    assert manifest(service)["plain"]["protagonist"] == "Unknown"
+
+
+def test_verify_rereads_changed_projects_and_drops_deleted_ones(tmp_path):
+    service = ManifestService(str(tmp_path))
+    folder = make_project(tmp_path, "a")
+    make_project(tmp_path, "b")
+    assert service.verify() == 2
+    written = os.stat(service.manifest_path).st_mtime_ns
+
+    assert service.verify() == 2  # nothing changed: the manifest is not rewritten
+    assert os.stat(service.manifest_path).st_mtime_ns == written
+
+    ink = folder / "adventure.ink"
+    ink.write_text(HEADER.replace("Faust", "Gretchen"), encoding="utf-8")
+    os.utime(ink, ns=(written + 10**9, written + 10**9))
+    (tmp_path / "b" / "adventure.json").unlink()
+    assert service.verify() == 1
+    assert manifest(service)["a"]["protagonist"] == "Gretchen"
+
+
+def test_remove_and_rebuild(tmp_path):
+    service = ManifestService(str(tmp_path))
+    make_project(tmp_path, "a")
+    make_project(tmp_path, "b")
+    service.verify()
+    assert service.remove_project("a") == 1
+    os.remove(service.state_path)
+    assert service.rebuild() == 2
+    assert set(manifest(service)) == {"a", "b"}
@@ -0,0 +1,82 @@
+import os
+import json
+import time
+import shutil
+import pytest
+import project_index
+from project_index import ProjectIndex
+
+
+def make_project(output_dir, project_id, book_id="pg11", scenes=2, images=1, audio=0):
+    folder = os.path.join(output_dir, project_id)
+    os.makedirs(os.path.join(folder, "assets"), exist_ok=True)
+    os.makedirs(os.path.join(folder, "audio"), exist_ok=True)
+    with open(os.path.join(folder, "book_config.json"), "w", encoding="utf-8") as f:
+        json.dump({"book_id": book_id, "title": project_id.title()}, f)
+    with open(os.path.join(folder, "adventure.ink"), "w", encoding="utf-8") as f:
+        f.write("-> s1\n" + "".join(f"== s{i} ==\nText\n-> END\n" for i in range(1, scenes + 1)))
+    for i in range(images):
+        open(os.path.join(folder, "assets", f"s{i}_main.png"), "wb").close()
+    for i in range(audio):
+        open(os.path.join(folder, "audio", f"s{i}.mp3"), "wb").close()
+    return folder
+
+
+@pytest.fixture
+def index(tmp_path):
+    output = tmp_path / "output"
+    output.mkdir()
+    idx = ProjectIndex(str(output), str(tmp_path / "index.db"))
+    yield idx
+    idx.stop()
+
+
+def test_sync_indexes_projects_by_book(index):
+    make_project(index.output_dir, "alice", scenes=3, images=2, audio=1)
+    make_project(index.output_dir, "holmes", book_id="pg1661")
+    os.makedirs(os.path.join(index.output_dir, ".trash"))
+    assert index.sync() == 2
+    [alice] = index.projects_for_book("pg11")
+    assert (alice["id"], alice["title"], alice["scene_count"], alice["image_count"], alice["audio_count"]) == \
+        ("alice", "Alice", 3, 2, 1)
+    assert alice["path"] == os.path.join(index.output_dir, "alice") and alice["last_compiled"] is None
+    assert index.asset_counts(alice["path"]) == (2, 1)
+
+
+def test_refresh_rereads_only_what_changed(index, monkeypatch):
+    folder = make_project(index.output_dir, "alice")
+    assert index.refresh("alice") is True
+    assert index.refresh(folder) is False  # nothing changed: only stats
+
+    counted = []
+    real = ProjectIndex._count_scenes
+    monkeypatch.setattr(ProjectIndex, "_count_scenes", staticmethod(lambda p: counted.append(p) or real(p)))
+    open(os.path.join(folder, "assets", "new.png"), "wb").close()
+    os.utime(os.path.join(folder, "assets"), ns=(10 ** 18, 10 ** 18))
+    assert index.refresh("alice") is True
+    assert counted == []  # the script was not re-read
+    assert index.asset_counts(folder) == (2, 0)
+
+
+def test_removed_projects_leave_the_index(index):
+    make_project(index.output_dir, "alice")
+    make_project(index.output_dir, "bob")
+    index.sync()
+    shutil.rmtree(os.path.join(index.output_dir, "bob"))
+    assert index.sync() == 1
+    assert [p["id"] for p in index.projects_for_book("pg11")] == ["alice"]
+    shutil.rmtree(os.path.join(index.output_dir, "alice"))
+    assert index.refresh("alice") is None
+    assert index.asset_counts("alice") == (0, 0)
+
+
+@pytest.mark.skipif(project_index.Observer is None, reason="watchdog is not installed")
+def test_watcher_picks_up_new_files(index, monkeypatch):
+    monkeypatch.setattr(project_index, "DEBOUNCE_SECONDS", 0.05)
+    folder = make_project(index.output_dir, "alice", images=0)
+    assert index.watch()
+    open(os.path.join(folder, "assets", "late.png"), "wb").close()
+    deadline = time.time() + 10
+    while index.asset_counts(folder) != (1, 0):
+        assert time.time() < deadline, "watcher did not refresh the project"
+        time.sleep(0.05)
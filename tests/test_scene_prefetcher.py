@@ -0,0 +1,138 @@
+import os
+import sys
+import types
+import threading
+import pytest
+from scene_prefetcher import ScenePrefetcher, ROOT_DIR
+
+GATE = threading.Event()
+
+
+class FakeWeaver:
+    """Stands in for VisualWeaver: writes one PNG per candidate into output_dir."""
+    base_url = "http://sd"
+
+    def __init__(self, base_url=None, auto_make_dir=True, output_dir=None):
+        self.output_dir = output_dir
+        self.config = {"asset_derivatives": {"enabled": False}}
+        self.prompts = []
+
+    def generate_batch(self, prompt, base_filename, count):
+        GATE.wait(10)
+        os.makedirs(self.output_dir, exist_ok=True)
+        paths = []
+        for i in range(count):
+            path = os.path.join(self.output_dir, f"{base_filename}_{i}.png")
+            with open(path, "w") as f:
+                f.write(prompt)
+            paths.append(path)
+        return paths
+
+
+class FakeSoundWeaver:
+    def generate_candidates(self, project_folder, scene_id, prompt, count, length_seconds, loop, output_dir):
+        GATE.wait(10)
+        os.makedirs(output_dir, exist_ok=True)
+        entries = []
+        for i in range(count):
+            path = os.path.join(output_dir, f"{scene_id}_sfx_{i}.mp3")
+            with open(path, "w") as f:
+                f.write(prompt)
+            entries.append({"file": os.path.relpath(path, ROOT_DIR), "meta": {}})
+        return entries
+
+
+SCENE = {
+    "scene_id": "scene_2",
+    "visual_prompt": "a lantern in the fog",
+    "audio_prompt": "wind",
+    "choices": [{"type": "exquisite", "reward_visual_prompt": "a golden key"}],
+}
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "visual_weaver", types.SimpleNamespace(VisualWeaver=FakeWeaver))
+    GATE.set()
+    assets = tmp_path / "project" / "assets"
+    prefetcher = ScenePrefetcher(FakeWeaver(output_dir=str(assets)), "project",
+                                 {"images_per_scene": 2, "sounds_per_scene": 1}, lookahead=1,
+                                 sound_weaver=FakeSoundWeaver())
+    yield prefetcher, assets, tmp_path / "project" / "audio"
+    GATE.set()
+    prefetcher.shutdown()
+
+
+def test_claimed_renders_move_out_of_the_prefetch_folders(project):
+    prefetcher, assets, audio = project
+    prefetcher.schedule([SCENE])
+    images = prefetcher.claim("scene_2", "main", SCENE["visual_prompt"], timeout=10)
+    assert images == [str(assets / "scene_2_0.png"), str(assets / "scene_2_1.png")]
+    assert all(os.path.exists(p) for p in images)
+    assert prefetcher.claim("scene_2", "reward", "a golden key", timeout=10) == [
+        str(assets / "scene_2_REW_0.png"), str(assets / "scene_2_REW_1.png")]
+
+    sounds = prefetcher.claim("scene_2", "sound", "wind", timeout=10)
+    assert len(sounds) == 1
+    assert os.path.samefile(os.path.join(ROOT_DIR, sounds[0]["file"]), audio / "scene_2_sfx_0.mp3")
+    assert os.listdir(audio / "prefetch") == []
+
+    # A claim hands the job over: asking again yields nothing
+    assert prefetcher.claim("scene_2", "main", SCENE["visual_prompt"]) is None
+    prefetcher.shutdown()
+    assert not os.path.exists(assets / "prefetch") and not os.path.exists(audio / "prefetch")
+    assert os.path.exists(assets / "scene_2_0.png") and os.path.exists(audio / "scene_2_sfx_0.mp3")
+
+
+def test_edited_prompt_cancels_the_speculative_job(project):
+    prefetcher, assets, audio = project
+    GATE.clear()
+    prefetcher.schedule([SCENE])
+    assert prefetcher.is_pending("scene_2", "main")
+    edited = {**SCENE, "visual_prompt": "a lantern in the rain"}
+    prefetcher.invalidate(edited)
+    assert not prefetcher.is_pending("scene_2", "main")
+    assert prefetcher.is_pending("scene_2", "sound")  # untouched prompts keep running
+    GATE.set()
+    assert prefetcher.claim("scene_2", "main", edited["visual_prompt"]) is None
+
+
+def test_claim_with_a_different_prompt_returns_nothing(project):
+    prefetcher, assets, audio = project
+    prefetcher.schedule([SCENE])
+    assert prefetcher.claim("scene_2", "sound", "rain", timeout=10) is None
+    assert not prefetcher.is_pending("scene_2", "sound")
+
+
+def test_running_job_is_kept_when_claim_times_out(project):
+    prefetcher, assets, audio = project
+    GATE.clear()
+    prefetcher.schedule([SCENE])
+    assert prefetcher.claim("scene_2", "main", SCENE["visual_prompt"], timeout=0.05) is None
+    assert prefetcher.is_pending("scene_2", "main")
+    GATE.set()
+    assert prefetcher.claim("scene_2", "main", SCENE["visual_prompt"], timeout=10)
+
+
+def test_finished_targets_and_far_scenes_are_not_prefetched(project):
+    prefetcher, assets, audio = project
+    os.makedirs(assets, exist_ok=True)
+    (assets / "scene_2_main.png").write_text("chosen")
+    later = [{**SCENE, "scene_id": f"scene_{i}"} for i in (3, 4)]
+    prefetcher.schedule([SCENE] + later)
+    assert not prefetcher.is_pending("scene_2", "main") and prefetcher.claim("scene_2", "main", SCENE["visual_prompt"]) is None
+    assert prefetcher.claim("scene_3", "main", SCENE["visual_prompt"], timeout=10)
+    assert prefetcher.claim("scene_4", "main", SCENE["visual_prompt"]) is None  # beyond the lookahead
+
+
+def test_stale_results_are_discarded(project):
+    prefetcher, assets, audio = project
+    GATE.clear()
+    prefetcher.schedule([SCENE])
+    while not prefetcher._jobs[("scene_2", "sound")].future.running():
+        pass
+    prefetcher.invalidate({**SCENE, "audio_prompt": "thunder"})
+    job_dir = audio / "prefetch"
+    GATE.set()
+    prefetcher._sound_pool.shutdown(wait=True)
+    assert not os.path.exists(job_dir) or os.listdir(job_dir) == []
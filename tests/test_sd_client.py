@@ -0,0 +1,113 @@
+import uuid
+import pytest
+import sd_client
+from sd_client import SDClient
+
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+
+    def json(self):
+        return self.payload
+
+
+class FakeSession:
+    """Answers GETs from `routes` (endpoint -> payload) and records every call."""
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.calls = []
+
+    def get(self, url, params=None, timeout=None):
+        endpoint = url.rsplit("/", 1)[-1]
+        self.calls.append(("GET", endpoint))
+        return FakeResponse(self.routes[endpoint])
+
+    def post(self, url, json=None, timeout=None):
+        endpoint = url.rsplit("/", 1)[-1]
+        self.calls.append(("POST", endpoint))
+        if endpoint == "options":
+            self.routes["options"] = {**self.routes["options"], **json}
+        return FakeResponse({})
+
+
+@pytest.fixture
+def url():
+    return f"http://sd-{uuid.uuid4().hex[:8]}:7860"
+
+
+def test_shared_client_is_reused_per_url(url):
+    client = SDClient.shared(url + "/", timeouts={"txt2img": 120})
+    assert SDClient.shared(url) is client
+    assert client.timeouts["txt2img"] == 120 and client.timeouts["options"] == 5
+    assert SDClient.shared(url + "-other") is not client
+
+
+def test_larger_pool_grows_the_same_client(url):
+    client = SDClient.shared(url, pool_size=2)
+    session = client.session
+    client._note_checkpoint("model.safetensors [abc]")
+    old_adapter = session.get_adapter(url)
+
+    assert SDClient.shared(url, pool_size=6) is client
+    assert client.session is session and client.pool_size == 6
+    assert session.get_adapter(url)._pool_maxsize == 6 and session.get_adapter(url) is not old_adapter
+    assert session.get_adapter("https://x")._pool_maxsize == 6
+    assert client.has_checkpoint("model.safetensors")  # tracked state survives the resize
+
+    SDClient.shared(url, pool_size=3)  # smaller requests keep the bigger pool
+    assert client.pool_size == 6
+
+
+def test_metadata_is_cached_for_its_ttl(url, monkeypatch):
+    client = SDClient(url)
+    client.session = FakeSession({"sd-models": [{"title": "a"}], "options": {"sd_model_checkpoint": "a"}})
+    now = [1000.0]
+    monkeypatch.setattr(sd_client.time, "time", lambda: now[0])
+    first = client.get("sd-models", ttl=10)
+    assert client.get("sd-models", ttl=10) is first
+    now[0] += 11
+    client.get("sd-models", ttl=10)
+    assert client.session.calls == [("GET", "sd-models")] * 2
+
+
+def switching_client(url, loaded="old.safetensors [111]"):
+    client = SDClient(url)
+    client.session = FakeSession({"options": {"sd_model_checkpoint": loaded},
+                                  "progress": {"progress": 0.0, "state": {"job_count": 0}}})
+    return client
+
+
+def test_fresh_checkpoint_is_trusted_without_requests(url, monkeypatch):
+    client = switching_client(url)
+    now = [1000.0]
+    monkeypatch.setattr(sd_client.time, "time", lambda: now[0])
+    client._note_checkpoint("new.safetensors [222]")
+    assert client.ensure_checkpoint("new.safetensors")
+    assert client.session.calls == []
+    now[0] += sd_client.CHECKPOINT_TRUST_SECONDS + 1
+    assert not client.has_checkpoint("new.safetensors")
+
+
+def test_stale_checkpoint_is_confirmed_with_one_options_read(url):
+    client = switching_client(url, loaded="models/new.safetensors [222]")
+    assert client.ensure_checkpoint("new.safetensors")
+    assert client.session.calls == [("GET", "options")]
+    assert client.has_checkpoint("new.safetensors")
+
+
+def test_switch_posts_once_and_polls_until_loaded(url):
+    client = switching_client(url)
+    assert client.ensure_checkpoint("new.safetensors", interval=0)
+    assert client.session.calls.count(("POST", "options")) == 1
+    assert ("GET", "progress") in client.session.calls
+    assert client.has_checkpoint("new.safetensors")
+
+
+def test_unconfirmed_switch_forgets_the_checkpoint(url):
+    client = switching_client(url)
+    client.session.post = lambda url, json=None, timeout=None: FakeResponse({})  # the WebUI ignores it
+    assert not client.ensure_checkpoint("new.safetensors", timeout=0.05, interval=0.01)
+    assert client.loaded_checkpoint is None
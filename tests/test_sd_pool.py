@@ -0,0 +1,126 @@
+import asyncio
+import pytest
+import sd_pool
+from sd_pool import SDBackend, SDBackendPool
+
+
+class FakeClient:
+    def __init__(self, checkpoint=None, online=True):
+        self.loaded_checkpoint = checkpoint
+        self.online = online
+        self.probes = 0
+
+    def check_connection(self):
+        self.probes += 1
+        return (True, "Connected") if self.online else (False, "Connection Refused")
+
+
+def make_pool(n=3, dispatch="least_loaded", checkpoints=None, max_jobs=1):
+    checkpoints = checkpoints or [None] * n
+    return SDBackendPool([SDBackend(f"http://node{i}", FakeClient(checkpoints[i]), max_jobs)
+                          for i in range(n)], dispatch)
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delay(monkeypatch):
+    monkeypatch.setattr(sd_pool, "RETRY_DELAY", 0)
+
+
+def test_least_loaded_spreads_concurrent_renders():
+    pool = make_pool(3)
+    held = [pool.acquire() for _ in range(3)]
+    assert sorted(b.url for b in held) == ["http://node0", "http://node1", "http://node2"]
+    pool.release(held[1])
+    assert pool.acquire() is held[1]
+
+
+def test_round_robin_cycles_through_nodes():
+    pool = make_pool(3, dispatch="round_robin")
+    urls = []
+    for _ in range(6):
+        backend = pool.acquire()
+        urls.append(backend.url)
+        pool.release(backend)
+    assert len(set(urls[:3])) == 3 and urls[:3] == urls[3:]
+
+
+def test_loaded_checkpoint_wins_over_load():
+    pool = make_pool(3, checkpoints=["a.safetensors", "b.safetensors [abc123]", None], max_jobs=2)
+    first = pool.acquire("b.safetensors")
+    second = pool.acquire("b.safetensors")
+    assert first.url == second.url == "http://node1"
+    # Saturated: the next render goes to an idle node instead of queueing
+    assert pool.acquire("b.safetensors").url != "http://node1"
+
+
+def test_failed_node_is_cooled_down_and_render_fails_over():
+    pool = make_pool(2)
+    calls = []
+
+    def render(backend):
+        calls.append(backend.url)
+        if backend.url == "http://node0":
+            raise RuntimeError("boom")
+        return "ok"
+
+    assert pool.run(render) == "ok"
+    assert calls == ["http://node0", "http://node1"]
+    node0 = pool.backends[0]
+    assert not node0.available and node0.last_error == "boom"
+    assert [b.url for b in pool.available()] == ["http://node1"]
+    assert pool.capacity() == 1
+    # While node0 cools down every render goes to node1
+    calls.clear()
+    assert pool.run(render) == "ok" and calls == ["http://node1"]
+    assert all(b.active == 0 for b in pool.backends)
+
+
+def test_cooldown_expires(monkeypatch):
+    pool = make_pool(2)
+    pool.release(pool.acquire(), error=RuntimeError("down"))
+    clock = sd_pool.time.time() + sd_pool.FAILURE_COOLDOWN + 1
+    monkeypatch.setattr(sd_pool.time, "time", lambda: clock)
+    assert len(pool.available()) == 2
+
+
+def test_run_retries_after_every_node_failed():
+    pool = make_pool(2)
+    calls = []
+
+    def render(backend):
+        calls.append(backend.url)
+        raise RuntimeError(f"attempt {len(calls)}")
+
+    with pytest.raises(RuntimeError, match="attempt 3"):
+        pool.run(render, attempts=3)
+    assert sorted(calls[:2]) == ["http://node0", "http://node1"] and len(calls) == 3
+    assert all(b.active == 0 for b in pool.backends)
+
+
+def test_run_async_fails_over():
+    pool = make_pool(2)
+
+    async def render(backend):
+        if backend.url == "http://node0":
+            raise RuntimeError("boom")
+        return backend.url
+
+    assert asyncio.run(pool.run_async(render)) == "http://node1"
+    assert not pool.backends[0].available
+
+
+def test_render_cooldown_does_not_mark_node_offline():
+    pool = make_pool(1)
+    pool.release(pool.acquire(), error=RuntimeError("render failed"))
+    assert pool.check_connection() == (True, "Connected")
+
+
+def test_failed_health_probe_is_reused_for_ttl():
+    pool = make_pool(2)
+    pool.backends[0].client.online = False
+    assert pool.check_connection() == (True, "Connected (1/2 backends online)")
+    pool.check_connection()
+    assert pool.backends[0].client.probes == 1  # failed probe reused
+    assert pool.backends[1].client.probes == 2  # healthy nodes are probed again
+    pool.backends[0].client.online = True
+    assert pool.check_connection(force=True) == (True, "Connected (2/2 backends online)")
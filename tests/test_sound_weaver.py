@@ -0,0 +1,86 @@
+import os
+import threading
+import pytest
+import sound_weaver
+from asset_cache import AssetCache
+from sound_weaver import SoundWeaver
+
+
+class FakeElevenLabs:
+    """Stands in for the API; `barrier` proves that candidates are fetched at the same time."""
+
+    def __init__(self, barrier=None, fail=False):
+        self.barrier = barrier
+        self.fail = fail
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, prompt, length_seconds=None, model=None, loop=False):
+        with self.lock:
+            self.calls += 1
+        if self.barrier:
+            self.barrier.wait()
+        if self.fail:
+            raise RuntimeError("quota exceeded")
+        return b"ID3 raw audio"
+
+
+@pytest.fixture
+def processed(monkeypatch):
+    """Post-processing runs inline (no worker processes) and is recorded."""
+    files = []
+
+    def fake_post_process(file_path, length_seconds=5, loop=False, **params):
+        files.append(os.path.basename(file_path))
+        with open(file_path, "ab") as f:
+            f.write(b" processed")
+        return {"processed": True, "notes": ["fake"]}
+
+    monkeypatch.setattr(sound_weaver, "_post_process", fake_post_process)
+    monkeypatch.setattr(SoundWeaver, "_submit_post_process", lambda self, *args, **kwargs: None)
+    return files
+
+
+def make_weaver(tmp_path, api, workers=3):
+    weaver = SoundWeaver(api_key="key", cache=AssetCache(str(tmp_path / "cache")),
+                         config={"sound_settings": {"max_workers": workers}})
+    weaver._call_elevenlabs = api
+    return weaver
+
+
+def generate(weaver, tmp_path, count=3, **kwargs):
+    return weaver.generate_candidates("book", "scene_1", "wind in the trees", count=count, length_seconds=5,
+                                      output_dir=str(tmp_path / "audio"), **kwargs)
+
+
+def test_candidates_are_fetched_concurrently_and_kept_in_order(tmp_path, processed):
+    api = FakeElevenLabs(barrier=threading.Barrier(3, timeout=5))
+    candidates = generate(make_weaver(tmp_path, api), tmp_path)
+    assert api.calls == 3
+    assert [c["meta"]["candidate_index"] for c in candidates] == [0, 1, 2]
+    assert all(c["meta"]["processed"] and not c["meta"]["placeholder"] for c in candidates)
+    assert sorted(processed) == sorted(os.path.basename(c["file"]) for c in candidates)
+
+
+def test_repeated_prompt_is_restored_from_the_cache(tmp_path, processed):
+    api = FakeElevenLabs()
+    weaver = make_weaver(tmp_path, api)
+    generate(weaver, tmp_path)
+    processed.clear()
+    candidates = generate(weaver, tmp_path)
+    assert api.calls == 3 and processed == []
+    assert all(c["meta"]["cached"] and c["meta"]["processed"] for c in candidates)
+
+    # Regenerate asks ElevenLabs for fresh takes
+    generate(weaver, tmp_path, reroll=1)
+    assert api.calls == 6
+
+
+def test_dry_run_and_api_errors_write_placeholders(tmp_path, processed):
+    api = FakeElevenLabs(fail=True)
+    weaver = make_weaver(tmp_path, api)
+    dry = generate(weaver, tmp_path, count=2, dry_run=True)
+    assert api.calls == 0 and all(c["meta"]["placeholder"] for c in dry)
+    failed = generate(weaver, tmp_path, count=2)
+    assert api.calls == 2
+    assert all(c["meta"]["placeholder"] and "quota" in c["meta"]["error"] for c in failed)
@@ -0,0 +1,121 @@
+import os
+import json
+import copy
+import pytest
+import story_pack_store
+from story_pack_store import StoryPackStore
+
+LONG_TEXT = "The corridor hums. " * 40
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = StoryPackStore(str(tmp_path / "story_pack.json"))
+    s.create({"meta": {"title": "Test"}, "scenes": [{"scene_id": "s1", "scene_text": LONG_TEXT}]})
+    return s
+
+
+def from_disk(store):
+    """The pack as a fresh process would read it (base + journal replay)."""
+    story_pack_store._cache.clear()
+    return store.load()
+
+
+def journal(store):
+    with open(store.journal_path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_changes_are_journaled_and_replayed(store):
+    base = os.path.getmtime(store.path), os.path.getsize(store.path)
+    store.append_scene({"scene_id": "s2", "scene_text": "Next"}, meta={"protagonist": "Ada"})
+    store.set_progress(2, saved_scene_id="s1")
+    store.update_meta({"title": "Renamed"})
+    assert (os.path.getmtime(store.path), os.path.getsize(store.path)) == base
+    assert [op["op"] for op in journal(store)] == ["meta", "scene", "progress", "meta"]
+
+    expected = copy.deepcopy(store.load())
+    assert from_disk(store) == expected
+    assert expected["meta"] == {"title": "Renamed", "protagonist": "Ada"}
+    assert expected["progress"] == {"next_index": 2, "saved_scene_ids": ["s1"]}
+    assert [s["scene_id"] for s in expected["scenes"]] == ["s1", "s2"]
+
+
+def test_small_edit_of_long_text_is_a_splice(store):
+    edited = LONG_TEXT.replace("hums", "sings", 1)
+    store.replace_scene(0, {"scene_id": "s1", "scene_text": edited, "mood": "calm"})
+    op = journal(store)[-1]
+    assert op["op"] == "patch" and op["set"] == {"mood": "calm"}
+    assert len(op["splice"]["scene_text"][2]) < 10
+    assert from_disk(store)["scenes"][0] == {"scene_id": "s1", "scene_text": edited, "mood": "calm"}
+
+    store.replace_scene(0, {"scene_id": "s1", "scene_text": edited})
+    assert journal(store)[-1]["unset"] == ["mood"]
+    assert "mood" not in from_disk(store)["scenes"][0]
+
+
+def test_unchanged_scene_writes_nothing(store):
+    store.replace_scene(0, {"scene_id": "s1", "scene_text": LONG_TEXT})
+    assert not os.path.exists(store.journal_path)
+
+
+def test_compaction_folds_journal_into_base(store, monkeypatch):
+    monkeypatch.setattr(story_pack_store, "COMPACT_AFTER_OPS", 5)
+    for i in range(4):
+        store.set_progress(i)
+    assert len(journal(store)) == 4
+    store.set_progress(4)
+    assert not os.path.exists(store.journal_path)
+    with open(store.path, encoding="utf-8") as f:
+        assert json.load(f)["progress"]["next_index"] == 4
+    assert from_disk(store)["progress"]["next_index"] == 4
+
+
+def test_replay_over_compacted_base_is_idempotent(store):
+    store.append_scene({"scene_id": "s2", "scene_text": "Next"})
+    store.replace_scene(0, {"scene_id": "s1", "scene_text": LONG_TEXT + "!"})
+    store.set_progress(1, saved_scene_id="s2")
+    with open(store.journal_path, encoding="utf-8") as f:
+        leftover = f.read()
+    expected = copy.deepcopy(store.load())
+    # Crash between writing the new base and removing the journal
+    store.compact()
+    with open(store.journal_path, "w", encoding="utf-8") as f:
+        f.write(leftover)
+    assert from_disk(store) == expected
+
+
+def test_torn_last_line_is_ignored(store):
+    store.set_progress(1)
+    with open(store.journal_path, "a", encoding="utf-8") as f:
+        f.write('{"op": "progress", "next_ind')
+    assert from_disk(store)["progress"]["next_index"] == 1
+
+
+def test_invalid_pack(tmp_path):
+    s = StoryPackStore(str(tmp_path / "story_pack.json"))
+    assert s.load() is None
+    with pytest.raises(ValueError):
+        s.create({"meta": {}})
+    with pytest.raises(FileNotFoundError):
+        s.update_meta({"title": "x"})
+
+
+def test_finishing_a_stream_the_director_caught_up_with_closes_the_script(tmp_path):
+    from utils import DashboardUtils
+    from ink_document import InkDocument
+    path = str(tmp_path / "story_pack.json")
+    scenes = [{"scene_id": f"s{i}", "scene_text": f"Scene {i}", "choices": [{"text": "go"}]} for i in (1, 2)]
+    DashboardUtils.save_story_pack_file(path, {"meta": {"streaming": True}, "scenes": scenes,
+                                               "progress": {"next_index": 2, "saved_scene_ids": ["s1", "s2"]}})
+    ink_path = str(tmp_path / "adventure.ink")
+    with open(ink_path, "w", encoding="utf-8") as f:
+        f.write("-> s2\n== s2 ==\nScene 2\n* [go] -> s2_result_1\n== s2_result_1 ==\nYou go.\n-> s2_next\n"
+                "== s2_next ==\n// TEMPORARY PLACEHOLDER\n[...The story continues in s2_next...]\n-> END\n")
+
+    DashboardUtils.finish_story_pack_stream(path)
+    pack = DashboardUtils.load_story_pack_file(path)
+    assert not pack["meta"]["streaming"]
+    assert pack["scenes"][-1]["choices"] == [{"text": "go"}]  # already saved: the pack is left alone
+    closing = InkDocument.load(ink_path).get("s2_next")
+    assert closing[-2:] == ["-> END", ""] and not any("continues" in line for line in closing)
@@ -0,0 +1,81 @@
+import time
+import threading
+import pytest
+import streamlit as st
+import architect
+from job_queue import JobQueue, DONE, FAILED
+from utils import DashboardUtils
+
+GATE = threading.Event()
+
+
+class FakeArchitect:
+    """Streams two scenes, then waits for the test before (optionally) breaking off."""
+
+    fail = False
+
+    def __init__(self, book_path):
+        self.book_path = book_path
+
+    def generate_story_pack_streaming(self, protagonist_name=None, scene_count=12, on_scene=None):
+        scenes = [{"scene_id": f"s{i + 1}", "scene_text": f"Scene {i + 1}", "choices": [{"text": "go"}]}
+                  for i in range(2)]
+        on_scene(0, scenes[0], {"protagonist": protagonist_name})
+        GATE.wait(10)
+        if self.fail:
+            raise RuntimeError("stream cut off")
+        on_scene(1, scenes[1], {})
+        return {"meta": {}, "scenes": scenes}
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    GATE.clear()
+    FakeArchitect.fail = False
+    q = JobQueue(str(tmp_path / "jobs.db"))
+    monkeypatch.setattr(JobQueue, "shared", classmethod(lambda cls, db_path=None: q))
+    monkeypatch.setattr(architect, "AutonomousArchitect", FakeArchitect)
+    st.session_state["active_project_path"] = str(tmp_path)
+    yield q
+    GATE.set()
+    q.shutdown(wait=True)
+    st.session_state.pop("active_project_path", None)
+
+
+def wait_for(predicate, timeout=10):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+def test_stream_runs_as_a_job_and_reports_liveness(queue):
+    path = DashboardUtils.start_story_pack_stream("book.txt", "b1", protagonist_name="Alice", scene_count=2)
+    wait_for(lambda: len(DashboardUtils.load_story_pack_file(path)["scenes"]) == 1)
+    assert DashboardUtils.story_pack_stream_alive(path)
+    assert DashboardUtils.load_story_pack_file(path)["meta"]["streaming"]
+
+    # A second start (e.g. a rerun) attaches to the running stream instead of wiping the pack
+    assert DashboardUtils.start_story_pack_stream("book.txt", "b1", scene_count=2) == path
+    assert len(queue.jobs()) == 1
+
+    GATE.set()
+    wait_for(lambda: not DashboardUtils.story_pack_stream_alive(path))
+    job = queue.jobs()[0]
+    assert job["status"] == DONE and job["result"]["scenes"] == 2
+    pack = DashboardUtils.load_story_pack_file(path)
+    assert not pack["meta"]["streaming"]
+    assert [s["scene_id"] for s in pack["scenes"]] == ["s1", "s2"]
+    assert pack["scenes"][-1]["choices"] == []  # the last scene became the finale
+
+
+def test_broken_stream_keeps_received_scenes(queue):
+    FakeArchitect.fail = True
+    path = DashboardUtils.start_story_pack_stream("book.txt", "b1", scene_count=2)
+    wait_for(lambda: len(DashboardUtils.load_story_pack_file(path)["scenes"]) == 1)
+    GATE.set()
+    wait_for(lambda: not DashboardUtils.story_pack_stream_alive(path))
+    assert queue.jobs()[0]["status"] == FAILED
+    pack = DashboardUtils.load_story_pack_file(path)
+    assert not pack["meta"]["streaming"]
+    assert [s["scene_id"] for s in pack["scenes"]] == ["s1"]